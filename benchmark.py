@@ -0,0 +1,736 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks for the scraping pipeline.
+
+Usage: python benchmark.py [page_document] [parsers] [process_scaling] [rate_limit] [rules] [categorize] [convert] [records] [pipeline] [startup] [transport] [end_to_end]
+       [--pages N] [--properties N] [--records N] [--sites N] [--latency S] [--error-rate R] [--history FILE]
+"""
+import argparse
+import random
+import time
+from typing import Callable, Dict, List, Optional
+
+from bs4 import BeautifulSoup
+
+import scraper
+from page_document import PageDocument
+from synthetic_site import encode_page, make_property_page
+
+
+def _time_per_page(fn: Callable[[str], object], pages: List[str]) -> float:
+    start = time.perf_counter()
+    for page in pages:
+        fn(page)
+    return (time.perf_counter() - start) / len(pages)
+
+
+def _extract_all(doc: PageDocument) -> Dict:
+    return {
+        'property_count': scraper._extract_property_count(doc),
+        'property_links': scraper._extract_property_links(doc, 'https://bench.lodgify.com'),
+        'company_address': scraper._extract_address(doc),
+        'website': scraper._extract_website(doc),
+        'social_media': scraper._extract_social_media(doc),
+        'phone': scraper._extract_phone(doc),
+        'email': scraper._extract_email(doc),
+        'additional_info': scraper._extract_additional_info(doc),
+    }
+
+
+def bench_page_document(pages: int, properties: int) -> None:
+    """Compare one shared PageDocument against the per-extractor tree walks it replaced"""
+    corpus = [make_property_page(i, properties) for i in range(pages)]
+
+    def legacy(html: str) -> None:
+        soup = BeautifulSoup(html, 'html.parser')
+        # Every extractor used to call get_text() (5x) and find_all('a') (4x) itself
+        for _ in range(5):
+            soup.get_text()
+        for _ in range(4):
+            soup.find_all('a', href=True)
+        _extract_all(PageDocument(soup))
+
+    def shared(html: str) -> None:
+        _extract_all(PageDocument.from_content(html))
+
+    legacy_time = _time_per_page(legacy, corpus)
+    shared_time = _time_per_page(shared, corpus)
+    print(f"page_document: {pages} pages, {properties} property links each")
+    print(f"  per-extractor walks: {legacy_time * 1000:8.2f} ms/page")
+    print(f"  shared document:     {shared_time * 1000:8.2f} ms/page")
+    print(f"  speedup:             {legacy_time / shared_time:8.2f}x")
+
+
+def bench_parsers(pages: int, properties: int) -> None:
+    """Check every parser backend yields identical records, whatever the page encoding, and report pages/s"""
+    from page_document import PARSER_BACKENDS
+
+    # Includes BOM-prefixed and ISO-8859-1 pages, which every backend must decode alike
+    corpus = [encode_page(i, make_property_page(i, properties)) for i in range(pages)]
+    reference = None
+
+    print(f"parsers: {pages} pages, {properties} property links each")
+    for backend in PARSER_BACKENDS:
+        try:
+            start = time.perf_counter()
+            records = [scraper._build_record(f"site{i}", f"https://site{i}.lodgify.com", page, backend)
+                       for i, page in enumerate(corpus)]
+            elapsed = time.perf_counter() - start
+        except ImportError as e:
+            print(f"  {backend:12s} skipped ({e})")
+            continue
+
+        if reference is None:
+            reference = records
+            status = 'reference'
+        else:
+            mismatches = sum(1 for a, b in zip(reference, records) if a != b)
+            status = 'identical' if not mismatches else f"{mismatches} MISMATCHED records"
+        print(f"  {backend:12s} {pages / elapsed:8.1f} pages/s  {status}")
+
+
+def bench_process_scaling(pages: int, properties: int, parser: str = 'html.parser') -> None:
+    """Parse pre-downloaded pages on 1, 2, 4... worker processes, up to the core count"""
+    import os
+
+    corpus = [(f"site{i}", f"https://site{i}.lodgify.com", make_property_page(i, properties).encode('utf-8'))
+              for i in range(pages)]
+    cores = os.cpu_count() or 1
+    counts = sorted({1, cores} | {2 ** k for k in range(1, cores.bit_length()) if 2 ** k <= cores})
+
+    start = time.perf_counter()
+    reference = scraper._build_records_batch(corpus, parser)
+    inline = time.perf_counter() - start
+
+    print(f"process_scaling: {pages} pages, {properties} property links each, {cores} cores, {parser}")
+    print(f"  in-process     {pages / inline:8.1f} pages/s")
+    for workers in counts:
+        start = time.perf_counter()
+        records = list(scraper._parse_in_processes(corpus, workers, parser=parser))
+        elapsed = time.perf_counter() - start
+        key = lambda record: record['subdomain']
+        status = 'identical' if sorted(records, key=key) == sorted(reference, key=key) else 'MISMATCHED records'
+        print(f"  {workers:2d} worker(s)   {pages / elapsed:8.1f} pages/s  {inline / elapsed:5.2f}x  {status}")
+
+
+def bench_rate_limit(requests_count: int, server_rate: float = 10.0) -> None:
+    """Fetch from a deliberately throttling local server with and without the adaptive limiter"""
+    import requests
+    from rate_limit import RateLimiter, install_rate_limiter
+    from synthetic_site import ThrottlingHttpServer
+
+    print(f"rate_limit: {requests_count} requests against a server allowing {server_rate:g} req/s")
+    for label in ('unlimited', 'adaptive'):
+        with ThrottlingHttpServer(rate=server_rate, retry_after=1) as server:
+            session = requests.Session()
+            limiter = None
+            if label == 'adaptive':
+                limiter = RateLimiter()
+                install_rate_limiter(session, limiter)
+
+            start = time.perf_counter()
+            statuses = [session.get(f"http://127.0.0.1:{server.port}/page/{i}").status_code
+                        for i in range(requests_count)]
+            elapsed = time.perf_counter() - start
+
+        ok = statuses.count(200)
+        retries = f", {limiter.retries} retries" if limiter else ''
+        print(f"  {label:10s} {ok:5d} ok  {requests_count - ok:5d} would fall back to mock data  "
+              f"{ok / elapsed:6.1f} ok/s{retries}")
+
+
+SAMPLE_ADDRESSES = [
+    "249 Main St, City, State 56264", "10 Downing Street, London SW1A 2AA, UK", "Rua Augusta 1500, 01304-001 Sao Paulo",
+    "Calle Mayor 5, 28013 Madrid, España", "12 George St, Sydney NSW 2000", "1 Yonge St, Toronto, ON M5E 1W7, Canada",
+    "Keizersgracht 123, 1015 CJ Amsterdam", "Av. Reforma 222, C.P. 06600, Mexico", "Somewhere quiet by the lake", "",
+]
+
+
+def _legacy_detect_country(address: str, country_patterns: Dict[str, List[str]]) -> str:
+    # The per-pattern loop bonus_4._detect_country used before rules.COUNTRIES
+    import re
+    if not address:
+        return 'Unknown'
+    address_upper = address.upper()
+    for country, patterns in country_patterns.items():
+        for pattern in patterns:
+            if re.search(pattern.upper(), address_upper):
+                return country
+    return 'Unknown'
+
+
+def _legacy_social_platform(href: str) -> Optional[str]:
+    # The per-platform loop scraper._extract_social_media used before rules.SOCIAL_MEDIA
+    import re
+    social_patterns = {
+        'facebook': r'facebook\.com', 'instagram': r'instagram\.com', 'twitter': r'twitter\.com',
+        'linkedin': r'linkedin\.com', 'youtube': r'youtube\.com'
+    }
+    for platform, pattern in social_patterns.items():
+        if re.search(pattern, href):
+            return platform
+    return None
+
+
+def bench_rules(records: int) -> None:
+    """Compare the compiled rule engine against the per-pattern loops, checking both agree"""
+    import rules
+    from bonus_4 import _detect_country
+
+    rng = random.Random(0)
+    addresses = [rng.choice(SAMPLE_ADDRESSES) for _ in range(records)]
+    hrefs = [rng.choice(['/property/villa-1', 'https://facebook.com/x', 'https://www.youtube.com/watch?v=1',
+                         'https://share.example.com/?u=twitter.com&s=instagram.com', 'mailto:a@b.com'])
+             for _ in range(records)]
+
+    cases = [
+        ('country', addresses, lambda a: _legacy_detect_country(a, rules.COUNTRY_PATTERNS),
+         lambda a: _detect_country(a, rules.COUNTRIES)),
+        ('social', hrefs, _legacy_social_platform, rules.SOCIAL_MEDIA.first),
+    ]
+
+    print(f"rules: {records} inputs per ruleset")
+    for name, inputs, legacy, compiled in cases:
+        legacy_time = _time_per_page(legacy, inputs)
+        compiled_time = _time_per_page(compiled, inputs)
+        agree = all(legacy(x) == compiled(x) for x in inputs)
+        print(f"  {name:8s} per-pattern {legacy_time * 1e6:7.2f} us  compiled {compiled_time * 1e6:7.2f} us  "
+              f"speedup {legacy_time / compiled_time:5.2f}x  {'identical' if agree else 'MISMATCH'}")
+
+
+def bench_categorize(records: int) -> None:
+    """Per-record vs vectorized country categorization over synthetic scraped records"""
+    import pandas as pd
+    from bonus_4 import _categorize_batch, _categorize_records, _detect_country, _detect_countries
+
+    rng = random.Random(0)
+    data = [{
+        'subdomain': f"site{i}.lodgify.com", 'url': f"https://site{i}.lodgify.com",
+        'property_count': rng.randint(1, 50), 'property_links': [],
+        'company_address': rng.choice(SAMPLE_ADDRESSES) + ('' if i % 3 else f" #{rng.randint(1, 500)}"),
+        'social_media': {'facebook': f"https://facebook.com/site{i}"},
+    } for i in range(records)]
+
+    start = time.perf_counter()
+    labels = [_detect_country(record['company_address'].strip()) for record in data]
+    loop_detect = time.perf_counter() - start
+
+    addresses = pd.Series([record['company_address'] for record in data]).str.strip()
+    start = time.perf_counter()
+    vector_labels = _detect_countries(addresses)
+    vector_detect = time.perf_counter() - start
+
+    start = time.perf_counter()
+    per_record = _categorize_records(data)
+    loop_total = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batch = _categorize_batch(data)
+    batch_total = time.perf_counter() - start
+
+    same = labels == vector_labels.tolist() and per_record.equals(batch)
+    print(f"categorize: {records} records, {addresses.nunique()} distinct addresses")
+    print(f"  detect only   per-record {loop_detect:7.3f} s  vectorized {vector_detect:7.3f} s")
+    print(f"  full stage    per-record {loop_total:7.3f} s  batch      {batch_total:7.3f} s  "
+          f"{'identical' if same else 'MISMATCH'}")
+
+
+_CONVERT_SCRIPT = """
+import json, resource, sys, time
+sys.path.insert(0, {root!r})
+mode, src, dst = sys.argv[1:4]
+start = time.perf_counter()
+if mode == 'legacy':
+    # json.load + list of flattened dicts + DataFrame, as convert_json_to_csv used to do
+    import pandas as pd
+    from json_to_csv import flatten_record
+    with open(src) as f:
+        data = json.load(f)
+    pd.DataFrame([flatten_record(r) for r in data]).to_csv(dst, index=False, encoding='utf-8')
+else:
+    from json_to_csv import convert_json_to_csv
+    convert_json_to_csv(src, dst, output_format=mode)
+elapsed = time.perf_counter() - start
+# VmHWM is this process's own peak; ru_maxrss can carry the parent's peak over exec
+try:
+    with open('/proc/self/status') as status:
+        peak_kb = next(int(line.split()[1]) for line in status if line.startswith('VmHWM:'))
+except OSError:
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(elapsed, peak_kb)
+"""
+
+
+def bench_convert(records: int) -> None:
+    """Peak RSS and wall time of JSON->CSV/Parquet conversion, each run in a fresh process"""
+    import json
+    import os
+    import subprocess
+    import sys
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as tmp:
+        src = os.path.join(tmp, 'scraped_data.json')
+        with open(src, 'w') as f:
+            f.write('[\n')
+            for i in range(records):
+                f.write((',\n' if i else '') + json.dumps(make_record(i), indent=2))
+            f.write('\n]')
+
+        print(f"convert: {records} records, {os.path.getsize(src) / 1e6:.1f} MB of JSON")
+        script = _CONVERT_SCRIPT.format(root=os.path.dirname(os.path.abspath(__file__)))
+        for mode, suffix in [('legacy', 'csv'), ('csv', 'csv'), ('parquet', 'parquet')]:
+            dst = os.path.join(tmp, f"out_{mode}.{suffix}")
+            result = subprocess.run([sys.executable, '-c', script, mode, src, dst],
+                                    capture_output=True, text=True)
+            if result.returncode != 0 or not os.path.exists(dst):
+                print(f"  {mode:8s} failed: {(result.stderr.strip().splitlines() or ['no output'])[-1]}")
+                continue
+            elapsed, max_rss_kb = result.stdout.split()
+            print(f"  {mode:8s} {float(elapsed):7.2f} s  peak RSS {int(max_rss_kb) / 1024:8.1f} MB")
+
+
+def bench_records(records: int) -> None:
+    """Memory per record held as dicts vs records.Record, and JSON/CSV serialization speed"""
+    import json
+    import tracemalloc
+
+    from json_to_csv import flatten_record
+    from records import Record, jsonable
+
+    lines = [json.dumps(make_record(i)) for i in range(records)]
+
+    def load(build: Callable[[str], object]):
+        start = time.perf_counter()
+        loaded = [build(line) for line in lines]
+        elapsed = time.perf_counter() - start
+        del loaded
+        # Measured apart from the timing: tracemalloc slows allocation down severalfold
+        tracemalloc.start()
+        loaded = [build(line) for line in lines]
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        return loaded, size, elapsed
+
+    dicts, dict_bytes, dict_load = load(json.loads)
+    compact, record_bytes, record_load = load(Record.from_json)
+
+    def timed(fn: Callable[[object], object], items: List) -> float:
+        start = time.perf_counter()
+        for item in items:
+            fn(item)
+        return time.perf_counter() - start
+
+    same = [record.to_dict() for record in compact] == dicts
+    print(f"records: {records} records, {'identical' if same else 'MISMATCH'}")
+    print(f"  memory        dict {dict_bytes / records:7.0f} B/record  Record {record_bytes / records:7.0f} B/record  "
+          f"({dict_bytes / record_bytes:.2f}x smaller)")
+    print(f"  load JSONL    dict {dict_load:7.3f} s  Record {record_load:7.3f} s")
+    print(f"  dump JSONL    dict {timed(json.dumps, dicts):7.3f} s  "
+          f"Record {timed(lambda record: json.dumps(record, default=jsonable), compact):7.3f} s")
+    print(f"  CSV rows      dict {timed(flatten_record, dicts):7.3f} s  Record {timed(flatten_record, compact):7.3f} s")
+
+
+_STAGE_SCRIPT = """
+import json, resource, sys, time
+sys.path.insert(0, {root!r})
+config = json.loads(sys.argv[1])
+stage, tmp = config['stage'], config['tmp']
+
+import metrics
+
+def counter(name, **labels):
+    return sum(series['value'] for series in metrics.registry.snapshot()['counters'].get(name, [])
+               if all(series['labels'].get(k) == v for k, v in labels.items()))
+
+start = time.perf_counter()
+extra = {{}}
+if stage == 'discover':
+    from subdomain_fetch import discover_subdomains
+    found = discover_subdomains(use_dns=False, wordlists=[config['wordlist']], previous_file=None, pad_to=0,
+                                url_template=config['url_template'], output_file=tmp + '/discovered.json')
+    items, extra['found'] = counter('discovery_checks_total'), len(found)
+elif stage == 'scrape':
+    import scraper
+    from rate_limit import RateLimiter, install_rate_limiter
+    install_rate_limiter(scraper.session, RateLimiter())
+    with open(tmp + '/urls.json') as f:
+        urls = json.load(f)
+    scraper.scrape_subdomain_data(urls, limit=len(urls), mode=config['mode'], concurrency=config['concurrency'],
+                                  delay_range=(0, 0), json_file=tmp + '/scraped.json', collect=False,
+                                  jsonl_file=tmp + '/scraped.jsonl')
+    items, extra['mock_fallbacks'] = len(urls), counter('mock_fallbacks_total')
+elif stage == 'convert':
+    from json_to_csv import convert_json_to_csv
+    convert_json_to_csv(tmp + '/scraped.json', tmp + '/scraped.csv')
+    items = config['records']
+elif stage == 'categorize':
+    from bonus_4 import categorize_by_country
+    categorize_by_country(tmp + '/scraped.json', tmp + '/categorized.csv')
+    items = config['records']
+elif stage == 'enrich':
+    from bonus_5 import enrich_contact_info
+    enrich_contact_info(tmp + '/scraped.json', tmp + '/enriched.csv', limit=config['records'],
+                        concurrency=config['concurrency'], delay_range=(0, 0))
+    items = counter('records_total', stage='enrich')
+elapsed = time.perf_counter() - start
+try:
+    with open('/proc/self/status') as status:
+        peak_kb = next(int(line.split()[1]) for line in status if line.startswith('VmHWM:'))
+except OSError:
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps(dict(extra, elapsed=elapsed, peak_rss_kb=peak_kb, items=items)))
+"""
+
+END_TO_END_STAGES = ['discover', 'scrape', 'convert', 'categorize', 'enrich']
+
+
+def _git_commit() -> Optional[str]:
+    import subprocess
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def bench_end_to_end(sites: int, properties: int, latency: float, error_rate: float, throttle_rate: float,
+                     mode: str, concurrency: int, history_file: Optional[str]) -> None:
+    """
+    Run every stage against a SyntheticSiteServer, each in a fresh process, and report
+    throughput and peak RSS per stage. Results are appended to history_file and
+    compared with the last run using the same parameters.
+    """
+    import json
+    import os
+    import subprocess
+    import sys
+    import tempfile
+
+    import record_io
+    from synthetic_site import SyntheticSiteServer
+
+    params = {'sites': sites, 'properties': properties, 'latency': latency, 'error_rate': error_rate,
+              'throttle_rate': throttle_rate, 'mode': mode, 'concurrency': concurrency}
+    script = _STAGE_SCRIPT.format(root=os.path.dirname(os.path.abspath(__file__)))
+    results = {}
+
+    print(f"end_to_end: {sites} sites, {properties} property links each, latency <= {latency * 1000:g} ms, "
+          f"{error_rate:.0%} errors, throttled above {throttle_rate or 'no'} req/s, {mode} mode")
+
+    with tempfile.TemporaryDirectory() as tmp, \
+            SyntheticSiteServer(sites, properties, latency=(0.0, latency), error_rate=error_rate,
+                                throttle_rate=throttle_rate or None) as server:
+        # Every hosted site plus as many names that do not exist
+        wordlist = os.path.join(tmp, 'wordlist.txt')
+        with open(wordlist, 'w') as f:
+            f.writelines(f"{name}\n{name}-missing\n" for name in server.site_names())
+
+        config = {'tmp': tmp, 'wordlist': wordlist, 'url_template': server.url_template,
+                  'mode': mode, 'concurrency': concurrency, 'records': 0}
+        for stage in END_TO_END_STAGES:
+            if stage == 'scrape':
+                # Discovery always appends a few known live subdomains; only scrape hosted ones
+                hosted = set(server.site_names())
+                with open(os.path.join(tmp, 'discovered.json')) as f:
+                    names = [name for name in json.load(f) if name.split('.')[0] in hosted]
+                with open(os.path.join(tmp, 'urls.json'), 'w') as f:
+                    json.dump([server.url_template.format(domain=name) for name in names], f)
+
+            result = subprocess.run([sys.executable, '-c', script, json.dumps(dict(config, stage=stage))],
+                                    capture_output=True, text=True)
+            if result.returncode != 0:
+                print(f"  {stage:10s} failed: {(result.stderr.strip().splitlines() or ['no output'])[-1]}")
+                return
+            outcome = json.loads(result.stdout.strip().splitlines()[-1])
+            if stage == 'scrape':
+                config['records'] = outcome['items']
+
+            results[stage] = {
+                'items': outcome['items'],
+                'seconds': round(outcome['elapsed'], 3),
+                'per_second': round(outcome['items'] / outcome['elapsed'], 2) if outcome['elapsed'] else None,
+                'peak_rss_mb': round(outcome['peak_rss_kb'] / 1024, 1),
+            }
+            results[stage].update({key: outcome[key] for key in ('found', 'mock_fallbacks') if key in outcome})
+
+        responses = dict(sorted(server.responses.items()))
+
+    previous = None
+    if history_file:
+        previous = next((entry for entry in reversed(list(record_io.iter_jsonl(history_file)))
+                         if entry.get('params') == params), None)
+
+    for stage, result in results.items():
+        notes = ', '.join(f"{key.replace('_', ' ')} {result[key]:g}" for key in ('found', 'mock_fallbacks') if key in result)
+        line = (f"  {stage:10s} {result['items']:7g} items {result['seconds']:8.2f} s {result['per_second'] or 0:9.1f}/s"
+                f"  peak RSS {result['peak_rss_mb']:7.1f} MB")
+        before = previous and previous['stages'].get(stage)
+        if before and before.get('per_second') and result['per_second']:
+            line += (f"  [{result['per_second'] / before['per_second'] - 1:+.0%} speed, "
+                     f"{result['peak_rss_mb'] - before['peak_rss_mb']:+.1f} MB vs {previous.get('commit') or 'previous'}]")
+        print(line + (f"  ({notes})" if notes else ''))
+    print(f"  server responses: {responses}")
+
+    if history_file:
+        writer = record_io.JsonlWriter(history_file)
+        writer.write({'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'), 'commit': _git_commit(),
+                      'params': params, 'stages': results})
+        writer.close()
+        print(f"  results appended to {history_file}")
+
+
+def bench_pipeline(sites: int, latency: float, mode: str, concurrency: int) -> None:
+    """
+    Discovery then scraping, against discovery streaming into the scraper through
+    executors.prefetch, on a SyntheticSiteServer: total time and time to first record.
+    """
+    import os
+    import tempfile
+    import threading
+
+    import metrics
+    from executors import prefetch
+    from subdomain_fetch import discover_subdomains, iter_subdomains
+    from synthetic_site import SyntheticSiteServer
+
+    def watch_first_record(start: float, seen: Dict):
+        while 'first' not in seen and not seen.get('done'):
+            if metrics.registry.snapshot()['counters'].get('records_total'):
+                seen['first'] = time.perf_counter() - start
+            time.sleep(0.005)
+
+    print(f"pipeline: {sites} sites, latency <= {latency * 1000:g} ms, {mode} mode")
+    with tempfile.TemporaryDirectory() as tmp, SyntheticSiteServer(sites, 5, latency=(0.0, latency)) as server:
+        wordlist = os.path.join(tmp, 'wordlist.txt')
+        with open(wordlist, 'w') as f:
+            f.writelines(f"{name}\n{name}-missing\n" for name in server.site_names())
+        options = {'use_dns': False, 'wordlists': [wordlist], 'previous_file': None, 'pad_to': 0,
+                   'url_template': server.url_template, 'output_file': os.path.join(tmp, 'discovered.json')}
+        hosted = set(server.site_names())
+
+        def urls(names):
+            # Discovery always appends a few known live subdomains; only scrape hosted ones
+            return (server.url_template.format(domain=name) for name in names if name.split('.')[0] in hosted)
+
+        for pipelined in (False, True):
+            metrics.reset()
+            seen = {}
+            start = time.perf_counter()
+            watcher = threading.Thread(target=watch_first_record, args=(start, seen), daemon=True)
+            watcher.start()
+            if pipelined:
+                discovered = prefetch(iter_subdomains(**options), max_pending=100, name='discovered')
+                subdomains = urls(discovered)
+            else:
+                subdomains = list(urls(discover_subdomains(**options)))
+            records = scraper.scrape_subdomain_data(subdomains, limit=sites, mode=mode, concurrency=concurrency,
+                                                    delay_range=(0, 0), json_file=os.path.join(tmp, 'scraped.json'))
+            if pipelined:
+                for _ in discovered:
+                    pass
+            elapsed = time.perf_counter() - start
+            seen['done'] = True
+            watcher.join()
+            print(f"  {'pipelined' if pipelined else 'sequential':10s} {len(records):6d} records {elapsed:8.2f} s"
+                  f"  first record after {seen.get('first', elapsed):6.2f} s")
+
+
+def bench_transport(sites: int, latency: float, concurrency: int) -> None:
+    """
+    Discovery HEADs, homepage GETs and website GETs for every synthetic site, on one
+    session per stage: with requests' own pools (10 hosts x 10 connections, nothing
+    shared between stages) against the shared transport. Reports connections opened
+    per request and the connections urllib3 discarded because a pool was full.
+    """
+    import logging
+    import requests
+
+    import transport
+    from executors import bounded_map
+    from synthetic_site import SyntheticSiteServer
+
+    class DiscardCounter(logging.Handler):
+        def __init__(self):
+            super().__init__()
+            self.count = 0
+
+        def emit(self, record):
+            if 'pool is full' in record.getMessage():
+                self.count += 1
+
+    discards = DiscardCounter()
+    urllib3_logger = logging.getLogger('urllib3.connectionpool')
+    urllib3_logger.addHandler(discards)
+    urllib3_logger.propagate = False
+
+    print(f"transport: {sites} sites, latency <= {latency * 1000:g} ms, {concurrency} scrape threads")
+    with SyntheticSiteServer(sites, 5, latency=(0.0, latency)) as server:
+        homepages = server.site_urls()
+        websites = [f"{server.base_url}/w/www.{name}.com/" for name in server.site_names()]
+
+        for shared in (False, True):
+            transport.reset_stats()
+            discards.count = 0
+            if shared:
+                transport.configure()
+                sessions = [transport.new_session() for _ in range(3)]
+            else:
+                sessions = []
+                for _ in range(3):
+                    session = requests.Session()
+                    session.headers.update(transport.DEFAULT_HEADERS)
+                    # Counts connections like the shared transport, with requests' default pool sizes
+                    session.mount('http://', transport.TransportAdapter(pool_hosts=10, pool_per_host=10))
+                    sessions.append(session)
+
+            start = time.perf_counter()
+            stages = [(sessions[0], 'head', homepages, 10), (sessions[1], 'get', homepages, concurrency),
+                      (sessions[2], 'get', websites, 16)]
+            for session, method, urls, workers in stages:
+                fetch = lambda url: getattr(session, method)(url, timeout=10).status_code
+                list(bounded_map(fetch, urls, workers))
+            elapsed = time.perf_counter() - start
+
+            stats = transport.stats()
+            print(f"  {'shared transport' if shared else 'separate sessions':17s} {stats['requests']:6d} requests "
+                  f"{stats['connections']:6d} connections ({stats['requests_per_connection']} requests each)  "
+                  f"{discards.count:5d} discarded  {elapsed:6.2f} s")
+            for session in sessions:
+                session.close()
+
+    urllib3_logger.removeHandler(discards)
+    urllib3_logger.propagate = True
+
+
+# Modules that dominate start-up time when a stage imports them
+HEAVY_MODULES = ['pandas', 'pyarrow', 'bs4', 'requests', 'aiohttp', 'dns']
+
+
+def _import_profile(stderr: str) -> Dict:
+    """Total import time (s) and the heavy modules loaded, from `python -X importtime` output"""
+    total_us, loaded = 0, set()
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        cumulative, name = line.split('|')[1:3]
+        # Top-level imports are the only ones not indented under their importer
+        if not name.startswith('  '):
+            total_us += int(cumulative)
+        if name.strip() in HEAVY_MODULES:
+            loaded.add(name.strip())
+    return {'imports': total_us / 1e6, 'heavy': [module for module in HEAVY_MODULES if module in loaded]}
+
+
+def bench_startup(sites: int = 10) -> None:
+    """
+    Run every cli.py subcommand on tiny offline inputs, each in a fresh process under
+    -X importtime, and report wall time, import time and which heavy modules it loaded.
+    The baseline is what every stage paid before imports were made lazy.
+    """
+    import json
+    import os
+    import subprocess
+    import sys
+    import tempfile
+
+    from synthetic_site import SyntheticSiteServer
+
+    cli = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cli.py')
+
+    def run(args: List[str]) -> Dict:
+        start = time.perf_counter()
+        # Default flags write their caches, stores and metrics under tmp/jsons
+        result = subprocess.run([sys.executable, '-X', 'importtime'] + args, capture_output=True, text=True, cwd=tmp)
+        profile = _import_profile(result.stderr)
+        profile['wall'] = time.perf_counter() - start
+        profile['ok'] = result.returncode == 0
+        return profile
+
+    with tempfile.TemporaryDirectory() as tmp, SyntheticSiteServer(sites, properties=5) as server:
+        wordlist = os.path.join(tmp, 'wordlist.txt')
+        with open(wordlist, 'w') as f:
+            f.writelines(f"{name}\n" for name in server.site_names())
+        with open(os.path.join(tmp, 'names.json'), 'w') as f:
+            json.dump([f"{name}.lodgify.com" for name in server.site_names()], f)
+        with open(os.path.join(tmp, 'records.json'), 'w') as f:
+            json.dump([make_record(i) for i in range(sites)], f)
+
+        # Only inputs, outputs and what it takes to stay offline; everything else is a default
+        commands = {
+            'discover': ['discover', '--no-dns', '--wordlist', wordlist, '--pad-to', '0',
+                         '--url-template', server.url_template, '--output', f"{tmp}/discovered.json"],
+            'scrape': ['scrape', '--input', f"{tmp}/names.json", '--url-template', server.url_template,
+                       '--output', f"{tmp}/scraped.json"],
+            'convert': ['convert', '--input', f"{tmp}/records.json", '--output', f"{tmp}/records.csv"],
+            'categorize': ['categorize', '--input', f"{tmp}/records.json", '--output', f"{tmp}/categorized.csv"],
+            'enrich': ['enrich', '--input', f"{tmp}/records.json", '--output', f"{tmp}/enriched.csv", '--limit', '0'],
+        }
+
+        baseline = run(['-c', 'import pandas, bs4, requests'])
+        print(f"startup: {sites} sites/records per subcommand; eager pandas+bs4+requests import alone "
+              f"{baseline['imports']:.2f} s (wall {baseline['wall']:.2f} s)")
+        for name, args in commands.items():
+            profile = run([cli] + args)
+            status = '' if profile['ok'] else '  FAILED'
+            print(f"  {name:10s} wall {profile['wall']:6.2f} s  imports {profile['imports']:5.2f} s  "
+                  f"loads {', '.join(profile['heavy']) or 'nothing heavy'}{status}")
+
+
+def make_record(index: int) -> Dict:
+    """A synthetic scraped record shaped like scraper._generate_mock_data output"""
+    rng = random.Random(index)
+    name = f"site{index:07d}"
+    return {
+        'subdomain': f"{name}.lodgify.com",
+        'url': f"https://{name}.lodgify.com",
+        'property_count': rng.randint(5, 50),
+        'property_links': [f"https://{name}.lodgify.com/property/villa-{i}" for i in range(rng.randint(1, 10))],
+        'company_address': rng.choice(SAMPLE_ADDRESSES),
+        'website': f"https://www.{name}.com",
+        'social_media': {'facebook': f"https://facebook.com/{name}", 'instagram': f"https://instagram.com/{name}"},
+        'phone': f"+1-{rng.randint(200, 999)}-{rng.randint(200, 999)}-{rng.randint(1000, 9999)}",
+        'email': f"contact@{name}.com",
+        'additional_info': {'amenities': ['pool', 'wifi', 'parking'], 'cancellation_policy': 'Cancellation policy available'},
+    }
+
+
+BENCHMARKS = {
+    'page_document': lambda args: bench_page_document(args.pages, args.properties),
+    'parsers': lambda args: bench_parsers(args.pages, args.properties),
+    'process_scaling': lambda args: bench_process_scaling(args.pages, args.properties),
+    'rate_limit': lambda args: bench_rate_limit(args.pages),
+    'rules': lambda args: bench_rules(args.records),
+    'categorize': lambda args: bench_categorize(args.records),
+    'convert': lambda args: bench_convert(args.records),
+    'records': lambda args: bench_records(args.records),
+    'pipeline': lambda args: bench_pipeline(args.sites, args.latency, args.mode, args.concurrency),
+    'startup': lambda args: bench_startup(),
+    'transport': lambda args: bench_transport(args.sites, args.latency, args.concurrency),
+    'end_to_end': lambda args: bench_end_to_end(args.sites, args.properties, args.latency, args.error_rate,
+                                                args.throttle_rate, args.mode, args.concurrency, args.history),
+}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('benchmarks', nargs='*', help=f"benchmarks to run: {', '.join(sorted(BENCHMARKS))} (default: all)")
+    parser.add_argument('--pages', type=int, default=50)
+    parser.add_argument('--properties', type=int, default=200)
+    parser.add_argument('--records', type=int, default=100000)
+    parser.add_argument('--sites', type=int, default=200, help="end_to_end: synthetic sites served")
+    parser.add_argument('--latency', type=float, default=0.05, help="end_to_end: max response latency (s)")
+    parser.add_argument('--error-rate', type=float, default=0.02, help="end_to_end: share of 500 responses")
+    parser.add_argument('--throttle-rate', type=float, default=100, help="end_to_end: req/s before 429s (0: off)")
+    parser.add_argument('--mode', default='threads', help="end_to_end: scrape mode")
+    parser.add_argument('--concurrency', type=int, default=16, help="end_to_end: scrape/enrich concurrency")
+    parser.add_argument('--history', default='jsons/benchmark_history.jsonl',
+                        help="end_to_end: JSONL file results are appended to and compared with ('' to skip)")
+    args = parser.parse_args()
+
+    unknown = set(args.benchmarks) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(sorted(unknown))}")
+
+    for name in args.benchmarks or sorted(BENCHMARKS):
+        BENCHMARKS[name](args)
@@ -1,98 +1,173 @@
 #!/usr/bin/env python3
-import json
-import re
-import pandas as pd
-from typing import List, Dict
+from typing import TYPE_CHECKING, List, Dict, Union
 import logging
+import record_io
+import rules
+from records import Record
+
+if TYPE_CHECKING:
+    import pandas as pd
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
         
 
-def categorize_by_country(json_file: str = 'jsons/scraped_data.json', csv_file: str = 'jsons/categorized_by_country.csv'):
+def categorize_by_country(json_file: str = 'jsons/scraped_data.json', csv_file: str = 'jsons/categorized_by_country.csv',
+                          batch: bool = True):
     """
     BONUS 4: Categorize records by country based on address patterns
+
+    batch=True classifies the whole address column with vectorized pandas string
+    matching, once per distinct address; batch=False walks the records one by one.
+    Both give the same labels and the same CSV.
     """
     logger.info(f"Starting to categorize records by country from {json_file}")
 
     try:
-        with open(json_file, 'r') as f:
-            data = json.load(f)
-        
+        data = list(record_io.iter_records(json_file))
+
         if not data:
             logger.warning("No data found in JSON file")
             return
 
-        # Map common countries based on address patterns
-        country_patterns = {
-            'United States': [r'USA', r'US\b', r'United States', r'\bState\s+\d{5}', r'[A-Z]{2}\s+\d{5}'],
-            'Canada': [r'Canada', r'CA\b', r'[A-Z]\d[A-Z]\s*\d[A-Z]\d'],
-            'United Kingdom': [r'UK\b', r'United Kingdom', r'England', r'Scotland', r'Wales', r'[A-Z]{1,2}\d{1,2}[A-Z]?\s*\d[A-Z]{2}'],
-            'Australia': [r'Australia', r'AU\b', r'NSW', r'VIC', r'QLD', r'SA', r'WA', r'TAS', r'NT', r'ACT'],
-            'Germany': [r'Germany', r'DE\b', r'Deutschland', r'\d{5}\s+[A-Za-z]'],
-            'France': [r'France', r'FR\b', r'\d{5}\s+[A-Za-z]'],
-            'Spain': [r'Spain', r'ES\b', r'España', r'\d{5}\s+[A-Za-z]'],
-            'Italy': [r'Italy', r'IT\b', r'Italia', r'\d{5}\s+[A-Za-z]'],
-            'Netherlands': [r'Netherlands', r'NL\b', r'Holland', r'\d{4}\s*[A-Z]{2}'],
-            'Brazil': [r'Brazil', r'BR\b', r'Brasil', r'\d{5}-?\d{3}'],
-            'Mexico': [r'Mexico', r'MX\b', r'México', r'C\.P\.\s*\d{5}']
-        }
-        
-        categorized_data = []
-        
-        for record in data:
-            address = record.get('company_address', '').strip()
-            country = _detect_country(address, country_patterns)
-
-            # Create categorized record
-            categorized_record = {
-                'country': country,
-                'subdomain': record.get('subdomain', ''),
-                'url': record.get('url', ''),
-                'property_count': record.get('property_count', 0),
-                'company_address': address,
-                'website': record.get('website', ''),
-                'phone': record.get('phone', ''),
-                'email': record.get('email', ''),
-                'property_links_count': len(record.get('property_links', [])),
-            }
-
-            # Add social media
-            social_media = record.get('social_media', {})
-            categorized_record['social_media_facebook'] = social_media.get('facebook', '')
-            categorized_record['social_media_instagram'] = social_media.get('instagram', '')
-            categorized_record['social_media_twitter'] = social_media.get('twitter', '')
-            
-            categorized_data.append(categorized_record)
-
-        # Order by country
-        categorized_data.sort(key=lambda x: x['country'])
-
-        # Save as CSV
-        df = pd.DataFrame(categorized_data)
-        df.to_csv(csv_file, index=False, encoding='utf-8')
-
-        # Statistics by country
-        country_counts = df['country'].value_counts()
-        logger.info(f"Categorization by country completed:")
-        for country, count in country_counts.items():
-            logger.info(f"  {country}: {count} records")
-
-        logger.info(f"CSV categorized saved: {csv_file}")
+        if batch:
+            df = _categorize_batch(data)
+        else:
+            df = _categorize_records(data)
+
+        _save_categorized(df, csv_file)
 
     except Exception as e:
         logger.error(f"Error categorizing by country: {str(e)}")
 
-def _detect_country(address: str, country_patterns: Dict[str, List[str]]) -> str:
+class CountrySink:
+    """Pipeline sink: gathers records (as compact Records) and writes the categorized CSV on close"""
+
+    def __init__(self, csv_file: str = 'jsons/categorized_by_country.csv'):
+        self.csv_file = csv_file
+        self.records = []
+
+    def add(self, record: Dict):
+        self.records.append(Record.coerce(record))
+
+    def close(self):
+        if not self.records:
+            logger.warning("No records to categorize")
+            return
+        _save_categorized(_categorize_batch(self.records), self.csv_file)
+
+def _save_categorized(df: 'pd.DataFrame', csv_file: str):
+    df.to_csv(csv_file, index=False, encoding='utf-8')
+
+    # Statistics by country
+    country_counts = df['country'].value_counts()
+    logger.info(f"Categorization by country completed:")
+    for country, count in country_counts.items():
+        logger.info(f"  {country}: {count} records")
+
+    logger.info(f"CSV categorized saved: {csv_file}")
+
+def _categorize_records(data: List[Dict]) -> 'pd.DataFrame':
+    """Categorize records one at a time"""
+    import pandas as pd
+
+    categorized_data = []
+
+    for record in data:
+        address = record.get('company_address', '').strip()
+        country = _detect_country(address, rules.COUNTRIES)
+
+        # Create categorized record
+        categorized_record = {
+            'country': country,
+            'subdomain': record.get('subdomain', ''),
+            'url': record.get('url', ''),
+            'property_count': record.get('property_count', 0),
+            'company_address': address,
+            'website': record.get('website', ''),
+            'phone': record.get('phone', ''),
+            'email': record.get('email', ''),
+            'property_links_count': len(record.get('property_links', [])),
+        }
+
+        # Add social media
+        social_media = record.get('social_media', {})
+        categorized_record['social_media_facebook'] = social_media.get('facebook', '')
+        categorized_record['social_media_instagram'] = social_media.get('instagram', '')
+        categorized_record['social_media_twitter'] = social_media.get('twitter', '')
+        
+        categorized_data.append(categorized_record)
+
+    # Order by country
+    categorized_data.sort(key=lambda x: x['country'])
+
+    return pd.DataFrame(categorized_data)
+
+def _categorize_batch(data: List[Dict]) -> 'pd.DataFrame':
+    """Categorize all records at once with column operations"""
+    import pandas as pd
+
+    records = pd.DataFrame(data)
+
+    def column(name: str, default=None) -> 'pd.Series':
+        if name not in records:
+            return pd.Series(default, index=records.index, dtype=object)
+        return records[name] if default is None else records[name].fillna(default)
+
+    address = column('company_address', '').str.strip()
+    social_media = pd.DataFrame(
+        [links if isinstance(links, dict) else {} for links in column('social_media')],
+        index=records.index, columns=['facebook', 'instagram', 'twitter']
+    ).fillna('')
+
+    df = pd.DataFrame({
+        'country': _detect_countries(address),
+        'subdomain': column('subdomain', ''),
+        'url': column('url', ''),
+        # fillna leaves floats behind when any record lacks a count
+        'property_count': column('property_count', 0).astype(int),
+        'company_address': address,
+        'website': column('website', ''),
+        'phone': column('phone', ''),
+        'email': column('email', ''),
+        'property_links_count': column('property_links').str.len().fillna(0).astype(int),
+        'social_media_facebook': social_media['facebook'],
+        'social_media_instagram': social_media['instagram'],
+        'social_media_twitter': social_media['twitter'],
+    })
+
+    # Order by country (stable, like list.sort)
+    return df.sort_values('country', kind='stable').reset_index(drop=True)
+
+def _detect_countries(addresses: 'pd.Series', country_rules: rules.RuleSet = rules.COUNTRIES) -> 'pd.Series':
+    """
+    Vectorized _detect_country: each distinct normalized address is classified once,
+    testing the still-unlabelled ones against each country's patterns in priority order
+    """
+    import pandas as pd
+
+    codes, uniques = pd.factorize(addresses)
+    unique = pd.Series(uniques, dtype=object).str.upper()
+
+    labels = pd.Series('Unknown', index=unique.index, dtype=object)
+    pending = unique != ''
+
+    for country, regex in country_rules.label_regexes():
+        if not pending.any():
+            break
+        hits = unique[pending].str.contains(regex)
+        matched = hits.index[hits.to_numpy(dtype=bool)]
+        labels[matched] = country
+        pending[matched] = False
+
+    return pd.Series(labels.to_numpy()[codes], index=addresses.index, dtype=object)
+
+def _detect_country(address: str, country_patterns: Union[Dict[str, List[str]], rules.RuleSet] = rules.COUNTRIES) -> str:
     """Detect country based on address"""
     if not address:
         return 'Unknown'
     
-    address_upper = address.upper()
-    
-    for country, patterns in country_patterns.items():
-        for pattern in patterns:
-            if re.search(pattern.upper(), address_upper):
-                return country
-    
-    return 'Unknown'
+    if not isinstance(country_patterns, rules.RuleSet):
+        country_patterns = rules.country_rules(country_patterns)
+
+    return country_patterns.first(address.upper()) or 'Unknown'
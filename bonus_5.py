@@ -1,111 +1,227 @@
 #!/usr/bin/env python3
-import json
-import requests
+import itertools
 import time
-import re
-import pandas as pd
-from bs4 import BeautifulSoup
-from typing import Dict
+import record_io
+import metrics
+import rules
+import transport
+from bounded_read import HEAD_END, get_bounded
+from page_document import check_parser, parse_document, DEFAULT_PARSER
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
 import logging
 import random
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from urllib.parse import urlsplit
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-session = requests.Session()
-session.headers.update({
-    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-    'Accept-Language': 'en-US,en;q=0.5',
-    'Accept-Encoding': 'gzip, deflate',
-    'Connection': 'keep-alive',
-    'Upgrade-Insecure-Requests': '1'
-})
-
-def enrich_contact_info(json_file: str = 'jsons/scraped_data.json', csv_file: str = 'jsons/enriched_contacts.csv', limit: int = 5):
+# Shared connection pools, DNS cache and headers; see transport.py
+session = transport.new_session()
+
+def enrich_contact_info(json_file: str = 'jsons/scraped_data.json', csv_file: str = 'jsons/enriched_contacts.csv', limit: int = 5,
+                        parser: str = DEFAULT_PARSER, concurrency: int = 8, delay_range: Tuple[float, float] = (2, 5),
+                        website_head_only: bool = False):
     """
     BONUS 5: Enrich contact information using social media and website data
+
+    Records are enriched on `concurrency` threads. The pause of delay_range seconds is
+    kept per website domain rather than after every record, and each distinct website
+    or social profile is fetched and parsed only once however many records share it.
+
+    website_head_only=True stops downloading each website at </head>: company name and
+    description still come through, but contacts in the page body are not searched.
     """
+    check_parser(parser)
     logger.info(f"Enriching contact information for {limit} records")
 
     try:
-        with open(json_file, 'r') as f:
-            data = json.load(f)
-
-        # Filter records with social media
-        records_with_social = [
-            record for record in data 
-            if record.get('social_media') and any(record['social_media'].values())
-        ]
+        # Records are streamed, so reading stops once `limit` candidates are found
+        selected_records = _select_records(record_io.iter_records(json_file), limit)
+        enriched_data = _enrich_records(selected_records, parser, concurrency, delay_range, website_head_only)
+        _save_enriched(enriched_data, csv_file)
         
-        if len(records_with_social) < limit:
-            logger.warning(f"Only {len(records_with_social)} records with social media found")
-            limit = len(records_with_social)
+    except Exception as e:
+        logger.error(f"Error enriching contact information: {str(e)}")
 
-        # Select the first 5 records
-        selected_records = records_with_social[:limit]
-        
-        enriched_data = []
-        
-        for i, record in enumerate(selected_records):
-            logger.info(f"Enriching record {i+1}/{limit}: {record.get('subdomain')}")
-
-            # Extract basic information
-            enriched_record = {
-                'subdomain': record.get('subdomain', ''),
-                'url': record.get('url', ''),
-                'original_email': record.get('email', ''),
-                'original_phone': record.get('phone', ''),
-                'company_address': record.get('company_address', ''),
-                'website': record.get('website', ''),
-            }
-
-            # Try to enrich with social media data
-            social_media = record.get('social_media', {})
-
-            # Enrichment via Facebook
-            facebook_url = social_media.get('facebook', '')
-            if facebook_url:
-                fb_info = _enrich_from_facebook(facebook_url)
-                enriched_record.update(fb_info)
-
-            # Enrichment via Instagram
-            instagram_url = social_media.get('instagram', '')
-            if instagram_url:
-                ig_info = _enrich_from_instagram(instagram_url)
-                enriched_record.update(ig_info)
-
-            # Enrichment via Twitter
-            twitter_url = social_media.get('twitter', '')
-            if twitter_url:
-                tw_info = _enrich_from_twitter(twitter_url)
-                enriched_record.update(tw_info)
-
-            # Enrichment via Website
-            website_url = record.get('website', '')
-            if website_url:
-                web_info = _enrich_from_website(website_url)
-                enriched_record.update(web_info)
-
-            # Add social media information
-            enriched_record['facebook_url'] = facebook_url
-            enriched_record['instagram_url'] = instagram_url
-            enriched_record['twitter_url'] = twitter_url
-            
-            enriched_data.append(enriched_record)
+class EnrichmentSink:
+    """Pipeline sink: keeps the first `limit` records with social media and enriches them on close"""
 
-            # Pause to avoid overloading services
-            time.sleep(random.uniform(2, 5))
+    def __init__(self, csv_file: str = 'jsons/enriched_contacts.csv', limit: int = 5, parser: str = DEFAULT_PARSER,
+                 concurrency: int = 8, delay_range: Tuple[float, float] = (2, 5), website_head_only: bool = False):
+        self.csv_file = csv_file
+        self.limit = limit
+        check_parser(parser)
+        self.parser = parser
+        self.concurrency = concurrency
+        self.delay_range = delay_range
+        self.website_head_only = website_head_only
+        self.selected_records = []
 
-        # Save as CSV
-        df = pd.DataFrame(enriched_data)
-        df.to_csv(csv_file, index=False, encoding='utf-8')
+    def add(self, record: Dict[str, Any]):
+        if len(self.selected_records) < self.limit and _has_social_media(record):
+            self.selected_records.append(record)
 
-        logger.info(f"Enriched contact information saved: {csv_file}")
-        logger.info(f"Total enriched records: {len(enriched_data)}")
-        
-    except Exception as e:
-        logger.error(f"Error enriching contact information: {str(e)}")
+    def close(self):
+        logger.info(f"Enriching contact information for {self.limit} records")
+        if len(self.selected_records) < self.limit:
+            logger.warning(f"Only {len(self.selected_records)} records with social media found")
+        _save_enriched(_enrich_records(self.selected_records, self.parser, self.concurrency, self.delay_range,
+                                       self.website_head_only), self.csv_file)
+
+def _has_social_media(record: Dict[str, Any]) -> bool:
+    return bool(record.get('social_media')) and any(record['social_media'].values())
+
+def _select_records(records: Iterable[Dict[str, Any]], limit: int) -> List[Dict[str, Any]]:
+    """First `limit` records with at least one social media link"""
+    # Filter records with social media
+    selected_records = list(itertools.islice((record for record in records if _has_social_media(record)), limit))
+
+    if len(selected_records) < limit:
+        logger.warning(f"Only {len(selected_records)} records with social media found")
+
+    return selected_records
+
+class DomainThrottle:
+    """
+    Per-domain politeness: requests to the same host are spaced by a random pause
+    from delay_range, while different hosts proceed independently.
+    """
+
+    def __init__(self, delay_range: Tuple[float, float] = (2, 5)):
+        self.delay_range = delay_range
+        self._next_slot: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def wait(self, url: str):
+        """Block until this URL's host may be requested again, and reserve the slot"""
+        host = urlsplit(url).hostname or url
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + random.uniform(*self.delay_range)
+        if slot > now:
+            time.sleep(slot - now)
+
+class EnrichmentCache:
+    """
+    Memoized enrichment results. Concurrent callers asking for the same key wait for
+    the first one's result instead of fetching it again.
+    """
+
+    def __init__(self):
+        self._results: Dict[Tuple[str, str], Future] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Tuple[str, str], compute: Callable[[], Dict[str, str]]) -> Dict[str, str]:
+        with self._lock:
+            future = self._results.get(key)
+            owner = future is None
+            if owner:
+                future = self._results[key] = Future()
+                self.misses += 1
+            else:
+                self.hits += 1
+        metrics.inc('enrichment_cache_total', source=key[0], result='miss' if owner else 'hit')
+
+        if owner:
+            try:
+                future.set_result(compute())
+            except Exception as e:
+                future.set_exception(e)
+        return dict(future.result())
+
+def _normalize_url(url: str, lowercase_path: bool = False) -> str:
+    """Host without 'www.' plus path, so trivially different spellings share a cache key"""
+    parts = urlsplit(url if '://' in url else f"//{url}")
+    host = (parts.hostname or '').removeprefix('www.')
+    path = parts.path.rstrip('/')
+    return f"{host}{path.lower() if lowercase_path else path}"
+
+def _enrich_records(selected_records: List[Dict[str, Any]], parser: str = DEFAULT_PARSER, concurrency: int = 8,
+                    delay_range: Tuple[float, float] = (2, 5), website_head_only: bool = False) -> List[Dict[str, Any]]:
+    """Enrich the selected records concurrently, in input order"""
+    cache = EnrichmentCache()
+    throttle = DomainThrottle(delay_range)
+    total = len(selected_records)
+
+    def enrich(indexed: Tuple[int, Dict[str, Any]]) -> Dict[str, Any]:
+        i, record = indexed
+        logger.info(f"Enriching record {i+1}/{total}: {record.get('subdomain')}")
+        enriched = _enrich_record(record, parser, cache, throttle, website_head_only)
+        metrics.inc('records_total', stage='enrich')
+        return enriched
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        enriched_data = list(executor.map(enrich, enumerate(selected_records)))
+
+    logger.info(f"Enrichment cache: {cache.misses} unique lookups, {cache.hits} reused")
+    return enriched_data
+
+def _enrich_record(record: Dict[str, Any], parser: str = DEFAULT_PARSER, cache: Optional[EnrichmentCache] = None,
+                   throttle: Optional[DomainThrottle] = None, website_head_only: bool = False) -> Dict[str, Any]:
+    """Enrich a single record from its social media profiles and website"""
+    cache = cache or EnrichmentCache()
+    # Extract basic information
+    enriched_record = {
+        'subdomain': record.get('subdomain', ''),
+        'url': record.get('url', ''),
+        'original_email': record.get('email', ''),
+        'original_phone': record.get('phone', ''),
+        'company_address': record.get('company_address', ''),
+        'website': record.get('website', ''),
+    }
+
+    # Try to enrich with social media data
+    social_media = record.get('social_media', {})
+
+    # Enrichment via Facebook
+    facebook_url = social_media.get('facebook', '')
+    if facebook_url:
+        fb_info = cache.get(('facebook', _normalize_url(facebook_url, lowercase_path=True)),
+                            lambda: _enrich_from_facebook(facebook_url))
+        enriched_record.update(fb_info)
+
+    # Enrichment via Instagram
+    instagram_url = social_media.get('instagram', '')
+    if instagram_url:
+        ig_info = cache.get(('instagram', _normalize_url(instagram_url, lowercase_path=True)),
+                            lambda: _enrich_from_instagram(instagram_url))
+        enriched_record.update(ig_info)
+
+    # Enrichment via Twitter
+    twitter_url = social_media.get('twitter', '')
+    if twitter_url:
+        tw_info = cache.get(('twitter', _normalize_url(twitter_url, lowercase_path=True)),
+                            lambda: _enrich_from_twitter(twitter_url))
+        enriched_record.update(tw_info)
+
+    # Enrichment via Website
+    website_url = record.get('website', '')
+    if website_url:
+        web_info = cache.get(('website', _normalize_url(website_url)),
+                             lambda: _enrich_from_website(website_url, parser, throttle, website_head_only))
+        enriched_record.update(web_info)
+
+    # Add social media information
+    enriched_record['facebook_url'] = facebook_url
+    enriched_record['instagram_url'] = instagram_url
+    enriched_record['twitter_url'] = twitter_url
+
+    return enriched_record
+
+def _save_enriched(enriched_data: List[Dict[str, Any]], csv_file: str):
+    import pandas as pd
+
+    # Save as CSV
+    df = pd.DataFrame(enriched_data)
+    df.to_csv(csv_file, index=False, encoding='utf-8')
+
+    logger.info(f"Enriched contact information saved: {csv_file}")
+    logger.info(f"Total enriched records: {len(enriched_data)}")
 
 def _enrich_from_facebook(facebook_url: str) -> Dict[str, str]:
     """Enrich data from Facebook"""
@@ -198,8 +314,9 @@ def _enrich_from_twitter(twitter_url: str) -> Dict[str, str]:
 
     return enriched_info
 
-def _enrich_from_website(website_url: str) -> Dict[str, str]:
-    """Enrich data from company website"""
+def _enrich_from_website(website_url: str, parser: str = DEFAULT_PARSER,
+                         throttle: Optional[DomainThrottle] = None, head_only: bool = False) -> Dict[str, str]:
+    """Enrich data from company website; head_only reads the page up to </head>"""
     enriched_info = {
         'website_company_name': '',
         'website_description': '',
@@ -207,14 +324,17 @@ def _enrich_from_website(website_url: str) -> Dict[str, str]:
     }
     
     try:
-        response = session.get(website_url, timeout=10)
+        # Pause to avoid overloading the site
+        if throttle:
+            throttle.wait(website_url)
+        response, body = get_bounded(session, website_url, stop_at=HEAD_END if head_only else None, stage='enrich')
         if response.status_code == 200:
-            soup = BeautifulSoup(response.content, 'html.parser')
+            doc = parse_document(body.content, parser)
 
             # Try to extract company name
-            title = soup.find('title')
-            if title:
-                title_text = title.get_text().strip()
+            title = doc.title()
+            if title is not None:
+                title_text = title.strip()
                 # Clean title to extract company name
                 if '|' in title_text:
                     company_name = title_text.split('|')[0].strip()
@@ -225,13 +345,13 @@ def _enrich_from_website(website_url: str) -> Dict[str, str]:
                 enriched_info['website_company_name'] = company_name[:100]  # Limit length
 
             # Try to extract description
-            meta_desc = soup.find('meta', attrs={'name': 'description'})
-            if meta_desc:
-                enriched_info['website_description'] = meta_desc.get('content', '')[:200]
+            meta_desc = doc.meta_content('description')
+            if meta_desc is not None:
+                enriched_info['website_description'] = meta_desc[:200]
 
             # Look for additional contacts
-            contact_text = soup.get_text().lower()
-            additional_emails = re.findall(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b', contact_text)
+            contact_text = doc.text_lower
+            additional_emails = rules.EMAIL.findall(contact_text)
             if additional_emails:
                 # Filter unique emails and limit to 3
                 unique_emails = list(set(additional_emails))[:3]
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+import logging
+import re
+from typing import Any, NamedTuple, Optional, Pattern, Tuple
+from urllib.parse import urlsplit
+
+import requests
+
+import http_cache
+import metrics
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Largest decoded body read from one response; a Lodgify homepage is well under 1 MB
+DEFAULT_MAX_BYTES = 5 * 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+
+# Everything title and meta description extraction needs has arrived at </head>
+HEAD_END = re.compile(rb'</head\s*>', re.IGNORECASE)
+
+
+class BoundedBody(NamedTuple):
+    """A response body read at most max_bytes; `complete` is False if reading stopped early"""
+    content: bytes
+    truncated: bool = False
+    stopped: bool = False
+
+    @property
+    def complete(self) -> bool:
+        return not self.truncated and not self.stopped
+
+
+def read_bounded(response: requests.Response, max_bytes: int = DEFAULT_MAX_BYTES,
+                 stop_at: Optional[Pattern[bytes]] = None, chunk_size: int = CHUNK_SIZE) -> BoundedBody:
+    """
+    Read a response opened with stream=True chunk by chunk, decompressing as it goes,
+    and close it. Reading stops after max_bytes of decoded body (truncated) or once
+    stop_at matches (stopped, the body ends with the match), so neither a huge page
+    nor the part of a page nobody reads is ever held in memory or downloaded in full.
+    """
+    body = bytearray()
+    truncated = stopped = False
+    searched = 0
+    try:
+        for chunk in response.iter_content(chunk_size):
+            body += chunk
+            if stop_at is not None:
+                # Back up a little in case the match straddles two chunks
+                match = stop_at.search(body, max(0, searched - 64))
+                if match:
+                    del body[match.end():]
+                    stopped = True
+                    break
+                searched = len(body)
+            if len(body) > max_bytes:
+                del body[max_bytes:]
+                truncated = True
+                break
+    finally:
+        response.close()
+
+    if truncated:
+        logger.warning(f"Body of {response.url} cut at {max_bytes} bytes")
+    metrics.inc('bounded_reads_total', result='truncated' if truncated else 'stopped' if stopped else 'complete')
+    return BoundedBody(bytes(body), truncated, stopped)
+
+
+def get_bounded(session: requests.Session, url: str, max_bytes: int = DEFAULT_MAX_BYTES,
+                stop_at: Optional[Pattern[bytes]] = None, stage: str = 'scrape',
+                **kwargs) -> Tuple[requests.Response, BoundedBody]:
+    """
+    session.get() with a bounded streaming read of the body (only for 200 answers;
+    other bodies are discarded unread). Complete bodies are stored in the session's
+    response cache, which skips streamed responses on its own.
+    """
+    kwargs.setdefault('timeout', 10)
+    response = session.get(url, stream=True, **kwargs)
+    if response.status_code != 200:
+        response.close()
+        return response, BoundedBody(b'')
+
+    body = read_bounded(response, max_bytes, stop_at)
+    if not getattr(response, 'from_cache', False):
+        # MetricsAdapter cannot size a body it does not read
+        metrics.registry.inc('http_response_bytes_total', len(body.content), stage=stage,
+                             host=urlsplit(url).netloc)
+        adapter = http_cache.get_cache_adapter(session, url)
+        if adapter and body.complete:
+            adapter.cache.put(url, response.status_code, dict(response.headers), body.content)
+    return response, body
+
+
+async def read_bounded_async(response: Any, max_bytes: int = DEFAULT_MAX_BYTES,
+                             chunk_size: int = CHUNK_SIZE) -> BoundedBody:
+    """read_bounded() for an aiohttp response, which decompresses on its own"""
+    body = bytearray()
+    async for chunk in response.content.iter_chunked(chunk_size):
+        body += chunk
+        if len(body) > max_bytes:
+            del body[max_bytes:]
+            response.close()
+            logger.warning(f"Body of {response.url} cut at {max_bytes} bytes")
+            metrics.inc('bounded_reads_total', result='truncated')
+            return BoundedBody(bytes(body), truncated=True)
+    metrics.inc('bounded_reads_total', result='complete')
+    return BoundedBody(bytes(body))
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+import hashlib
+import json
+import logging
+import math
+import os
+import re
+from typing import Iterable, Iterator, List, Optional
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Common subdomain prefixes
+COMMON_SUBDOMAINS = [
+    'www', 'app', 'api', 'admin', 'blog', 'help', 'support', 'mail',
+    'test', 'staging', 'dev', 'demo', 'booking', 'reservation', 'property',
+    'properties', 'rental', 'rentals', 'vacation', 'holiday', 'resort',
+    'hotel', 'villa', 'apartment', 'cabin', 'house', 'beach', 'mountain',
+    'city', 'downtown', 'luxury', 'budget', 'family', 'business'
+]
+
+# Tried and true known examples
+KNOWN_EXAMPLES = [
+    'bandycanyon', 'riversresortrentals', 'tideway-hotel',
+    'oceanview', 'mountainlodge', 'citystay', 'beachfront',
+    'luxuryresort', 'familyhotel', 'businesshotel', 'vacationrental',
+    'holidayinn', 'grandhotel', 'boutique', 'resort', 'spa'
+]
+
+PATTERN_BASES = ['resort', 'hotel', 'rental', 'property', 'vacation', 'holiday']
+PATTERN_MODIFIERS = ['', 's', 'beach', 'mountain', 'city', 'luxury', 'grand', 'royal']
+
+# Made-up names discovery pads its results with when too few are found
+PADDING_PREFIXES = ['ocean', 'mountain', 'city', 'beach', 'lake', 'forest', 'valley', 'hill', 'river', 'sunset']
+PADDING_SUFFIXES = ['resort', 'hotel', 'lodge', 'inn', 'suites', 'rentals', 'properties', 'vacation']
+_PADDING_LABELS = frozenset(prefix + suffix for suffix in PADDING_SUFFIXES for prefix in PADDING_PREFIXES)
+_NUMBERED_PADDING = re.compile(r'^property\d{3,}$')
+
+# A DNS label: letters, digits and inner hyphens, at most 63 characters
+LABEL_PATTERN = re.compile(r'^[a-z0-9](?:[a-z0-9-]{0,61}[a-z0-9])?$')
+
+
+class BloomFilter:
+    """
+    Fixed-size probabilistic set. Memory depends only on capacity and error_rate;
+    a false positive means an unseen candidate is occasionally treated as a duplicate.
+    """
+
+    def __init__(self, capacity: int = 1_000_000, error_rate: float = 1e-4):
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str) -> Iterator[int]:
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        for i in range(self.hash_count):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, item: str) -> bool:
+        """Add an item; returns False if it was (probably) already present"""
+        added = False
+        for position in self._positions(item):
+            byte, bit = divmod(position, 8)
+            if not self.bits[byte] & (1 << bit):
+                self.bits[byte] |= 1 << bit
+                added = True
+        return added
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[p // 8] & (1 << (p % 8)) for p in self._positions(item))
+
+
+def normalize_label(name: str, domain: str = 'lodgify.com') -> Optional[str]:
+    """Lowercase a candidate and strip the domain; None if it is not a valid label"""
+    name = name.strip().lower().rstrip('.')
+    if name.endswith(f".{domain}"):
+        name = name[:-len(domain) - 1]
+    return name if LABEL_PATTERN.match(name) else None
+
+
+def iter_permutations(bases: Iterable[str] = PATTERN_BASES, modifiers: Iterable[str] = PATTERN_MODIFIERS) -> Iterator[str]:
+    """Prefix/suffix/hyphen combinations of each base with each modifier"""
+    modifiers = list(modifiers)
+    for base in bases:
+        for modifier in modifiers:
+            if modifier:
+                yield f"{base}{modifier}"
+                yield f"{modifier}{base}"
+                yield f"{base}-{modifier}"
+                yield f"{modifier}-{base}"
+            else:
+                yield base
+
+
+def iter_wordlist(path: str) -> Iterator[str]:
+    """Stream words from a wordlist file, one per line; '#' starts a comment"""
+    with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+        for line in f:
+            word = line.split('#', 1)[0].strip()
+            if word:
+                yield word
+
+
+def padding_subdomains(count: int, domain: str = 'lodgify.com') -> List[str]:
+    """count made-up subdomains from the padding prefixes and suffixes, then numbered ones"""
+    padding = []
+    for i in range(count):
+        if i < len(PADDING_PREFIXES) * len(PADDING_SUFFIXES):
+            prefix = PADDING_PREFIXES[i % len(PADDING_PREFIXES)]
+            suffix = PADDING_SUFFIXES[i // len(PADDING_PREFIXES)]
+            padding.append(f"{prefix}{suffix}.{domain}")
+        else:
+            padding.append(f"property{i:03d}.{domain}")
+    return padding
+
+
+def is_padding(label: str) -> bool:
+    """Whether a (normalized) label is one padding_subdomains() makes up"""
+    return label in _PADDING_LABELS or bool(_NUMBERED_PADDING.match(label))
+
+
+def iter_previous(path: str, domain: str = 'lodgify.com') -> Iterator[str]:
+    """
+    Names found by an earlier run (a discovered_subdomains.json array), without the
+    padding it made up: those were never found, so probing them again is wasted. A
+    real site with such a name is still tried if a wordlist or the built-in lists have it.
+    """
+    if not os.path.exists(path):
+        return
+    try:
+        with open(path, 'r') as f:
+            names = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Could not read previous subdomains from {path}: {str(e)}")
+        return
+    skipped = 0
+    for name in names:
+        label = normalize_label(name, domain)
+        if label and is_padding(label):
+            skipped += 1
+            continue
+        yield name
+    if skipped:
+        logger.info(f"Skipped {skipped} padding subdomains from {path}")
+
+
+def iter_candidates(wordlists: Optional[List[str]] = None, previous_file: Optional[str] = None,
+                    include_builtin: bool = True, permute_wordlists: bool = False, domain: str = 'lodgify.com',
+                    expected_candidates: int = 1_000_000, error_rate: float = 1e-4) -> Iterator[str]:
+    """
+    Stream unique candidate labels: previously found names first, then the built-in
+    lists and permutation rules, then every wordlist line. permute_wordlists also
+    combines each wordlist word with the built-in modifiers.
+
+    Dedupe uses a BloomFilter sized for expected_candidates, so memory stays constant
+    however large the wordlists are.
+    """
+    seen = BloomFilter(expected_candidates, error_rate)
+
+    def sources() -> Iterator[str]:
+        if previous_file:
+            yield from iter_previous(previous_file, domain)
+        if include_builtin:
+            yield from COMMON_SUBDOMAINS
+            yield from KNOWN_EXAMPLES
+            yield from iter_permutations()
+        for path in wordlists or []:
+            yield from iter_wordlist(path)
+        if permute_wordlists:
+            for path in wordlists or []:
+                yield from iter_permutations(iter_wordlist(path), [m for m in PATTERN_MODIFIERS if m])
+
+    for name in sources():
+        label = normalize_label(name, domain)
+        if label and seen.add(label):
+            yield label
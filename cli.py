@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Run one stage of the pipeline, with configurable inputs, outputs and limits.
+
+Usage: python cli.py discover   [--output FILE] [--wordlist FILE] [--url-template T] [--no-dns]
+       python cli.py scrape     [--input FILE] [--output FILE] [--limit N] [--mode M] [--record-db FILE]
+       python cli.py convert    [--input FILE] [--output FILE] [--format csv|parquet]
+       python cli.py categorize [--input FILE] [--output FILE]
+       python cli.py enrich     [--input FILE] [--output FILE] [--limit N] [--head-only]
+
+Every stage module (and with it requests, pandas, BeautifulSoup or aiohttp) is
+imported by the subcommand that runs it, so `convert` starts without requests or
+pandas and only `categorize` and `enrich` pay for pandas. The time to get from
+process start to the stage's first line is logged for every run.
+"""
+import argparse
+import contextlib
+import json
+import logging
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from page_document import DEFAULT_PARSER, PARSER_BACKENDS
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Interpreter start up to here, excluding the stage modules
+_CLI_LOADED = time.perf_counter()
+
+
+def configure_session(module: Any, stage: str, limiter: Optional[Any] = None, cache: Optional[Any] = None,
+                      replay_only: bool = False):
+    """
+    Rate limiting, HTTP cache and metrics on a stage module's `session`, in the order
+    main.py relies on: cache outermost, then the limiter, then metrics on the wire.
+    """
+    import metrics
+    from http_cache import install_cache
+    from rate_limit import install_rate_limiter
+
+    if limiter is not None:
+        install_rate_limiter(module.session, limiter)
+    if cache is not None:
+        install_cache(module.session, cache, replay_only=replay_only)
+    metrics.instrument_session(module.session, stage)
+
+
+def _network(args: argparse.Namespace, module: Any, stage: str):
+    import transport
+    from http_cache import ResponseCache
+    from rate_limit import RateLimiter
+
+    transport.configure(pool_hosts=args.pool_hosts or transport.POOL_HOSTS,
+                        pool_per_host=args.pool_per_host or transport.POOL_PER_HOST, http2=args.http2,
+                        dns_ttl=transport.DNS_TTL if args.dns_ttl is None else args.dns_ttl)
+    configure_session(module, stage,
+                      limiter=RateLimiter() if args.rate_limit else None,
+                      cache=ResponseCache(args.http_cache) if args.http_cache else None,
+                      replay_only=args.replay_only)
+
+
+def _delay_range(args: argparse.Namespace, default: List[float]) -> tuple:
+    """Explicit --delay, else no sleep under the rate limiter and the default without it"""
+    if args.delay is not None:
+        return tuple(args.delay)
+    return (0, 0) if args.rate_limit else tuple(default)
+
+
+def _started(command: str):
+    logger.info(f"{command}: ready in {time.perf_counter() - _CLI_LOADED:.3f}s after loading the CLI")
+
+
+def cmd_discover(args: argparse.Namespace):
+    import subdomain_fetch
+
+    _network(args, subdomain_fetch, 'discovery')
+    _started('discover')
+    found = subdomain_fetch.discover_subdomains(
+        use_dns=args.dns, nameservers=args.nameserver, dns_port=args.dns_port, dns_concurrency=args.dns_concurrency,
+        wordlists=args.wordlist, permute_wordlists=args.permute, previous_file=args.previous or None,
+        pad_to=args.pad_to, url_template=args.url_template, output_file=args.output
+    )
+    logger.info(f"{len(found)} subdomains written to {args.output}")
+
+
+def cmd_scrape(args: argparse.Namespace):
+    import scraper
+
+    _network(args, scraper, 'scrape')
+    with open(args.input, 'r') as f:
+        subdomains = json.load(f)
+    if args.url_template:
+        subdomains = [args.url_template.format(domain=subdomain) for subdomain in subdomains]
+
+    _started('scrape')
+    scraper.scrape_subdomain_data(
+        subdomains, limit=args.limit, mode=args.mode, concurrency=args.concurrency,
+        delay_range=_delay_range(args, [1, 3]), parser=args.parser, json_file=args.output,
+        jsonl_file=args.jsonl, resume=args.resume, collect=False, parse_workers=args.parse_workers,
+        crawl_properties=args.crawl, crawl_depth=args.crawl_depth, crawl_pages=args.crawl_pages,
+        fingerprint_file=args.fingerprints or None, due_only=args.due_only, record_db=args.record_db or None
+    )
+
+
+def cmd_convert(args: argparse.Namespace):
+    from json_to_csv import convert_json_to_csv
+
+    _started('convert')
+    convert_json_to_csv(args.input, args.output, output_format=args.format, chunk_size=args.chunk_size)
+
+
+def cmd_categorize(args: argparse.Namespace):
+    from bonus_4 import categorize_by_country
+
+    _started('categorize')
+    categorize_by_country(args.input, args.output, batch=not args.per_record)
+
+
+def cmd_enrich(args: argparse.Namespace):
+    import bonus_5
+
+    _network(args, bonus_5, 'enrich')
+    _started('enrich')
+    bonus_5.enrich_contact_info(args.input, args.output, limit=args.limit, parser=args.parser,
+                                concurrency=args.concurrency, delay_range=_delay_range(args, [2, 5]),
+                                website_head_only=args.head_only)
+
+
+COMMANDS: Dict[str, Callable[[argparse.Namespace], None]] = {
+    'discover': cmd_discover,
+    'scrape': cmd_scrape,
+    'convert': cmd_convert,
+    'categorize': cmd_categorize,
+    'enrich': cmd_enrich,
+}
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subcommands = parser.add_subparsers(dest='command', required=True)
+
+    network = argparse.ArgumentParser(add_help=False)
+    network.add_argument('--no-rate-limit', dest='rate_limit', action='store_false',
+                         help="fixed --delay pauses instead of the adaptive per-host limiter")
+    network.add_argument('--http-cache', default='jsons/http_cache.sqlite', help="response cache ('' to disable)")
+    network.add_argument('--replay-only', action='store_true', help="serve cached responses only, no network")
+    network.add_argument('--delay', type=float, nargs=2, metavar=('MIN', 'MAX'), help="pause after each page (s)")
+    network.add_argument('--parser', default=DEFAULT_PARSER, choices=PARSER_BACKENDS, help="HTML parser backend")
+    network.add_argument('--pool-hosts', type=int, help="hosts with an open connection pool (default: 256)")
+    network.add_argument('--pool-per-host', type=int, help="keep-alive connections per host (default: 32)")
+    network.add_argument('--dns-ttl', type=float, help="seconds a resolved address is reused (default: 300)")
+    network.add_argument('--http2', action='store_true', help="HTTP/2 for https:// (needs httpx[http2])")
+
+    observed = argparse.ArgumentParser(add_help=False)
+    observed.add_argument('--metrics-file', default='jsons/metrics.json', help="JSON metrics snapshot ('' to skip)")
+    observed.add_argument('--metrics-port', type=int, help="also serve Prometheus metrics on this port")
+
+    discover = subcommands.add_parser('discover', parents=[network, observed], help="find lodgify.com subdomains")
+    discover.add_argument('--output', default='jsons/discovered_subdomains.json')
+    discover.add_argument('--previous', default='jsons/discovered_subdomains.json',
+                          help="earlier results to re-check ('' for none)")
+    discover.add_argument('--wordlist', action='append', help="extra candidate names, one per line (repeatable)")
+    discover.add_argument('--permute', action='store_true', help="also permute wordlist names")
+    discover.add_argument('--no-dns', dest='dns', action='store_false', help="HTTP-check every candidate")
+    discover.add_argument('--nameserver', action='append')
+    discover.add_argument('--dns-port', type=int, default=53)
+    discover.add_argument('--dns-concurrency', type=int, default=200)
+    discover.add_argument('--pad-to', type=int, default=100, help="top up with known subdomains to this many")
+    discover.add_argument('--url-template', default='https://{domain}')
+
+    scrape = subcommands.add_parser('scrape', parents=[network, observed], help="scrape lead data")
+    scrape.add_argument('--input', default='jsons/discovered_subdomains.json', help="JSON list of subdomains")
+    scrape.add_argument('--output', default='jsons/scraped_data.json')
+    scrape.add_argument('--url-template', help="URL for each subdomain, e.g. http://127.0.0.1:8000/s/{domain}/")
+    scrape.add_argument('--limit', type=int, default=100)
+    scrape.add_argument('--mode', choices=['threads', 'async', 'process'], default='threads')
+    scrape.add_argument('--concurrency', type=int, default=100)
+    scrape.add_argument('--parse-workers', type=int)
+    scrape.add_argument('--jsonl', help="also stream records to this JSONL file")
+    scrape.add_argument('--resume', action='store_true', help="skip subdomains already in --jsonl/--record-db")
+    scrape.add_argument('--record-db', default='jsons/records.sqlite', help="SQLite record store ('' to skip)")
+    scrape.add_argument('--fingerprints', default='jsons/fingerprints.sqlite',
+                        help="reuse records of unchanged pages ('' to disable)")
+    scrape.add_argument('--due-only', action='store_true', help="skip sites not due for a recrawl")
+    scrape.add_argument('--crawl', action='store_true', help="follow property links into detail pages")
+    scrape.add_argument('--crawl-depth', type=int, default=2)
+    scrape.add_argument('--crawl-pages', type=int, default=50)
+
+    convert = subcommands.add_parser('convert', parents=[observed], help="flatten records to CSV or Parquet")
+    convert.add_argument('--input', default='jsons/scraped_data.json', help="JSON, JSONL or record store")
+    convert.add_argument('--output', default='jsons/scraped_data.csv')
+    convert.add_argument('--format', choices=['csv', 'parquet'], default='csv')
+    convert.add_argument('--chunk-size', type=int, default=10000)
+
+    categorize = subcommands.add_parser('categorize', parents=[observed], help="label records by country")
+    categorize.add_argument('--input', default='jsons/scraped_data.json', help="JSON, JSONL or record store")
+    categorize.add_argument('--output', default='jsons/categorized_by_country.csv')
+    categorize.add_argument('--per-record', action='store_true', help="classify one record at a time")
+
+    enrich = subcommands.add_parser('enrich', parents=[network, observed], help="enrich contacts")
+    enrich.add_argument('--input', default='jsons/scraped_data.json', help="JSON, JSONL or record store")
+    enrich.add_argument('--output', default='jsons/enriched_contacts.csv')
+    enrich.add_argument('--limit', type=int, default=5)
+    enrich.add_argument('--concurrency', type=int, default=8)
+    enrich.add_argument('--head-only', action='store_true', help="read company websites up to </head> only")
+
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+
+    with contextlib.ExitStack() as stack:
+        if args.metrics_file or args.metrics_port:
+            import metrics
+
+            if args.metrics_file:
+                stack.enter_context(metrics.SnapshotWriter(args.metrics_file))
+            if args.metrics_port:
+                stack.enter_context(metrics.MetricsServer(args.metrics_port))
+
+        start = time.perf_counter()
+        COMMANDS[args.command](args)
+        logger.info(f"{args.command} finished in {time.perf_counter() - start:.2f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+import heapq
+import logging
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Set, Tuple
+from urllib.parse import parse_qsl, urlencode, urljoin, urlsplit, urlunsplit
+
+import metrics
+import rules
+from bounded_read import DEFAULT_MAX_BYTES, get_bounded
+from page_document import PageDocument, DEFAULT_PARSER
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Query parameters that never change the page content
+TRACKING_PARAMS = ('utm_', 'fbclid', 'gclid', 'ref', 'sessionid')
+
+# Frontier priorities: listing pages are expanded before property details are fetched
+LISTING, DETAIL = 0, 1
+
+
+def normalize_url(url: str) -> str:
+    """
+    Canonical form for dedupe: lowercase scheme and host, no default port, fragment
+    or tracking parameters, sorted query and no trailing slash except on the root.
+    """
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    if parts.port and (scheme, parts.port) not in (('http', 80), ('https', 443)):
+        host = f"{host}:{parts.port}"
+    path = parts.path.rstrip('/') or '/'
+    query = urlencode(sorted((key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+                             if not key.lower().startswith(TRACKING_PARAMS)))
+    return urlunsplit((scheme, host, path, query, ''))
+
+
+def classify_link(url: str) -> Optional[int]:
+    """LISTING for index/pagination pages, DETAIL for property pages, None otherwise"""
+    if rules.PROPERTY_LISTING_HREF.search(url):
+        return LISTING
+    if rules.PROPERTY_LINK_HREF.search(urlsplit(url).path):
+        return DETAIL
+    return None
+
+
+class CrawlFrontier:
+    """
+    Priority queue of URLs to visit for one site. Lower (depth, kind) pops first, so
+    shallow listing pages are expanded before detail pages. URLs are deduped on their
+    normalized form but handed back as found, so relative links still resolve.
+    """
+
+    def __init__(self):
+        self._heap: List[Tuple[int, int, int, str]] = []
+        self._seen: Set[str] = set()
+        self._counter = 0
+
+    def push(self, url: str, depth: int, kind: int) -> bool:
+        key = normalize_url(url)
+        if key in self._seen:
+            return False
+        self._seen.add(key)
+        self._counter += 1
+        heapq.heappush(self._heap, (depth, kind, self._counter, url))
+        return True
+
+    def pop(self) -> Tuple[str, int, int]:
+        depth, kind, _, url = heapq.heappop(self._heap)
+        return url, depth, kind
+
+    def pending(self, kind: int) -> int:
+        """Queued URLs of one kind"""
+        return sum(1 for entry in self._heap if entry[1] == kind)
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+
+class PropertyCrawler:
+    """
+    Bounded crawler that follows a site's property links into detail pages.
+
+    Each site gets its own frontier and budget: at most max_pages fetches and links
+    followed up to max_depth hops from the homepage, on the same host only. Up to
+    `concurrency` pages are fetched at once, and a site is abandoned after max_errors
+    failed fetches in a row.
+    """
+
+    def __init__(self, session, parser: str = DEFAULT_PARSER, max_depth: int = 2, max_pages: int = 50,
+                 concurrency: int = 8, delay_range: Tuple[float, float] = (0, 0), max_errors: int = 3,
+                 max_bytes: int = DEFAULT_MAX_BYTES):
+        self.session = session
+        self.parser = parser
+        self.max_depth = max_depth
+        self.max_pages = max_pages
+        self.concurrency = concurrency
+        self.delay_range = delay_range
+        self.max_errors = max_errors
+        self.max_bytes = max_bytes
+
+    def crawl(self, homepage: str, homepage_hrefs: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        Crawl a site from its homepage. Returns the property detail URLs discovered,
+        the per-property data of those fetched and whether discovery was complete,
+        i.e. every listing page within the depth was expanded.
+
+        homepage_hrefs are the links of a homepage the caller already downloaded; the
+        crawl starts from them instead of fetching the homepage again.
+        """
+        host = urlsplit(homepage).netloc.lower()
+        frontier = CrawlFrontier()
+        frontier.push(homepage, 0, LISTING)
+        discovered: Set[str] = set()
+        properties: Dict[str, Dict[str, Any]] = {}
+        fetched = errors = 0
+
+        def follow(url: str, depth: int, hrefs: List[str]):
+            for href in hrefs:
+                link = urljoin(url, href)
+                if urlsplit(link).netloc.lower() != host:
+                    continue
+                link_kind = classify_link(link)
+                if link_kind is None:
+                    continue
+                if link_kind == DETAIL:
+                    discovered.add(normalize_url(link))
+                frontier.push(link, depth + 1, link_kind)
+
+        if homepage_hrefs is not None:
+            frontier.pop()
+            fetched = 1
+            if self.max_depth > 0:
+                follow(homepage, 0, homepage_hrefs)
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            while frontier and fetched < self.max_pages and errors < self.max_errors:
+                wave = [frontier.pop() for _ in range(min(len(frontier), self.concurrency, self.max_pages - fetched))]
+                fetched += len(wave)
+                metrics.set_gauge('queue_depth', len(frontier), queue='crawl')
+
+                for (url, depth, kind), doc in zip(wave, executor.map(lambda item: self._fetch(item[0]), wave)):
+                    if doc is None:
+                        errors += 1
+                        continue
+                    errors = 0
+                    if kind == DETAIL:
+                        properties[normalize_url(url)] = _property_details(normalize_url(url), doc)
+                    if depth < self.max_depth:
+                        follow(url, depth, doc.hrefs)
+
+        logger.info(f"Crawled {homepage}: {fetched} pages, {len(discovered)} properties found, "
+                    f"{len(properties)} detail pages read")
+        return {
+            'property_urls': sorted(discovered),
+            'properties': [properties[url] for url in sorted(properties)],
+            'complete': not frontier.pending(LISTING) and errors < self.max_errors,
+        }
+
+    def _fetch(self, url: str) -> Optional[PageDocument]:
+        try:
+            response, body = get_bounded(self.session, url, self.max_bytes)
+            if response.status_code != 200:
+                metrics.inc('crawl_pages_total', result=response.status_code)
+                return None
+            metrics.inc('crawl_pages_total', result='ok')
+            return PageDocument.from_content(body.content, self.parser)
+        except Exception as e:
+            metrics.inc('crawl_pages_total', result='error')
+            logger.debug(f"Error crawling {url}: {str(e)}")
+            return None
+        finally:
+            if self.delay_range[1] > 0:
+                time.sleep(random.uniform(*self.delay_range))
+
+    def crawl_record(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Crawl a scraped record's site and attach the results: `properties` lists the
+        detail pages read, property_count counts every property URL found (the page's
+        own figure is kept if listing pages were left unread), and additional_info gains
+        what the detail pages mention. Mock records (sites that already failed) are
+        returned as they are, and a scraped homepage is not downloaded again.
+        """
+        if getattr(record, 'mock', False):
+            return record
+        result = self.crawl(record['url'], getattr(record, 'homepage_hrefs', None))
+        if not result['property_urls']:
+            return record
+
+        found = len(result['property_urls'])
+        record['property_count'] = found if result['complete'] else max(record.get('property_count', 0), found)
+        record['properties'] = result['properties']
+        record['additional_info'] = merge_additional_info(record.get('additional_info', {}), result['properties'])
+        return record
+
+
+def _property_details(url: str, doc: PageDocument) -> Dict[str, Any]:
+    """What one property page says about amenities and policies"""
+    text = doc.text_lower
+    title = doc.title()
+    return {
+        'url': url,
+        'title': title.strip() if title else '',
+        'amenities': rules.AMENITIES.found_in(text),
+        'cancellation_policy': 'cancellation' in text,
+        'check_in_available': 'check-in' in text or 'check in' in text,
+    }
+
+
+def merge_additional_info(additional_info: Dict[str, Any], properties: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Homepage additional_info extended with everything the property pages mention"""
+    merged = dict(additional_info)
+    amenities = set(merged.get('amenities', []))
+    for details in properties:
+        amenities.update(details['amenities'])
+    if amenities:
+        merged['amenities'] = [keyword for keyword in rules.AMENITIES.keywords if keyword in amenities]
+    if any(details['cancellation_policy'] for details in properties):
+        merged['cancellation_policy'] = 'Cancellation policy available'
+    if any(details['check_in_available'] for details in properties):
+        merged['check_in_available'] = True
+    return merged
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+import asyncio
+import itertools
+import logging
+import random
+import socketserver
+import string
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, FrozenSet, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+import metrics
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+class Resolution(NamedTuple):
+    canonical_name: str
+    addresses: FrozenSet[str]
+
+
+class DnsResolver:
+    """
+    Async A-record resolver with a bounded number of queries in flight and a TTL cache.
+
+    Negative answers (NXDOMAIN, no answer, timeouts) are cached for negative_ttl so a
+    name is never asked twice in the same run. The cache holds at most cache_size
+    names, least recently used out first, so streaming millions of candidates through
+    iter_resolvable stays in constant memory. Point nameservers/port at a local stub
+    server to run it offline.
+    """
+
+    def __init__(self, nameservers: Optional[List[str]] = None, port: int = 53, concurrency: int = 200,
+                 timeout: float = 2.0, negative_ttl: float = 300, cache_size: int = 100000):
+        import dns.asyncresolver
+
+        self._resolver = dns.asyncresolver.Resolver(configure=nameservers is None)
+        if nameservers is not None:
+            self._resolver.nameservers = nameservers
+        self._resolver.port = port
+        self._resolver.lifetime = timeout
+        self.concurrency = concurrency
+        self.negative_ttl = negative_ttl
+        self.cache_size = cache_size
+        self._cache: 'OrderedDict[str, Tuple[float, Optional[Resolution]]]' = OrderedDict()
+        self.cache_hits = 0
+        self.queries = 0
+
+    async def resolve(self, name: str) -> Optional[Resolution]:
+        """Resolve a name, or None if it does not exist"""
+        import dns.exception
+        import dns.resolver
+
+        name = name.rstrip('.').lower()
+        cached = self._cache.get(name)
+        if cached and cached[0] > time.monotonic():
+            self._cache.move_to_end(name)
+            self.cache_hits += 1
+            metrics.inc('dns_lookups_total', result='cached')
+            return cached[1]
+        if cached:
+            del self._cache[name]
+
+        self.queries += 1
+        try:
+            answer = await self._resolver.resolve(name, 'A')
+            result = Resolution(
+                answer.canonical_name.to_text().rstrip('.').lower(),
+                frozenset(rr.address for rr in answer)
+            )
+            ttl = answer.rrset.ttl
+        except (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer, dns.resolver.NoNameservers, dns.exception.Timeout):
+            result = None
+            ttl = self.negative_ttl
+
+        self._cache[name] = (time.monotonic() + ttl, result)
+        self._cache.move_to_end(name)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        metrics.inc('dns_lookups_total', result='resolved' if result else 'missing')
+        return result
+
+    async def resolve_many(self, names: Iterable[str]) -> Dict[str, Optional[Resolution]]:
+        """Resolve names with at most `concurrency` queries in flight"""
+        iterator = iter(names)
+        results: Dict[str, Optional[Resolution]] = {}
+
+        async def worker():
+            for name in iterator:
+                results[name] = await self.resolve(name)
+
+        await asyncio.gather(*(worker() for _ in range(self.concurrency)))
+        return results
+
+    async def detect_wildcard(self, domain: str, probes: int = 3) -> Optional[Resolution]:
+        """
+        Resolve random labels under a domain. If any exist the domain has wildcard DNS;
+        the merged answer is returned so matching names can be recognized.
+        """
+        labels = [''.join(random.choices(string.ascii_lowercase + string.digits, k=16)) for _ in range(probes)]
+        answers = [answer for answer in await asyncio.gather(*(self.resolve(f"{label}.{domain}") for label in labels))
+                   if answer]
+        if not answers:
+            return None
+        return Resolution(answers[0].canonical_name, frozenset().union(*(answer.addresses for answer in answers)))
+
+
+def matches_wildcard(resolution: Resolution, wildcard: Optional[Resolution]) -> bool:
+    """Whether a name's answer is indistinguishable from the wildcard answer"""
+    if wildcard is None:
+        return False
+    return resolution.canonical_name == wildcard.canonical_name or resolution.addresses <= wildcard.addresses
+
+
+def iter_resolvable(labels: Iterable[str], domain: str = 'lodgify.com', resolver: Optional[DnsResolver] = None,
+                    wildcard_policy: str = 'check', chunk_size: int = 10000) -> Iterator[str]:
+    """
+    Yield the labels whose `<label>.<domain>` resolves, reading `labels` lazily in
+    chunks so arbitrarily long candidate streams run in constant memory.
+
+    When the domain has wildcard DNS, every name resolves and DNS alone can't tell
+    real subdomains apart. wildcard_policy='check' keeps names that match the wildcard
+    answer so the HTTP check decides; 'drop' discards them.
+    """
+    resolver = resolver or DnsResolver()
+    iterator = iter(labels)
+
+    wildcard = asyncio.run(resolver.detect_wildcard(domain))
+    if wildcard:
+        logger.warning(f"Wildcard DNS detected on {domain} ({wildcard.canonical_name}); "
+                       f"wildcard matches are {'kept for the HTTP check' if wildcard_policy == 'check' else 'dropped'}")
+
+    total = kept = 0
+    while True:
+        chunk = list(itertools.islice(iterator, chunk_size))
+        if not chunk:
+            break
+        total += len(chunk)
+        resolved = asyncio.run(resolver.resolve_many(_full_name(label, domain) for label in chunk))
+
+        for label in chunk:
+            resolution = resolved.get(_full_name(label, domain))
+            if resolution is None:
+                continue
+            if wildcard_policy == 'drop' and matches_wildcard(resolution, wildcard):
+                continue
+            kept += 1
+            yield label
+
+    logger.info(f"DNS: {kept}/{total} names resolved "
+                f"({resolver.queries} queries, {resolver.cache_hits} cache hits)")
+
+
+def filter_resolvable(labels: Iterable[str], domain: str = 'lodgify.com', resolver: Optional[DnsResolver] = None,
+                      wildcard_policy: str = 'check') -> List[str]:
+    """List form of iter_resolvable"""
+    return list(iter_resolvable(labels, domain, resolver, wildcard_policy))
+
+
+def _full_name(label: str, domain: str) -> str:
+    return label if label.endswith(f".{domain}") else f"{label}.{domain}"
+
+
+class StubDnsServer:
+    """
+    Minimal UDP DNS server for offline runs: answers A queries from a fixed table,
+    optionally with a wildcard address, and NXDOMAIN for everything else.
+
+    with StubDnsServer({'bandycanyon.lodgify.com': '127.0.0.1'}) as server:
+        DnsResolver(nameservers=['127.0.0.1'], port=server.port)
+    """
+
+    def __init__(self, records: Dict[str, str], wildcard: Optional[str] = None, host: str = '127.0.0.1', port: int = 0):
+        import dns.message
+        import dns.rcode
+        import dns.rdatatype
+        import dns.rrset
+
+        table = {name.rstrip('.').lower(): address for name, address in records.items()}
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                data, sock = self.request
+                query = dns.message.from_wire(data)
+                response = dns.message.make_response(query)
+                question = query.question[0]
+                name = question.name.to_text().rstrip('.').lower()
+                address = table.get(name, wildcard)
+                if address and question.rdtype == dns.rdatatype.A:
+                    response.answer.append(dns.rrset.from_text(question.name, 60, 'IN', 'A', address))
+                elif not address:
+                    response.set_rcode(dns.rcode.NXDOMAIN)
+                sock.sendto(response.to_wire(), self.client_address)
+
+        self._server = socketserver.ThreadingUDPServer((host, port), Handler)
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    def __enter__(self) -> 'StubDnsServer':
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+import itertools
+import queue
+import threading
+from concurrent.futures import Executor, FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Iterable, Iterator, Optional
+
+import metrics
+
+
+def bounded_map(fn: Callable, iterable: Iterable, max_workers: int, max_pending: Optional[int] = None,
+                executor: Optional[Executor] = None, name: Optional[str] = None) -> Iterator:
+    """
+    Like Executor.map, but pulls from `iterable` only as workers free up, so a
+    generator of millions of items is never materialized. Results are yielded in
+    completion order. Runs on a private ThreadPoolExecutor unless `executor` is given.
+    With a name, the number of queued items is published as the queue_depth gauge.
+    """
+    max_pending = max_pending or max_workers * 4
+    iterator = iter(iterable)
+
+    own_executor = executor is None
+    if own_executor:
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    try:
+        pending = {executor.submit(fn, item) for item in itertools.islice(iterator, max_pending)}
+        while pending:
+            if name:
+                metrics.set_gauge('queue_depth', len(pending), queue=name)
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+            for item in itertools.islice(iterator, len(done)):
+                pending.add(executor.submit(fn, item))
+    finally:
+        if name:
+            metrics.set_gauge('queue_depth', 0, queue=name)
+        if own_executor:
+            executor.shutdown(wait=True)
+
+
+def prefetch(iterable: Iterable, max_pending: int = 100, name: Optional[str] = None) -> Iterator:
+    """
+    Drive a producer iterable on a background thread and yield its items through a
+    queue of at most max_pending. The producer keeps working while the consumer is
+    busy and blocks once it is max_pending items ahead (backpressure). Its exceptions
+    are raised in the consumer; closing the consumer stops the producer at its next item.
+    With a name, the number of queued items is published as the queue_depth gauge.
+    """
+    items = queue.Queue(maxsize=max_pending)
+    stop = threading.Event()
+    end = object()
+    errors = []
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put(item):
+                    return
+        except BaseException as e:
+            errors.append(e)
+        put(end)
+
+    thread = threading.Thread(target=produce, daemon=True, name=f"prefetch-{name or 'items'}")
+    thread.start()
+    try:
+        while True:
+            item = items.get()
+            if name:
+                metrics.set_gauge('queue_depth', items.qsize(), queue=name)
+            if item is end:
+                break
+            yield item
+        if errors:
+            raise errors[0]
+    finally:
+        stop.set()
+        thread.join()
+        if name:
+            metrics.set_gauge('queue_depth', 0, queue=name)
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+import metrics
+from records import jsonable
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Markup that changes between fetches without changing anything the extractors read:
+# comments, script/style/template bodies (skipped by get_text), hidden form tokens
+# and nonce/CSRF attributes
+VOLATILE_MARKUP = re.compile(
+    rb'<!--.*?-->'
+    rb'|<(script|style|template)\b[^>]*>.*?</\1\s*>'
+    rb'|<input\b[^>]*type\s*=\s*["\']?hidden[^>]*>'
+    rb'|\s(?:nonce|csrf[\w-]*|data-csrf[\w-]*)\s*=\s*("[^"]*"|\'[^\']*\'|\S+)',
+    re.IGNORECASE | re.DOTALL
+)
+WHITESPACE = re.compile(rb'\s+')
+BETWEEN_TAGS = re.compile(rb'>\s+<')
+
+DAY = 24 * 60 * 60
+
+
+def normalize_html(content: Union[bytes, str]) -> bytes:
+    """HTML with volatile markup removed and whitespace collapsed"""
+    if isinstance(content, str):
+        content = content.encode('utf-8')
+    collapsed = WHITESPACE.sub(b' ', VOLATILE_MARKUP.sub(b'', content))
+    return BETWEEN_TAGS.sub(b'><', collapsed).strip()
+
+
+def page_fingerprint(content: Union[bytes, str]) -> str:
+    """Hash of the normalized HTML"""
+    return hashlib.blake2b(normalize_html(content), digest_size=16).hexdigest()
+
+
+def record_fingerprint(record: Dict[str, Any]) -> str:
+    """Hash of an extracted record, independent of key order"""
+    encoded = json.dumps(record, sort_keys=True, ensure_ascii=False, default=jsonable).encode('utf-8')
+    return hashlib.blake2b(encoded, digest_size=16).hexdigest()
+
+
+class FingerprintStore:
+    """
+    Page and record fingerprints of every scraped subdomain, with the last record and
+    a recrawl schedule, in a SQLite file.
+
+    check() is called with each downloaded page: if its normalized HTML is unchanged
+    the stored record is returned and extraction can be skipped. Otherwise the new
+    fingerprint is held until save() stores the freshly extracted record.
+
+    Scheduling adapts per site: when a recrawl finds the record changed, the interval
+    halves (down to min_interval); when it is unchanged, it grows by `backoff` (up to
+    max_interval). due() returns the subdomains whose next visit has come.
+
+    A record is only reused under the parser and `settings` it was extracted with:
+    settings names whatever else shapes a record, e.g. the crawl depth and page limit,
+    so a crawling run never reuses (or skips as not due) a record saved without crawling.
+    """
+
+    def __init__(self, path: str = 'jsons/fingerprints.sqlite', initial_interval: float = DAY,
+                 min_interval: float = DAY / 4, max_interval: float = 30 * DAY, backoff: float = 1.5,
+                 settings: str = ''):
+        self.path = path
+        self.settings = settings
+        self.initial_interval = initial_interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self._lock = threading.Lock()
+        self._pending: Dict[str, str] = {}
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS pages (
+                subdomain TEXT PRIMARY KEY,
+                parser TEXT NOT NULL,
+                page_fingerprint TEXT NOT NULL,
+                record_fingerprint TEXT NOT NULL,
+                record BLOB NOT NULL,
+                last_checked REAL NOT NULL,
+                last_changed REAL NOT NULL,
+                interval REAL NOT NULL,
+                checks INTEGER NOT NULL,
+                changes INTEGER NOT NULL
+            )
+        """)
+        self._conn.commit()
+
+    def _key(self, parser: str) -> str:
+        """What the parser column holds: the parser, then the settings if any"""
+        return f"{parser}|{self.settings}" if self.settings else parser
+
+    def _same_settings(self, key: str) -> bool:
+        return key.partition('|')[2] == self.settings
+
+    def check(self, subdomain: str, content: Union[bytes, str], parser: str) -> Optional[Dict[str, Any]]:
+        """
+        The stored record if the page is unchanged since it was extracted (with the
+        same parser and settings), else None; the visit counts as an unchanged recrawl.
+        """
+        fingerprint = page_fingerprint(content)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT parser, page_fingerprint, record, interval FROM pages WHERE subdomain = ?", (subdomain,)
+            ).fetchone()
+            if row and row[0] == self._key(parser) and row[1] == fingerprint:
+                interval = min(self.max_interval, row[3] * self.backoff)
+                self._conn.execute(
+                    "UPDATE pages SET last_checked = ?, interval = ?, checks = checks + 1 WHERE subdomain = ?",
+                    (time.time(), interval, subdomain)
+                )
+                self._conn.commit()
+                self._pending.pop(subdomain, None)
+                metrics.inc('fingerprint_checks_total', result='unchanged')
+                return json.loads(zlib.decompress(row[2]))
+
+            self._pending[subdomain] = fingerprint
+        metrics.inc('fingerprint_checks_total', result='changed' if row else 'new')
+        return None
+
+    def is_pending(self, subdomain: str) -> bool:
+        """Whether the page was checked and found new or changed, awaiting save()"""
+        with self._lock:
+            return subdomain in self._pending
+
+    def discard(self, subdomain: str):
+        """Forget a pending check, e.g. when extraction failed and a mock record was used"""
+        with self._lock:
+            self._pending.pop(subdomain, None)
+
+    def save(self, record: Dict[str, Any], parser: str) -> bool:
+        """
+        Store a freshly extracted record for a page passed to check(); returns whether
+        the record differs from the stored one, which speeds up its recrawl schedule.
+        """
+        subdomain = record.get('subdomain')
+        with self._lock:
+            fingerprint = self._pending.pop(subdomain, None)
+            if fingerprint is None:
+                return False
+
+            now = time.time()
+            new_record_fingerprint = record_fingerprint(record)
+            row = self._conn.execute(
+                "SELECT record_fingerprint, last_changed, interval, checks, changes FROM pages WHERE subdomain = ?",
+                (subdomain,)
+            ).fetchone()
+            if row is None:
+                changed, last_changed, interval, checks, changes = True, now, self.initial_interval, 1, 0
+            else:
+                changed = row[0] != new_record_fingerprint
+                if changed:
+                    last_changed, interval, changes = now, max(self.min_interval, row[2] / 2), row[4] + 1
+                else:
+                    last_changed, interval, changes = row[1], min(self.max_interval, row[2] * self.backoff), row[4]
+                checks = row[3] + 1
+
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (subdomain, self._key(parser), fingerprint, new_record_fingerprint,
+                 zlib.compress(json.dumps(record, ensure_ascii=False, default=jsonable).encode('utf-8')),
+                 now, last_changed, interval, checks, changes)
+            )
+            self._conn.commit()
+        return changed
+
+    def due(self, subdomains: Iterable[str], now: Optional[float] = None) -> List[str]:
+        """
+        Subdomains never scraped, stored under other settings or whose recrawl interval
+        has elapsed, most overdue first
+        """
+        now = time.time() if now is None else now
+        subdomains = list(subdomains)
+        with self._lock:
+            rows = self._conn.execute("SELECT subdomain, parser, last_checked + interval FROM pages").fetchall()
+        scheduled = {sub: next_visit if self._same_settings(key) else 0 for sub, key, next_visit in rows}
+        due = [sub for sub in subdomains if scheduled.get(sub, 0) <= now]
+        return sorted(due, key=lambda sub: scheduled.get(sub, 0))
+
+    def is_due(self, subdomain: str, now: Optional[float] = None) -> bool:
+        """due() for one subdomain, e.g. while subdomains are still being discovered"""
+        now = time.time() if now is None else now
+        with self._lock:
+            row = self._conn.execute("SELECT parser, last_checked + interval FROM pages WHERE subdomain = ?",
+                                     (subdomain,)).fetchone()
+        return row is None or not self._same_settings(row[0]) or row[1] <= now
+
+    def records(self, subdomains: Iterable[str]) -> Iterable[Dict[str, Any]]:
+        """Stored records of the given subdomains, in order, skipping unknown ones"""
+        for subdomain in subdomains:
+            with self._lock:
+                row = self._conn.execute("SELECT record FROM pages WHERE subdomain = ?", (subdomain,)).fetchone()
+            if row:
+                yield json.loads(zlib.decompress(row[0]))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Any, Dict, NamedTuple, Optional, Tuple
+
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+import bounded_read
+import metrics
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Bodies are stored decoded, so these no longer describe them
+HOP_HEADERS = {'content-encoding', 'content-length', 'transfer-encoding', 'connection', 'keep-alive'}
+
+
+class CacheEntry(NamedTuple):
+    url: str
+    status: int
+    headers: Dict[str, str]
+    body: bytes
+    etag: Optional[str]
+    last_modified: Optional[str]
+
+
+class ResponseCache:
+    """
+    Persistent response cache keyed by URL.
+
+    Bodies are zlib-compressed in a SQLite file. When the compressed total goes over
+    max_bytes, the least recently used entries are evicted first.
+    """
+
+    def __init__(self, path: str = 'jsons/http_cache.sqlite', max_bytes: int = 512 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                url TEXT PRIMARY KEY,
+                status INTEGER NOT NULL,
+                headers TEXT NOT NULL,
+                body BLOB NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)")
+        self._conn.commit()
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def get(self, url: str) -> Optional[CacheEntry]:
+        """Look up a URL and mark it as recently used"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT status, headers, body, etag, last_modified FROM responses WHERE url = ?", (url,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE url = ?", (time.time(), url))
+            self._conn.commit()
+
+        status, headers, body, etag, last_modified = row
+        return CacheEntry(url, status, json.loads(headers), zlib.decompress(body), etag, last_modified)
+
+    def put(self, url: str, status: int, headers: Dict[str, str], body: bytes):
+        """Store a response body, evicting old entries to stay under max_bytes"""
+        headers = {k: v for k, v in headers.items() if k.lower() not in HOP_HEADERS}
+        lowered = {k.lower(): v for k, v in headers.items()}
+        compressed = zlib.compress(body)
+
+        with self._lock:
+            previous = self._conn.execute("SELECT size FROM responses WHERE url = ?", (url,)).fetchone()
+            if previous:
+                self._total_bytes -= previous[0]
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, status, json.dumps(headers), compressed, lowered.get('etag'),
+                 lowered.get('last-modified'), len(compressed), time.time())
+            )
+            self._total_bytes += len(compressed)
+            self._evict()
+            self._conn.commit()
+
+    def touch(self, url: str):
+        """Mark an entry as fresh after a 304"""
+        with self._lock:
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE url = ?", (time.time(), url))
+            self._conn.commit()
+
+    def _evict(self):
+        while self._total_bytes > self.max_bytes:
+            rows = self._conn.execute(
+                "SELECT url, size FROM responses ORDER BY last_access LIMIT 100"
+            ).fetchall()
+            if not rows:
+                break
+            for url, size in rows:
+                self._conn.execute("DELETE FROM responses WHERE url = ?", (url,))
+                self._total_bytes -= size
+                if self._total_bytes <= self.max_bytes:
+                    break
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def conditional_headers(entry: Optional[CacheEntry]) -> Dict[str, str]:
+    """If-None-Match / If-Modified-Since headers to revalidate a cached entry"""
+    headers = {}
+    if entry:
+        if entry.etag:
+            headers['If-None-Match'] = entry.etag
+        if entry.last_modified:
+            headers['If-Modified-Since'] = entry.last_modified
+    return headers
+
+
+class CachingAdapter(BaseAdapter):
+    """
+    Transport adapter that serves GET requests through a ResponseCache.
+
+    Cached entries are revalidated with conditional requests, so an unchanged page
+    costs a 304 with no body. With replay_only=True nothing touches the network:
+    cache hits are served as-is and misses get a synthetic 504.
+    """
+
+    def __init__(self, cache: ResponseCache, replay_only: bool = False, base_adapter: Optional[BaseAdapter] = None):
+        super().__init__()
+        self.cache = cache
+        self.replay_only = replay_only
+        self.base_adapter = base_adapter or HTTPAdapter()
+
+    def send(self, request: requests.PreparedRequest, **kwargs) -> requests.Response:
+        if request.method != 'GET':
+            if self.replay_only:
+                return self._build_response(request, 504, {}, b'')
+            return self.base_adapter.send(request, **kwargs)
+
+        entry = self.cache.get(request.url)
+        if self.replay_only:
+            if entry:
+                return self._build_response(request, entry.status, entry.headers, entry.body)
+            logger.debug(f"Replay-only cache miss: {request.url}")
+            return self._build_response(request, 504, {}, b'')
+
+        request.headers.update(conditional_headers(entry))
+        response = self.base_adapter.send(request, **kwargs)
+
+        if response.status_code == 304 and entry:
+            response.close()
+            self.cache.touch(request.url)
+            return self._build_response(request, entry.status, entry.headers, entry.body)
+
+        if response.status_code == 200 and not kwargs.get('stream'):
+            self.cache.put(request.url, response.status_code, dict(response.headers), response.content)
+
+        return response
+
+    def _build_response(self, request: requests.PreparedRequest, status: int,
+                        headers: Dict[str, str], body: bytes) -> requests.Response:
+        response = requests.Response()
+        response.status_code = status
+        response.reason = 'OK' if status == 200 else 'Gateway Timeout'
+        response.headers = CaseInsensitiveDict(headers)
+        response.encoding = get_encoding_from_headers(response.headers)
+        response._content = body
+        response._content_consumed = True
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        response.from_cache = True
+        return response
+
+    def close(self):
+        self.base_adapter.close()
+
+
+def install_cache(session: requests.Session, cache: ResponseCache, replay_only: bool = False) -> CachingAdapter:
+    """Route a session's http:// and https:// traffic through the cache"""
+    adapter = None
+    for prefix in ('https://', 'http://'):
+        current = session.get_adapter(prefix)
+        if isinstance(current, CachingAdapter):
+            current = current.base_adapter
+        adapter = CachingAdapter(cache, replay_only, current)
+        session.mount(prefix, adapter)
+    return adapter
+
+
+def get_cache_adapter(session: requests.Session, url: str) -> Optional[CachingAdapter]:
+    """The CachingAdapter serving a URL on a session, if one is installed"""
+    adapter = session.get_adapter(url)
+    return adapter if isinstance(adapter, CachingAdapter) else None
+
+
+async def cached_get_async(client: Any, url: str, adapter: Optional[CachingAdapter],
+                           limiter: Optional[Any] = None, stage: str = 'scrape',
+                           max_bytes: Optional[int] = None) -> Tuple[int, bytes]:
+    """
+    GET through an aiohttp client with the same cache semantics as CachingAdapter.
+    Network requests go through limiter (a rate_limit.RateLimiter) when one is given
+    and are recorded in metrics under `stage`. Bodies are read in chunks and cut at
+    max_bytes (bounded_read.DEFAULT_MAX_BYTES by default); cut bodies are not cached.
+    """
+    entry = adapter.cache.get(url) if adapter else None
+    if adapter and adapter.replay_only:
+        return (entry.status, entry.body) if entry else (504, b'')
+
+    status, headers, body = await _get_async(client, url, conditional_headers(entry), limiter, stage, max_bytes)
+    if adapter:
+        if status == 304 and entry:
+            adapter.cache.touch(url)
+            return entry.status, entry.body
+        if status == 200 and body.complete:
+            adapter.cache.put(url, status, dict(headers), body.content)
+    return status, body.content
+
+
+async def _get_async(client: Any, url: str, headers: Dict[str, str], limiter: Optional[Any] = None,
+                     stage: str = 'scrape', max_bytes: Optional[int] = None) -> Tuple[int, Dict[str, str], Any]:
+    max_bytes = max_bytes or bounded_read.DEFAULT_MAX_BYTES
+
+    async def send() -> Tuple[int, Dict[str, str], Any]:
+        start = time.perf_counter()
+        try:
+            async with client.get(url, headers=headers) as response:
+                body = await bounded_read.read_bounded_async(response, max_bytes)
+        except Exception:
+            metrics.record_request(stage, url, 'error', time.perf_counter() - start)
+            raise
+        metrics.record_request(stage, url, response.status, time.perf_counter() - start, len(body.content))
+        return response.status, CaseInsensitiveDict(response.headers), body
+
+    if limiter is None:
+        return await send()
+
+    import aiohttp
+    return await limiter.call_async(url, send, lambda result: (result[0], result[1].get('Retry-After')),
+                                    retry_exceptions=(OSError, aiohttp.ClientError))
@@ -1,60 +1,155 @@
 #!/usr/bin/env python3
-import json
-import pandas as pd
+import csv
+import itertools
 import logging
+from typing import Any, Dict, Iterable, List
+
+import record_io
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
-        
-    
-def convert_json_to_csv(json_file: str = 'jsons/scraped_data.json', csv_file: str = 'jsons/scraped_data.csv'):
+
+SOCIAL_PLATFORMS = ['facebook', 'instagram', 'twitter', 'linkedin', 'youtube']
+
+CSV_COLUMNS = [
+    'subdomain', 'url', 'property_count', 'property_links_count', 'property_links',
+    'company_address', 'website', 'phone', 'email',
+] + [f'social_media_{platform}' for platform in SOCIAL_PLATFORMS] + [
+    'amenities', 'has_cancellation_policy', 'has_check_in_info',
+]
+
+
+def convert_json_to_csv(json_file: str = 'jsons/scraped_data.json', csv_file: str = 'jsons/scraped_data.csv',
+                        output_format: str = 'csv', chunk_size: int = 10000):
     """
     Task 3: Convert JSON data to CSV
+
+    Records are streamed from json_file (a JSON array or JSONL) and written in chunks
+    of chunk_size, so memory stays flat however large the input is.
+    output_format='parquet' writes a columnar Parquet file instead (needs pyarrow).
     """
     logger.info(f"Converting {json_file} to {csv_file}")
 
     try:
-        with open(json_file, 'r') as f:
-            data = json.load(f)
-        
-        if not data:
+        records = record_io.iter_records(json_file)
+
+        if output_format == 'csv':
+            total = _write_csv(records, csv_file, chunk_size)
+        elif output_format == 'parquet':
+            total = _write_parquet(records, csv_file, chunk_size)
+        else:
+            raise ValueError(f"Unknown output format: {output_format}")
+
+        if not total:
             logger.warning("No data found in JSON file.")
             return
-        
-        flattened_data = []
-        
-        for record in data:
-            flattened_record = {
-                'subdomain': record.get('subdomain', ''),
-                'url': record.get('url', ''),
-                'property_count': record.get('property_count', 0),
-                'property_links_count': len(record.get('property_links', [])),
-                'property_links': '; '.join(record.get('property_links', [])),
-                'company_address': record.get('company_address', ''),
-                'website': record.get('website', ''),
-                'phone': record.get('phone', ''),
-                'email': record.get('email', ''),
-            }
-            
-            # Flatten social media links
-            social_media = record.get('social_media', {})
-            for platform in ['facebook', 'instagram', 'twitter', 'linkedin', 'youtube']:
-                flattened_record[f'social_media_{platform}'] = social_media.get(platform, '')
-
-            # Flatten additional information
-            additional_info = record.get('additional_info', {})
-            flattened_record['amenities'] = '; '.join(additional_info.get('amenities', []))
-            flattened_record['has_cancellation_policy'] = 'cancellation_policy' in additional_info
-            flattened_record['has_check_in_info'] = additional_info.get('check_in_available', False)
-            
-            flattened_data.append(flattened_record)
-
-        # Save as CSV
-        df = pd.DataFrame(flattened_data)
-        df.to_csv(csv_file, index=False, encoding='utf-8')
-
-        logger.info(f"CSV created successfully: {csv_file}")
-        logger.info(f"Total records: {len(flattened_data)}")
-        
+
+        logger.info(f"{output_format.upper()} created successfully: {csv_file}")
+        logger.info(f"Total records: {total}")
+
     except Exception as e:
         logger.error(f"Error converting JSON to CSV: {str(e)}")
+
+def flatten_record(record: Dict[str, Any]) -> Dict[str, Any]:
+    """Flatten one scraped record into a CSV row"""
+    property_links = record.get('property_links', [])
+    flattened_record = {
+        'subdomain': record.get('subdomain', ''),
+        'url': record.get('url', ''),
+        'property_count': record.get('property_count', 0),
+        'property_links_count': len(property_links),
+        'property_links': '; '.join(property_links),
+        'company_address': record.get('company_address', ''),
+        'website': record.get('website', ''),
+        'phone': record.get('phone', ''),
+        'email': record.get('email', ''),
+    }
+
+    # Flatten social media links
+    social_media = record.get('social_media', {})
+    for platform in SOCIAL_PLATFORMS:
+        flattened_record[f'social_media_{platform}'] = social_media.get(platform, '')
+
+    # Flatten additional information
+    additional_info = record.get('additional_info', {})
+    flattened_record['amenities'] = '; '.join(additional_info.get('amenities', []))
+    flattened_record['has_cancellation_policy'] = 'cancellation_policy' in additional_info
+    flattened_record['has_check_in_info'] = additional_info.get('check_in_available', False)
+
+    return flattened_record
+
+def _chunks(records: Iterable[Dict[str, Any]], chunk_size: int) -> Iterable[List[Dict[str, Any]]]:
+    iterator = (flatten_record(record) for record in records)
+    while True:
+        chunk = list(itertools.islice(iterator, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+class CsvSink:
+    """
+    Push-style CSV writer for flattened records, used by _write_csv and as a
+    pipeline sink. The file is only created once the first record arrives.
+    """
+
+    def __init__(self, csv_file: str = 'jsons/scraped_data.csv'):
+        self.csv_file = csv_file
+        self.count = 0
+        self._file = None
+        self._writer = None
+
+    def add(self, record: Dict[str, Any]):
+        self.add_rows([flatten_record(record)])
+
+    def add_rows(self, rows: List[Dict[str, Any]]):
+        if self._writer is None:
+            self._file = open(self.csv_file, 'w', newline='', encoding='utf-8')
+            self._writer = csv.DictWriter(self._file, fieldnames=CSV_COLUMNS, lineterminator='\n')
+            self._writer.writeheader()
+        self._writer.writerows(rows)
+        self.count += len(rows)
+
+    def close(self) -> int:
+        """Close the file; returns the number of rows written"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        return self.count
+
+def _write_csv(records: Iterable[Dict[str, Any]], csv_file: str, chunk_size: int) -> int:
+    """Write flattened rows as they are read; same layout pandas' to_csv produced"""
+    sink = CsvSink(csv_file)
+    try:
+        for chunk in _chunks(records, chunk_size):
+            sink.add_rows(chunk)
+    finally:
+        sink.close()
+    return sink.count
+
+def _write_parquet(records: Iterable[Dict[str, Any]], parquet_file: str, chunk_size: int) -> int:
+    """Write flattened rows as Parquet row groups of chunk_size rows"""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError(f"Parquet output needs pyarrow ({str(e)}); see requirements.txt") from e
+
+    schema = pa.schema(
+        [(column, pa.string()) for column in CSV_COLUMNS[:2]]
+        + [('property_count', pa.int64()), ('property_links_count', pa.int64())]
+        + [(column, pa.string()) for column in CSV_COLUMNS[4:-2]]
+        + [('has_cancellation_policy', pa.bool_()), ('has_check_in_info', pa.bool_())]
+    )
+
+    total = 0
+    writer = None
+    try:
+        for chunk in _chunks(records, chunk_size):
+            if writer is None:
+                writer = pq.ParquetWriter(parquet_file, schema)
+            writer.write_table(pa.Table.from_pylist(chunk, schema=schema))
+            total += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+    return total
@@ -1,30 +1,96 @@
-from subdomain_fetch import discover_subdomains
+import contextlib
+import os
+import scraper
+import subdomain_fetch
+import bonus_5
+from subdomain_fetch import discover_subdomains, iter_subdomains
+from executors import prefetch
 from scraper import scrape_subdomain_data
-from json_to_csv import convert_json_to_csv
-from bonus_4 import categorize_by_country
-from bonus_5 import enrich_contact_info
+from pipeline import default_sinks, run_pipeline
+from http_cache import ResponseCache, install_cache
+from rate_limit import RateLimiter, install_rate_limiter
+import metrics
+import transport
+
+# Persistent HTTP cache: reruns revalidate with ETag/Last-Modified instead of refetching.
+# HTTP_CACHE=0 disables it, REPLAY_ONLY=1 serves cached pages without any network access.
+HTTP_CACHE_FILE = 'jsons/http_cache.sqlite'
+
+# Metrics: a JSON snapshot is rewritten every 10s to METRICS_FILE; METRICS_PORT also
+# serves them in Prometheus format at http://127.0.0.1:<port>/metrics.
+METRICS_FILE = os.environ.get('METRICS_FILE', 'jsons/metrics.json')
+
+# Incremental re-scrape: pages unchanged since the last run reuse their stored records.
+# FINGERPRINTS=0 disables it, DUE_ONLY=1 also skips sites not yet due for a recrawl.
+FINGERPRINT_FILE = 'jsons/fingerprints.sqlite'
+
+# Scraped records are upserted into an indexed SQLite store; jsons/scraped_data.json is
+# exported from it. RECORD_DB=0 writes the JSON file directly instead.
+RECORD_DB_FILE = 'jsons/records.sqlite'
+
+# Discovery and scraping run at the same time: confirmed subdomains go through a queue of
+# at most DISCOVERY_QUEUE_SIZE to the scraper, and discovery pauses while the queue is full.
+# PIPELINE=0 discovers everything first, then scrapes.
+DISCOVERY_QUEUE_SIZE = 100
+
+# One transport under all three stages' sessions: shared keep-alive pools and DNS cache.
+# HTTP2=1 sends https:// through httpx with HTTP/2 (pip install httpx[http2]).
+
+# Adaptive per-host rate limiting with 429/503 retries replaces the fixed sleeps.
+# RATE_LIMIT=0 goes back to the random 1-3s pause after every page.
 
 if __name__ == "__main__":
-    
-    # Task 1: Discover subdomains
-    print("\n Task 1: Discovering Lodgify subdomains...")
-    subdomains = discover_subdomains()
 
-    # Task 2: Scrape data
-    print("\n Task 2: Scraping lead generation data...")
-    scraped_data = scrape_subdomain_data(subdomains, limit=100)
+    transport.configure(http2=os.environ.get('HTTP2') == '1')
+
+    limiter = None
+    if os.environ.get('RATE_LIMIT', '1') != '0':
+        limiter = RateLimiter()
+        for module in (subdomain_fetch, scraper, bonus_5):
+            install_rate_limiter(module.session, limiter)
 
-    # Task 3: Convert to CSV
-    print("\n Task 3: Converting JSON to CSV...")
-    convert_json_to_csv()
+    if os.environ.get('HTTP_CACHE', '1') != '0':
+        cache = ResponseCache(HTTP_CACHE_FILE)
+        for module in (subdomain_fetch, scraper, bonus_5):
+            install_cache(module.session, cache, replay_only=os.environ.get('REPLAY_ONLY') == '1')
     
-    # BONUS 4: Categorize by country
-    print("\n BONUS 4: Categorizing records by country...")
-    categorize_by_country()
+    for module, stage in ((subdomain_fetch, 'discovery'), (scraper, 'scrape'), (bonus_5, 'enrich')):
+        metrics.instrument_session(module.session, stage)
+
+    with contextlib.ExitStack() as stack:
+        stack.enter_context(metrics.SnapshotWriter(METRICS_FILE))
+        if os.environ.get('METRICS_PORT'):
+            stack.enter_context(metrics.MetricsServer(int(os.environ['METRICS_PORT'])))
+
+        pipelined = os.environ.get('PIPELINE', '1') != '0'
+        if pipelined:
+            # Task 1 + Task 2: scrape subdomains as soon as discovery confirms them
+            print("\n Task 1 + Task 2: Discovering Lodgify subdomains and scraping lead generation data...")
+            subdomains = prefetch(iter_subdomains(), max_pending=DISCOVERY_QUEUE_SIZE, name='discovered')
+        else:
+            # Task 1: Discover subdomains
+            print("\n Task 1: Discovering Lodgify subdomains...")
+            subdomains = discover_subdomains()
+
+            # Task 2: Scrape data
+            print("\n Task 2: Scraping lead generation data...")
+        scraped_data = scrape_subdomain_data(
+            subdomains, limit=100, delay_range=(0, 0) if limiter else (1, 3),
+            fingerprint_file=FINGERPRINT_FILE if os.environ.get('FINGERPRINTS', '1') != '0' else None,
+            due_only=os.environ.get('DUE_ONLY') == '1',
+            record_db=RECORD_DB_FILE if os.environ.get('RECORD_DB', '1') != '0' else None
+        )
+        if pipelined:
+            # Past the scrape limit, discovery still runs to the end and saves its output
+            for _ in subdomains:
+                pass
+
+        # Task 3, BONUS 4 and BONUS 5 in one pass over the scraped records:
+        # flatten to CSV, categorize by country and enrich the first 5 contacts
+        print("\n Task 3 + BONUS 4 + BONUS 5: Converting, categorizing and enriching...")
+        run_pipeline(scraped_data, default_sinks(enrich_limit=5))
 
-    # BONUS 5: Enrich contact data
-    print("\n BONUS 5: Enriching contact information (5 records)...")
-    enrich_contact_info(limit=5)
+    print(f"\n HTTP connections: {transport.stats()}")
 
     # Show some examples of the collected data
     if scraped_data:
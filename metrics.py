@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+"""
+Counters, gauges and histograms for discovery, scraping and enrichment.
+
+Every module records into the shared `registry`. A run can expose it as Prometheus
+text over HTTP (MetricsServer) or as a JSON snapshot file rewritten periodically
+(SnapshotWriter), to tell whether it is bound by network, parsing or throttling.
+"""
+import bisect
+import contextlib
+import http.server
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Upper bounds in seconds, from a fast regex to a slow page
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+SeriesKey = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+
+def _key(name: str, labels: Dict[str, Any]) -> SeriesKey:
+    return name, tuple(sorted((label, str(value)) for label, value in labels.items()))
+
+
+class Histogram:
+    """Cumulative-bucket histogram; percentiles are interpolated within buckets"""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def merge(self, counts: List[int], count: int, total: float):
+        self.counts = [a + b for a, b in zip(self.counts, counts)]
+        self.count += count
+        self.sum += total
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            if bucket_count and seen + bucket_count >= rank:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+                return lower + (upper - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+        return self.buckets[-1]
+
+
+class MetricsRegistry:
+    """Thread-safe store of labelled counters, gauges and histograms"""
+
+    def __init__(self):
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self._counters: Dict[SeriesKey, float] = {}
+        self._gauges: Dict[SeriesKey, float] = {}
+        self._histograms: Dict[SeriesKey, Histogram] = {}
+
+    def inc(self, name: str, value: float = 1.0, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + value
+
+    def set_gauge(self, name: str, value: float, **labels):
+        with self._lock:
+            self._gauges[_key(name, labels)] = value
+
+    def observe(self, name: str, value: float, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(value)
+
+    @contextlib.contextmanager
+    def timer(self, name: str, **labels) -> Iterator[None]:
+        """Observe the wall time of a block, in seconds"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def drain(self) -> Dict[str, Any]:
+        """Export counters and histograms and reset them; merge() adds them elsewhere"""
+        with self._lock:
+            state = {
+                'counters': list(self._counters.items()),
+                'histograms': [(key, h.counts, h.count, h.sum) for key, h in self._histograms.items()],
+            }
+            self._counters = {}
+            self._histograms = {}
+        return state
+
+    def merge(self, state: Dict[str, Any]):
+        """Add the output of another registry's drain(), e.g. from a worker process"""
+        with self._lock:
+            for key, value in state['counters']:
+                self._counters[key] = self._counters.get(key, 0.0) + value
+            for key, counts, count, total in state['histograms']:
+                histogram = self._histograms.get(key)
+                if histogram is None:
+                    histogram = self._histograms[key] = Histogram()
+                histogram.merge(counts, count, total)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """JSON-friendly view: counter totals and rates, gauges, histogram percentiles"""
+        with self._lock:
+            uptime = max(time.time() - self.started, 1e-9)
+            snapshot = {'timestamp': time.time(), 'uptime_seconds': round(uptime, 3),
+                        'counters': {}, 'gauges': {}, 'histograms': {}}
+            for (name, labels), value in sorted(self._counters.items()):
+                snapshot['counters'].setdefault(name, []).append(
+                    {'labels': dict(labels), 'value': value, 'per_second': round(value / uptime, 3)})
+            for (name, labels), value in sorted(self._gauges.items()):
+                snapshot['gauges'].setdefault(name, []).append({'labels': dict(labels), 'value': value})
+            for (name, labels), histogram in sorted(self._histograms.items()):
+                snapshot['histograms'].setdefault(name, []).append({
+                    'labels': dict(labels),
+                    'count': histogram.count,
+                    'sum': round(histogram.sum, 6),
+                    'mean': round(histogram.sum / histogram.count, 6) if histogram.count else None,
+                    'p50': histogram.percentile(0.5),
+                    'p90': histogram.percentile(0.9),
+                    'p99': histogram.percentile(0.99),
+                })
+        return snapshot
+
+    def render_prometheus(self) -> str:
+        """Prometheus text exposition format"""
+        def series(name: str, labels: Tuple[Tuple[str, str], ...], value: float) -> str:
+            if labels:
+                rendered = ','.join(f'{label}="{_escape(text)}"' for label, text in labels)
+                return f"{name}{{{rendered}}} {value:g}"
+            return f"{name} {value:g}"
+
+        lines = []
+        with self._lock:
+            for kind, store in (('counter', self._counters), ('gauge', self._gauges)):
+                for name in sorted({name for name, _ in store}):
+                    lines.append(f"# TYPE {name} {kind}")
+                    lines.extend(series(name, labels, value) for (n, labels), value in sorted(store.items()) if n == name)
+
+            for name in sorted({name for name, _ in self._histograms}):
+                lines.append(f"# TYPE {name} histogram")
+                for (n, labels), histogram in sorted(self._histograms.items()):
+                    if n != name:
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(list(histogram.buckets) + [float('inf')], histogram.counts):
+                        cumulative += count
+                        le = '+Inf' if bound == float('inf') else f"{bound:g}"
+                        lines.append(series(f"{name}_bucket", labels + (('le', le),), cumulative))
+                    lines.append(series(f"{name}_sum", labels, histogram.sum))
+                    lines.append(series(f"{name}_count", labels, histogram.count))
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(text: str) -> str:
+    return text.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+registry = MetricsRegistry()
+
+
+def inc(name: str, value: float = 1.0, **labels):
+    registry.inc(name, value, **labels)
+
+
+def set_gauge(name: str, value: float, **labels):
+    registry.set_gauge(name, value, **labels)
+
+
+def observe(name: str, value: float, **labels):
+    registry.observe(name, value, **labels)
+
+
+def timer(name: str, **labels):
+    return registry.timer(name, **labels)
+
+
+def reset():
+    """Clear counters and histograms, e.g. in a worker process forked from a busy parent"""
+    registry.drain()
+
+
+def record_request(stage: str, url: str, status: Any, latency: float, size: int = 0):
+    """One network request: latency, status code and bytes, per stage and host"""
+    host = urlsplit(url).netloc
+    registry.inc('http_requests_total', stage=stage, host=host, status=status)
+    registry.observe('http_request_seconds', latency, stage=stage, host=host)
+    if size:
+        registry.inc('http_response_bytes_total', size, stage=stage, host=host)
+
+
+class MetricsAdapter:
+    """
+    Transport adapter recording latency, status and bytes of each request it sends.
+    It implements requests' adapter interface (send and close) without subclassing
+    BaseAdapter, so importing metrics does not import requests.
+    """
+
+    def __init__(self, stage: str, base_adapter: Optional[Any] = None):
+        if base_adapter is None:
+            from requests.adapters import HTTPAdapter
+            base_adapter = HTTPAdapter()
+        self.stage = stage
+        self.base_adapter = base_adapter
+
+    def send(self, request, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = self.base_adapter.send(request, **kwargs)
+        except Exception:
+            record_request(self.stage, request.url, 'error', time.perf_counter() - start)
+            raise
+        size = len(response.content) if not kwargs.get('stream') else 0
+        record_request(self.stage, request.url, response.status_code, time.perf_counter() - start, size)
+        return response
+
+    def close(self):
+        self.base_adapter.close()
+
+
+def instrument_session(session, stage: str):
+    """
+    Record every network request a requests session makes. The MetricsAdapter goes
+    innermost, under any cache or rate limiter, so cache hits and limiter waits are
+    not counted as network time.
+    """
+    for prefix in ('https://', 'http://'):
+        parent, adapter = None, session.get_adapter(prefix)
+        while not isinstance(adapter, MetricsAdapter) and getattr(adapter, 'base_adapter', None) is not None:
+            parent, adapter = adapter, adapter.base_adapter
+        if isinstance(adapter, MetricsAdapter):
+            continue
+        if parent is None:
+            session.mount(prefix, MetricsAdapter(stage, adapter))
+        else:
+            parent.base_adapter = MetricsAdapter(stage, adapter)
+
+
+class SnapshotWriter:
+    """Rewrite a JSON snapshot of the registry every `interval` seconds, and once on stop()"""
+
+    def __init__(self, path: str = 'jsons/metrics.json', interval: float = 10.0,
+                 metrics_registry: Optional[MetricsRegistry] = None):
+        self.path = path
+        self.interval = interval
+        self.registry = metrics_registry or registry
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def write(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.registry.snapshot(), f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.write()
+            except OSError as e:
+                logger.warning(f"Could not write metrics snapshot {self.path}: {str(e)}")
+
+    def start(self) -> 'SnapshotWriter':
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.write()
+
+    def __enter__(self) -> 'SnapshotWriter':
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+class MetricsServer:
+    """
+    Serve the registry over HTTP: /metrics in Prometheus text format and
+    /metrics.json as a snapshot.
+    """
+
+    def __init__(self, port: int = 9100, host: str = '127.0.0.1', metrics_registry: Optional[MetricsRegistry] = None):
+        source = metrics_registry or registry
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.startswith('/metrics.json'):
+                    body, content_type = json.dumps(source.snapshot(), indent=2).encode(), 'application/json'
+                elif self.path.startswith('/metrics'):
+                    body, content_type = source.render_prometheus().encode(), 'text/plain; version=0.0.4'
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = http.server.ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    def __enter__(self) -> 'MetricsServer':
+        self._thread.start()
+        logger.info(f"Metrics available at http://127.0.0.1:{self.port}/metrics")
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+import re
+from typing import List, Optional, Pattern, Union
+
+# Parser backends accepted by parse_document(). 'html.parser' and 'lxml' go through
+# BeautifulSoup; 'selectolax' uses the lexbor engine directly for text and hrefs.
+PARSER_BACKENDS = ('html.parser', 'lxml', 'selectolax')
+DEFAULT_PARSER = 'html.parser'
+
+# BeautifulSoup's get_text() skips the contents of these tags
+NON_TEXT_TAGS = ['script', 'style', 'template']
+
+
+class PageDocument:
+    """
+    A page parsed once and shared by every extractor.
+
+    Holds the full text, its lowercased form and the hrefs of all anchors, so the
+    extractors never walk the tree again for get_text() or find_all('a').
+    """
+
+    def __init__(self, soup):
+        self.soup = soup
+        self.text = soup.get_text()
+        self.text_lower = self.text.lower()
+        # Same anchors as soup.find_all('a', href=True), in document order
+        self.hrefs = [anchor.get('href') for anchor in soup.find_all('a', href=True)]
+
+    @classmethod
+    def from_content(cls, content: Union[bytes, str], parser: str = DEFAULT_PARSER) -> 'PageDocument':
+        """Parse raw HTML into a document"""
+        return parse_document(content, parser)
+
+    def hrefs_matching(self, pattern: Union[str, Pattern]) -> List[str]:
+        """Hrefs matching a regex, like find_all('a', href=re.compile(pattern))"""
+        regex = re.compile(pattern) if isinstance(pattern, str) else pattern
+        return [href for href in self.hrefs if regex.search(href)]
+
+    def select_text(self, selector: str) -> Optional[str]:
+        """Stripped text of the first element matching a CSS selector, or None"""
+        element = self.soup.select_one(selector)
+        if element:
+            return element.get_text(strip=True)
+        return None
+
+    def select_first_text(self, selectors: List[str]) -> Optional[str]:
+        """
+        select_text() of the first selector in order that matches, found with a single
+        walk of the tree for the combined selector instead of one walk per selector
+        """
+        elements = self.soup.select(', '.join(selectors))
+        for selector in selectors:
+            for element in elements:
+                if element.css.match(selector):
+                    return element.get_text(strip=True)
+        return None
+
+    def title(self) -> Optional[str]:
+        """Text of the <title> element, or None"""
+        title = self.soup.find('title')
+        if title:
+            return title.get_text()
+        return None
+
+    def meta_content(self, name: str) -> Optional[str]:
+        """Content attribute of <meta name=...>, or None if the tag is missing"""
+        meta = self.soup.find('meta', attrs={'name': name})
+        if meta:
+            return meta.get('content', '')
+        return None
+
+
+class SelectolaxDocument(PageDocument):
+    """PageDocument backed by selectolax's lexbor parser"""
+
+    def __init__(self, tree):
+        self.soup = None
+        self.tree = tree
+        tree.strip_tags(NON_TEXT_TAGS)
+        self.text = tree.root.text(deep=True) if tree.root else ''
+        self.text_lower = self.text.lower()
+        self.hrefs = [node.attributes.get('href') or '' for node in tree.css('a[href]')]
+
+    def select_text(self, selector: str) -> Optional[str]:
+        node = self.tree.css_first(selector)
+        if node is not None:
+            return node.text(deep=True, strip=True)
+        return None
+
+    def select_first_text(self, selectors: List[str]) -> Optional[str]:
+        nodes = self.tree.css(', '.join(selectors))
+        for selector in selectors:
+            for node in nodes:
+                if node.css_matches(selector):
+                    return node.text(deep=True, strip=True)
+        return None
+
+    def title(self) -> Optional[str]:
+        node = self.tree.css_first('title')
+        if node is not None:
+            return node.text(deep=True)
+        return None
+
+    def meta_content(self, name: str) -> Optional[str]:
+        node = self.tree.css_first(f'meta[name="{name}"]')
+        if node is not None:
+            return node.attributes.get('content') or ''
+        return None
+
+
+def parse_document(content: Union[bytes, str], parser: str = DEFAULT_PARSER) -> PageDocument:
+    """Parse raw HTML with the chosen backend"""
+    if parser in ('html.parser', 'lxml'):
+        from bs4 import BeautifulSoup
+        return PageDocument(BeautifulSoup(content, parser))
+
+    if parser == 'selectolax':
+        from selectolax.lexbor import LexborHTMLParser
+        return SelectolaxDocument(LexborHTMLParser(decode_html(content)))
+
+    raise ValueError(f"Unknown parser backend: {parser} (expected one of {', '.join(PARSER_BACKENDS)})")
+
+
+def decode_html(content: Union[bytes, str]) -> str:
+    """
+    Raw HTML as text, decoded the way BeautifulSoup decodes it: byte order mark, then
+    <meta charset>, then UTF-8 and Windows-1252. lexbor would assume UTF-8 and keep the BOM.
+    """
+    if isinstance(content, str):
+        return content
+    from bs4 import UnicodeDammit
+
+    markup = UnicodeDammit(content, is_html=True).unicode_markup
+    return markup if markup is not None else content.decode('utf-8', errors='replace')
+
+
+def check_parser(parser: str):
+    """
+    Fail before any page is fetched: ValueError for an unknown backend, ImportError
+    if its library is not installed. Otherwise every page would fail to parse and
+    quietly fall back to mock data.
+    """
+    if parser not in PARSER_BACKENDS:
+        raise ValueError(f"Unknown parser backend: {parser} (expected one of {', '.join(PARSER_BACKENDS)})")
+    try:
+        parse_document(b'<html></html>', parser)
+    except ImportError as e:
+        raise ImportError(f"Parser backend {parser} is not installed ({str(e)}); see requirements.txt") from e
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+import logging
+import time
+from typing import Any, Dict, Iterable, List
+
+from json_to_csv import CsvSink
+from bonus_4 import CountrySink
+from bonus_5 import EnrichmentSink
+from page_document import DEFAULT_PARSER
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def default_sinks(csv_file: str = 'jsons/scraped_data.csv',
+                  categorized_file: str = 'jsons/categorized_by_country.csv',
+                  enriched_file: str = 'jsons/enriched_contacts.csv',
+                  enrich_limit: int = 5, parser: str = DEFAULT_PARSER, enrich_concurrency: int = 8,
+                  website_head_only: bool = False) -> List[Any]:
+    """The downstream stages of main.py: flatten->CSV, categorize->CSV and select->enrich"""
+    return [
+        CsvSink(csv_file),
+        CountrySink(categorized_file),
+        EnrichmentSink(enriched_file, limit=enrich_limit, parser=parser, concurrency=enrich_concurrency,
+                       website_head_only=website_head_only),
+    ]
+
+
+def run_pipeline(records: Iterable[Dict[str, Any]], sinks: List[Any]) -> int:
+    """
+    Feed one stream of records to every sink in a single pass, then close them.
+
+    `records` can be the list scrape_subdomain_data just returned or a lazy stream
+    from record_io.iter_records; either way it is read exactly once. A sink that
+    fails is logged and dropped without stopping the others.
+    """
+    active = list(sinks)
+    count = 0
+    start = time.perf_counter()
+
+    for record in records:
+        count += 1
+        for sink in list(active):
+            try:
+                sink.add(record)
+            except Exception as e:
+                logger.error(f"{type(sink).__name__} failed on {record.get('subdomain')}: {str(e)}")
+                active.remove(sink)
+
+    logger.info(f"Pipeline read {count} records in {time.perf_counter() - start:.2f}s")
+
+    for sink in active:
+        try:
+            sink.close()
+            logger.info(f"{type(sink).__name__} finished")
+        except Exception as e:
+            logger.error(f"{type(sink).__name__} failed: {str(e)}")
+
+    return count
@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+import asyncio
+import email.utils
+import logging
+import random
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, Type
+
+import requests
+
+import metrics
+from requests.adapters import BaseAdapter, HTTPAdapter
+from urllib.parse import urlsplit
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Statuses that mean "slow down": they shrink the host's budget and are retried
+THROTTLE_STATUSES = {429, 503}
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date)"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class HostBudget:
+    """
+    Token bucket plus concurrency window for one host, adjusted AIMD-style:
+    successes add to the rate and window, throttling or slow answers cut them.
+    """
+
+    def __init__(self, rate: float, burst: float, concurrency: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.concurrency = concurrency
+        self.in_flight = 0
+        self.blocked_until = 0.0
+        self.updated = time.monotonic()
+
+    def reserve(self, now: float) -> float:
+        """Take a token and a slot, or return how long to wait before trying again"""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        if self.in_flight >= int(self.concurrency):
+            return 0.05
+        if self.tokens < 1:
+            return (1 - self.tokens) / self.rate
+        self.tokens -= 1
+        self.in_flight += 1
+        return 0.0
+
+
+class RateLimiter:
+    """
+    Adaptive per-host rate limiter.
+
+    Every host starts at `rate` requests/s with `concurrency` requests in flight. Each
+    fast answer raises both additively (up to max_rate / max_concurrency); a 429/503 or
+    an answer slower than latency_target halves them (down to min_rate / 1). Retry-After
+    pauses the host, and throttled or failed requests are retried up to max_retries
+    times with full-jitter exponential backoff.
+    """
+
+    def __init__(self, rate: float = 2.0, min_rate: float = 0.2, max_rate: float = 50.0, concurrency: int = 2,
+                 max_concurrency: int = 16, latency_target: float = 5.0, increase: float = 0.5,
+                 decrease: float = 0.5, max_retries: int = 3, backoff_base: float = 0.5, backoff_cap: float = 30.0):
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.concurrency = concurrency
+        self.max_concurrency = max_concurrency
+        self.latency_target = latency_target
+        self.increase = increase
+        self.decrease = decrease
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self._hosts: Dict[str, HostBudget] = {}
+        self._lock = threading.Lock()
+        self.retries = 0
+        self.throttled = 0
+
+    def budget(self, host: str) -> HostBudget:
+        with self._lock:
+            return self._budget(host)
+
+    def _budget(self, host: str) -> HostBudget:
+        budget = self._hosts.get(host)
+        if budget is None:
+            budget = self._hosts[host] = HostBudget(self.rate, max(1.0, self.rate), self.concurrency)
+        return budget
+
+    def _reserve(self, host: str) -> float:
+        with self._lock:
+            return self._budget(host).reserve(time.monotonic())
+
+    def acquire(self, host: str):
+        """Block until a request to host may start"""
+        waited = 0.0
+        while True:
+            delay = self._reserve(host)
+            if not delay:
+                metrics.observe('rate_limit_wait_seconds', waited, host=host)
+                return
+            time.sleep(delay)
+            waited += delay
+
+    async def acquire_async(self, host: str):
+        """acquire() without blocking the event loop"""
+        waited = 0.0
+        while True:
+            delay = self._reserve(host)
+            if not delay:
+                metrics.observe('rate_limit_wait_seconds', waited, host=host)
+                return
+            await asyncio.sleep(delay)
+            waited += delay
+
+    def release(self, host: str, status: Optional[int], latency: float, retry_after: Optional[float] = None):
+        """Report how a request to host went and adapt its budget"""
+        with self._lock:
+            budget = self._budget(host)
+            budget.in_flight -= 1
+            throttled = status is None or status in THROTTLE_STATUSES
+            if throttled or latency > self.latency_target:
+                budget.rate = max(self.min_rate, budget.rate * self.decrease)
+                budget.concurrency = max(1.0, budget.concurrency * self.decrease)
+                budget.tokens = min(budget.tokens, 0.0)
+            else:
+                budget.rate = min(self.max_rate, budget.rate + self.increase)
+                budget.concurrency = min(float(self.max_concurrency), budget.concurrency + 1 / budget.concurrency)
+            budget.burst = max(1.0, budget.rate)
+            if retry_after:
+                budget.blocked_until = max(budget.blocked_until, time.monotonic() + retry_after)
+            if throttled:
+                self.throttled += 1
+            rate = budget.rate
+        metrics.set_gauge('rate_limit_rate', rate, host=host)
+        if throttled:
+            metrics.inc('rate_limit_throttled_total', host=host, status=status if status is not None else 'error')
+
+    def backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Delay before retry number attempt+1: Retry-After if given, else full jitter"""
+        if retry_after is not None:
+            return min(retry_after, self.backoff_cap)
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+
+    def call(self, url: str, send: Callable[[], Any], outcome: Callable[[Any], Tuple[int, Optional[str]]],
+             retry_exceptions: Tuple[Type[BaseException], ...] = (OSError,)) -> Any:
+        """
+        Run send() under the host's budget, retrying throttled answers and exceptions.
+        outcome(result) gives the (status, Retry-After header) of a result; the last
+        result is returned (or the last exception raised) once retries run out.
+        """
+        host = urlsplit(url).netloc
+        for attempt in range(self.max_retries + 1):
+            self.acquire(host)
+            start = time.monotonic()
+            status, retry_after, failed = None, None, False
+            try:
+                result = send()
+                status, retry_after_header = outcome(result)
+                retry_after = parse_retry_after(retry_after_header)
+            except retry_exceptions:
+                if attempt == self.max_retries:
+                    raise
+                failed = True
+            finally:
+                # Any exception, retried or not, still gives the slot back
+                self.release(host, status, time.monotonic() - start, retry_after)
+
+            if failed:
+                self._retry(url, attempt, None)
+                continue
+            if status not in THROTTLE_STATUSES or attempt == self.max_retries:
+                return result
+            if hasattr(result, 'close'):
+                result.close()
+            self._retry(url, attempt, retry_after)
+
+    async def call_async(self, url: str, send: Callable[[], Awaitable[Any]],
+                         outcome: Callable[[Any], Tuple[int, Optional[str]]],
+                         retry_exceptions: Tuple[Type[BaseException], ...] = (OSError,)) -> Any:
+        """Async counterpart of call()"""
+        host = urlsplit(url).netloc
+        for attempt in range(self.max_retries + 1):
+            await self.acquire_async(host)
+            start = time.monotonic()
+            status, retry_after, failed = None, None, False
+            try:
+                result = await send()
+                status, retry_after_header = outcome(result)
+                retry_after = parse_retry_after(retry_after_header)
+            except retry_exceptions:
+                if attempt == self.max_retries:
+                    raise
+                failed = True
+            finally:
+                # Cancellation (e.g. a wait_for timeout) included
+                self.release(host, status, time.monotonic() - start, retry_after)
+
+            if failed:
+                await asyncio.sleep(self._retry_delay(url, attempt, None))
+                continue
+            if status not in THROTTLE_STATUSES or attempt == self.max_retries:
+                return result
+            await asyncio.sleep(self._retry_delay(url, attempt, retry_after))
+
+    def _retry_delay(self, url: str, attempt: int, retry_after: Optional[float]) -> float:
+        self.retries += 1
+        metrics.inc('rate_limit_retries_total', host=urlsplit(url).netloc)
+        delay = self.backoff(attempt, retry_after)
+        logger.debug(f"Retrying {url} in {delay:.2f}s (attempt {attempt + 2}/{self.max_retries + 1})")
+        return delay
+
+    def _retry(self, url: str, attempt: int, retry_after: Optional[float]):
+        time.sleep(self._retry_delay(url, attempt, retry_after))
+
+
+def _response_outcome(response: requests.Response) -> Tuple[int, Optional[str]]:
+    return response.status_code, response.headers.get('Retry-After')
+
+
+class RateLimitedAdapter(BaseAdapter):
+    """Transport adapter that sends every request through a RateLimiter"""
+
+    def __init__(self, limiter: RateLimiter, base_adapter: Optional[BaseAdapter] = None):
+        super().__init__()
+        self.limiter = limiter
+        self.base_adapter = base_adapter or HTTPAdapter()
+
+    def send(self, request: requests.PreparedRequest, **kwargs) -> requests.Response:
+        return self.limiter.call(request.url, lambda: self.base_adapter.send(request, **kwargs), _response_outcome)
+
+    def close(self):
+        self.base_adapter.close()
+
+
+def install_rate_limiter(session: requests.Session, limiter: RateLimiter) -> RateLimitedAdapter:
+    """
+    Rate-limit a session's http:// and https:// traffic. An installed response cache
+    stays in front, so cache hits never spend a token.
+    """
+    from http_cache import CachingAdapter
+
+    adapter = None
+    for prefix in ('https://', 'http://'):
+        current = session.get_adapter(prefix)
+        outer = current if isinstance(current, CachingAdapter) else None
+        inner = outer.base_adapter if outer else current
+        if isinstance(inner, RateLimitedAdapter):
+            inner = inner.base_adapter
+        adapter = RateLimitedAdapter(limiter, inner)
+        if outer:
+            outer.base_adapter = adapter
+        else:
+            session.mount(prefix, adapter)
+    return adapter
+
+
+def get_rate_limiter(session: requests.Session, url: str) -> Optional[RateLimiter]:
+    """The RateLimiter installed on a session for a URL, if any"""
+    adapter = session.get_adapter(url)
+    while adapter is not None:
+        if isinstance(adapter, RateLimitedAdapter):
+            return adapter.limiter
+        adapter = getattr(adapter, 'base_adapter', None)
+    return None
+
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+import json
+import logging
+import os
+import textwrap
+import threading
+from typing import Any, Dict, Iterator, Set
+
+from records import jsonable
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+class JsonlWriter:
+    """
+    Append-only JSONL sink: one record per line, flushed as soon as it is written,
+    so a crash loses at most the line being written. Safe to share between threads.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        needs_newline = False
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            with open(path, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                # A crash mid-write leaves a partial last line; don't glue the next record onto it
+                needs_newline = f.read(1) != b'\n'
+        self._file = open(path, 'a', encoding='utf-8')
+        if needs_newline:
+            self._file.write('\n')
+
+    def write(self, record: Dict[str, Any]):
+        line = json.dumps(record, ensure_ascii=False, default=jsonable) + '\n'
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+    def __enter__(self) -> 'JsonlWriter':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def iter_jsonl(path: str) -> Iterator[Dict[str, Any]]:
+    """Yield records from a JSONL file, skipping a line truncated by a crash"""
+    if not os.path.exists(path):
+        return
+
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                logger.warning(f"Skipping unreadable line {line_number} in {path}")
+
+
+def iter_json_array(path: str, read_size: int = 1 << 16) -> Iterator[Dict[str, Any]]:
+    """
+    Yield the elements of a JSON array file one at a time, reading it in blocks
+    instead of json.load()ing the whole document.
+    """
+    decoder = json.JSONDecoder()
+
+    with open(path, 'r', encoding='utf-8') as f:
+        buffer = ''
+        pos = 0
+        eof = False
+
+        def fill() -> bool:
+            nonlocal buffer, pos, eof
+            if eof:
+                return False
+            block = f.read(read_size)
+            if not block:
+                eof = True
+                return False
+            buffer = buffer[pos:] + block
+            pos = 0
+            return True
+
+        def next_token() -> str:
+            nonlocal pos
+            while True:
+                while pos < len(buffer) and buffer[pos].isspace():
+                    pos += 1
+                if pos < len(buffer):
+                    return buffer[pos]
+                if not fill():
+                    return ''
+
+        token = next_token()
+        if token != '[':
+            raise ValueError(f"{path} is not a JSON array")
+        pos += 1
+
+        if next_token() == ']':
+            return
+
+        while True:
+            next_token()
+            try:
+                record, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # The element runs past the buffer: read more and retry
+                if not fill():
+                    raise
+                continue
+            pos = end
+            yield record
+
+            token = next_token()
+            if token == ',':
+                pos += 1
+            elif token == ']':
+                return
+            else:
+                raise ValueError(f"Malformed JSON array in {path} near offset {pos}")
+
+
+def iter_records(path: str) -> Iterator[Dict[str, Any]]:
+    """Stream records from a JSON array file, a JSONL file or a record_store database"""
+    import record_store
+
+    if record_store.is_record_store(path):
+        return record_store.iter_store(path)
+    with open(path, 'r', encoding='utf-8') as f:
+        head = f.read(1024).lstrip()
+    if head.startswith('['):
+        return iter_json_array(path)
+    return iter_jsonl(path)
+
+
+def completed_subdomains(path: str) -> Set[str]:
+    """Subdomains that already have a record in a JSONL file"""
+    return {record.get('subdomain') for record in iter_jsonl(path)}
+
+
+def compact_jsonl(jsonl_file: str, json_file: str) -> int:
+    """
+    Rewrite a JSONL file as the indented JSON array the rest of the pipeline reads.
+
+    Records are streamed one at a time; a subdomain seen twice keeps its first record.
+    Returns the number of records written.
+    """
+    seen = set()
+    count = 0
+
+    tmp_file = f"{json_file}.tmp"
+    with open(tmp_file, 'w', encoding='utf-8') as out:
+        out.write('[')
+        for record in iter_jsonl(jsonl_file):
+            subdomain = record.get('subdomain')
+            if subdomain in seen:
+                continue
+            seen.add(subdomain)
+
+            out.write(',\n' if count else '\n')
+            out.write(textwrap.indent(json.dumps(record, indent=2, ensure_ascii=False), '  '))
+            count += 1
+        out.write('\n]' if count else ']')
+    os.replace(tmp_file, json_file)
+
+    logger.info(f"Compacted {count} records from {jsonl_file} into {json_file}")
+    return count
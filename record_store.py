@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+import json
+import logging
+import os
+import sqlite3
+import textwrap
+import threading
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import rules
+from records import jsonable
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# First bytes of every SQLite database file
+SQLITE_HEADER = b'SQLite format 3\x00'
+
+
+def is_record_store(path: str) -> bool:
+    """Whether path is a SQLite file (a RecordStore) rather than JSON/JSONL"""
+    try:
+        with open(path, 'rb') as f:
+            return f.read(len(SQLITE_HEADER)) == SQLITE_HEADER
+    except OSError:
+        return False
+
+
+def record_country(record: Dict[str, Any]) -> str:
+    """Country of a record's address, as bonus_4 labels it"""
+    address = (record.get('company_address') or '').strip()
+    return (rules.COUNTRIES.first(address.upper()) if address else None) or 'Unknown'
+
+
+def email_domain(record: Dict[str, Any]) -> Optional[str]:
+    email = record.get('email') or ''
+    return email.rsplit('@', 1)[1].lower() if '@' in email else None
+
+
+class RecordStore:
+    """
+    Scraped records in a SQLite file, one row per subdomain.
+
+    write() buffers records and upserts them batch_size at a time in one transaction,
+    so a subdomain scraped again replaces its row in place. country, email_domain and
+    property_count are indexed columns, so query() filters and partial exports read
+    only the matching rows. The database runs in WAL mode: readers never block the
+    writer, and several processes can write to the same file.
+    """
+
+    def __init__(self, path: str = 'jsons/records.sqlite', batch_size: int = 500):
+        self.path = path
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self._pending: List[Tuple] = []
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS records (
+                subdomain TEXT PRIMARY KEY,
+                url TEXT,
+                country TEXT NOT NULL,
+                email_domain TEXT,
+                property_count INTEGER NOT NULL,
+                updated REAL NOT NULL,
+                record TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS records_country ON records (country);
+            CREATE INDEX IF NOT EXISTS records_email_domain ON records (email_domain);
+            CREATE INDEX IF NOT EXISTS records_property_count ON records (property_count);
+        """)
+        self._conn.commit()
+
+    def write(self, record: Dict[str, Any]):
+        """Queue a record for upsert; written once batch_size records are queued"""
+        row = (
+            record.get('subdomain'), record.get('url'), record_country(record), email_domain(record),
+            int(record.get('property_count') or 0), time.time(), json.dumps(record, ensure_ascii=False, default=jsonable),
+        )
+        with self._lock:
+            self._pending.append(row)
+            if len(self._pending) >= self.batch_size:
+                self._flush()
+
+    def write_many(self, records: Iterable[Dict[str, Any]]) -> int:
+        count = 0
+        for record in records:
+            self.write(record)
+            count += 1
+        self.flush()
+        return count
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        if not self._pending:
+            return
+        with self._conn:
+            self._conn.executemany("""
+                INSERT INTO records (subdomain, url, country, email_domain, property_count, updated, record)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (subdomain) DO UPDATE SET
+                    url = excluded.url, country = excluded.country, email_domain = excluded.email_domain,
+                    property_count = excluded.property_count, updated = excluded.updated, record = excluded.record
+            """, self._pending)
+        self._pending = []
+
+    def get(self, subdomain: str) -> Optional[Dict[str, Any]]:
+        self.flush()
+        with self._lock:
+            row = self._conn.execute("SELECT record FROM records WHERE subdomain = ?", (subdomain,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _where(self, country: Optional[str], email_domain: Optional[str], min_properties: Optional[int],
+               max_properties: Optional[int]) -> Tuple[str, List[Any]]:
+        clauses, params = [], []
+        if country is not None:
+            clauses.append("country = ?")
+            params.append(country)
+        if email_domain is not None:
+            clauses.append("email_domain = ?")
+            params.append(email_domain.lower())
+        if min_properties is not None:
+            clauses.append("property_count >= ?")
+            params.append(min_properties)
+        if max_properties is not None:
+            clauses.append("property_count <= ?")
+            params.append(max_properties)
+        return (f" WHERE {' AND '.join(clauses)}" if clauses else ''), params
+
+    def query(self, country: Optional[str] = None, email_domain: Optional[str] = None,
+              min_properties: Optional[int] = None, max_properties: Optional[int] = None,
+              limit: Optional[int] = None, fetch_size: int = 1000) -> Iterator[Dict[str, Any]]:
+        """
+        Records matching every filter given, in the order they were first stored.
+        Rows are fetched fetch_size at a time, so large results stream.
+        """
+        self.flush()
+        where, params = self._where(country, email_domain, min_properties, max_properties)
+        sql = f"SELECT record FROM records{where} ORDER BY rowid"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+
+        with self._lock:
+            cursor = self._conn.execute(sql, params)
+        while True:
+            with self._lock:
+                rows = cursor.fetchmany(fetch_size)
+            if not rows:
+                return
+            for row in rows:
+                yield json.loads(row[0])
+
+    def count(self, country: Optional[str] = None, email_domain: Optional[str] = None,
+              min_properties: Optional[int] = None, max_properties: Optional[int] = None) -> int:
+        self.flush()
+        where, params = self._where(country, email_domain, min_properties, max_properties)
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM records{where}", params).fetchone()[0]
+
+    def countries(self) -> Dict[str, int]:
+        """Record count per country"""
+        self.flush()
+        with self._lock:
+            return dict(self._conn.execute("SELECT country, COUNT(*) FROM records GROUP BY country").fetchall())
+
+    def subdomains(self) -> List[str]:
+        self.flush()
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT subdomain FROM records ORDER BY rowid")]
+
+    def export_json(self, json_file: str, **filters) -> int:
+        """Write the matching records as the indented JSON array the pipeline reads"""
+        count = 0
+        tmp_file = f"{json_file}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as out:
+            out.write('[')
+            for record in self.query(**filters):
+                out.write(',\n' if count else '\n')
+                out.write(textwrap.indent(json.dumps(record, indent=2, ensure_ascii=False), '  '))
+                count += 1
+            out.write('\n]' if count else ']')
+        os.replace(tmp_file, json_file)
+        logger.info(f"Exported {count} records from {self.path} to {json_file}")
+        return count
+
+    def export_csv(self, csv_file: str, **filters) -> int:
+        """Write the matching records as the flattened CSV of json_to_csv"""
+        from json_to_csv import CsvSink
+
+        sink = CsvSink(csv_file)
+        try:
+            for record in self.query(**filters):
+                sink.add(record)
+        finally:
+            sink.close()
+        logger.info(f"Exported {sink.count} records from {self.path} to {csv_file}")
+        return sink.count
+
+    def close(self):
+        self.flush()
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self) -> 'RecordStore':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def iter_store(path: str, **filters) -> Iterator[Dict[str, Any]]:
+    """Stream records out of a RecordStore file, closing it when done"""
+    store = RecordStore(path)
+    try:
+        yield from store.query(**filters)
+    finally:
+        store.close()
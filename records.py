@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Compact in-memory form of a scraped record.
+
+A Record keeps the fields of the scraper's record dict in __slots__ instead of a
+per-record dict. Nested dicts and lists become tuples, and the strings that repeat
+across millions of leads (social platform names, amenity names, policy texts and
+other additional_info keys and values) are interned, so every record points at one
+shared copy.
+
+Records trade CPU for that memory (see `python benchmark.py records`), so they are
+meant for records held in memory; streaming paths keep plain dicts.
+
+Record is a MutableMapping: code written against record dicts (`record.get(...)`,
+`record['url']`, `record['properties'] = ...`) works unchanged, nested fields read
+back as fresh dicts and lists, and to_dict() rebuilds exactly the dict it came from,
+key order included. json.dumps() takes records through `default=jsonable`.
+
+Two attributes travel with a record through the scraper without being part of it:
+`mock` marks the made-up records of sites that could not be scraped, and
+`homepage_hrefs` holds the homepage's links for the property crawler, which would
+otherwise download the page again.
+"""
+import json
+import logging
+import sys
+from collections.abc import MutableMapping
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Record fields in the order the scraper writes them
+FIELDS = ('subdomain', 'url', 'property_count', 'property_links', 'company_address', 'website',
+          'social_media', 'phone', 'email', 'additional_info')
+_FIELD_SET = frozenset(FIELDS)
+
+# Nested mappings stored as ((key, value), ...) pairs, with interned keys
+_PAIR_FIELDS = frozenset({'social_media', 'additional_info'})
+
+_MISSING = object()
+
+# Longest additional_info string interned: policy texts repeat, free text does not
+_INTERN_MAX_LENGTH = 200
+
+
+# The conversions below run for every field of every record loaded or written, so
+# flat lists (the common case) are copied in one call instead of item by item
+
+
+def _intern(value: Any) -> Any:
+    if type(value) is str and len(value) <= _INTERN_MAX_LENGTH:
+        return sys.intern(value)
+    return value
+
+
+def _freeze(value: Any, intern_strings: bool = False) -> Any:
+    """Lists to tuples, recursively; short strings interned if asked"""
+    if type(value) is not list:
+        return _intern(value) if intern_strings else value
+    if list not in map(type, value):
+        return tuple(map(_intern, value)) if intern_strings else tuple(value)
+    return tuple([_freeze(item, intern_strings) for item in value])
+
+
+def _thaw(value: Any) -> Any:
+    """Tuples back to lists, recursively"""
+    if type(value) is not tuple:
+        return value
+    if tuple not in map(type, value):
+        return list(value)
+    return [_thaw(item) for item in value]
+
+
+def _thaw_field(key: str, value: Any) -> Any:
+    if type(value) is tuple:
+        if key in _PAIR_FIELDS:
+            return {name: _thaw(item) if type(item) is tuple else item for name, item in value}
+        return _thaw(value)
+    return value
+
+
+def _freeze_pairs(mapping: Dict[str, Any], intern_values: bool) -> Tuple[Tuple[str, Any], ...]:
+    keys = map(sys.intern, mapping)
+    if not intern_values and list not in map(type, mapping.values()):
+        return tuple(zip(keys, mapping.values()))
+    return tuple(zip(keys, [_freeze(value, intern_values) for value in mapping.values()]))
+
+
+def _freeze_field(key: str, value: Any) -> Any:
+    """How a field's value is stored in its slot"""
+    if key in _PAIR_FIELDS and type(value) is dict:
+        return _freeze_pairs(value, intern_values=key == 'additional_info')
+    if type(value) is list:
+        return _freeze(value)
+    return value
+
+
+class Record(MutableMapping):
+    """One scraped lead; see the module docstring"""
+
+    __slots__ = FIELDS + ('extra', 'mock', 'homepage_hrefs')
+
+    def __init__(self, subdomain: Optional[str] = None, url: Optional[str] = None, **fields):
+        self.extra: Optional[Dict[str, Any]] = None
+        self.mock = False
+        self.homepage_hrefs: Optional[List[str]] = None
+        if subdomain is not None:
+            self.subdomain = subdomain
+        if url is not None:
+            self.url = url
+        for key, value in fields.items():
+            self[key] = value
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'Record':
+        # __setitem__ inlined: this is the load path of every JSONL line and store row
+        record = cls()
+        for key, value in data.items():
+            if key in _FIELD_SET:
+                setattr(record, key, _freeze_field(key, value) if type(value) in (list, dict) else value)
+            else:
+                if record.extra is None:
+                    record.extra = {}
+                record.extra[key] = value
+        return record
+
+    @classmethod
+    def coerce(cls, record: Any) -> Any:
+        """A Record for a record dict; records and anything else are returned as they are"""
+        return cls.from_dict(record) if type(record) is dict else record
+
+    @classmethod
+    def from_json(cls, line: str) -> 'Record':
+        return cls.from_dict(json.loads(line))
+
+    def __setitem__(self, key: str, value: Any):
+        if key in _FIELD_SET:
+            setattr(self, key, _freeze_field(key, value))
+        else:
+            if self.extra is None:
+                self.extra = {}
+            self.extra[key] = value
+
+    def __getitem__(self, key: str) -> Any:
+        if key in _FIELD_SET:
+            try:
+                return _thaw_field(key, getattr(self, key))
+            except AttributeError:
+                raise KeyError(key) from None
+        if self.extra is not None and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        # MutableMapping.get goes through __getitem__ and a KeyError for every miss
+        if key in _FIELD_SET:
+            value = getattr(self, key, _MISSING)
+            if value is _MISSING:
+                return default
+            return _thaw_field(key, value) if type(value) is tuple else value
+        return self.extra.get(key, default) if self.extra is not None else default
+
+    def __delitem__(self, key: str):
+        if key in _FIELD_SET:
+            try:
+                delattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        elif self.extra is not None and key in self.extra:
+            del self.extra[key]
+        else:
+            raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        for key in FIELDS:
+            if hasattr(self, key):
+                yield key
+        if self.extra:
+            yield from self.extra
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __contains__(self, key: Any) -> bool:
+        if key in _FIELD_SET:
+            return hasattr(self, key)
+        return self.extra is not None and key in self.extra
+
+    def __repr__(self) -> str:
+        return f"Record({self.to_dict()!r})"
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {}
+        for key in FIELDS:
+            value = getattr(self, key, _MISSING)
+            if value is not _MISSING:
+                data[key] = _thaw_field(key, value) if type(value) is tuple else value
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+    def to_json(self, **kwargs) -> str:
+        kwargs.setdefault('ensure_ascii', False)
+        return json.dumps(self.to_dict(), **kwargs)
+
+
+def jsonable(obj: Any) -> Any:
+    """json.dumps(..., default=jsonable) serializes Records as their dicts"""
+    if isinstance(obj, Record):
+        return obj.to_dict()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def to_records(records: Iterable[Dict[str, Any]]) -> Iterator[Record]:
+    """Convert a stream of record dicts (e.g. record_io.iter_records) as it is read"""
+    for record in records:
+        yield Record.coerce(record)
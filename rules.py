@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Shared matching rules for the extractors and country detection.
+
+Every ruleset is compiled once at import time instead of being rebuilt (and looked up
+in re's cache) on every call, while keeping the original "first rule in order wins"
+semantics. `python benchmark.py rules` compares them with the old per-pattern loops.
+"""
+import re
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+
+class RuleSet:
+    """
+    Ordered (label, pattern) rules, compiled once.
+
+    The patterns of each label are joined into one alternation, and first() tries the
+    labels in order, so it returns exactly what looping over the raw patterns with
+    re.search did: the first label with a pattern matching anywhere. With prefilter,
+    all rules are also joined into a single regex that rejects non-matching texts in
+    one scan before any label is tried.
+    """
+
+    def __init__(self, rules: Sequence[Tuple[str, str]], flags: int = 0, prefilter: bool = False):
+        grouped: Dict[str, List[str]] = {}
+        for label, pattern in rules:
+            grouped.setdefault(label, []).append(pattern)
+
+        self.labels = list(grouped)
+        self._compiled = [
+            (label, re.compile('|'.join(f"(?:{pattern})" for pattern in patterns), flags))
+            for label, patterns in grouped.items()
+        ]
+        self._prefilter = re.compile('|'.join(f"(?:{pattern})" for _, pattern in rules), flags) if prefilter else None
+
+    def first_match(self, text: str) -> Optional[Tuple[str, 're.Match']]:
+        """(label, match) of the first label in order with a matching pattern"""
+        if self._prefilter is not None and not self._prefilter.search(text):
+            return None
+        for label, regex in self._compiled:
+            match = regex.search(text)
+            if match:
+                return label, match
+        return None
+
+    def first(self, text: str) -> Optional[str]:
+        """Label of the first label in order with a pattern matching anywhere in text"""
+        found = self.first_match(text)
+        return found[0] if found else None
+
+    def label_regexes(self) -> List[Tuple[str, 're.Pattern']]:
+        """(label, compiled alternation) pairs in priority order"""
+        return list(self._compiled)
+
+
+class KeywordSet:
+    """
+    Ordered substring keywords. CPython's `in` is a C substring search that beats any
+    regex alternation over long page text, so the set stays a tuple of literals.
+    """
+
+    def __init__(self, keywords: Iterable[str]):
+        self.keywords = tuple(keywords)
+
+    def found_in(self, text: str) -> List[str]:
+        """Keywords present in text, in keyword order"""
+        return [keyword for keyword in self.keywords if keyword in text]
+
+
+# Social platforms, tried in this order on each href
+SOCIAL_MEDIA = RuleSet([
+    ('facebook', r'facebook\.com'),
+    ('instagram', r'instagram\.com'),
+    ('twitter', r'twitter\.com'),
+    ('linkedin', r'linkedin\.com'),
+    ('youtube', r'youtube\.com'),
+], prefilter=True)
+
+PROPERTY_COUNT = RuleSet([
+    ('properties', r'(\d+)\s*properties'),
+    ('rentals', r'(\d+)\s*rentals'),
+    ('accommodations', r'(\d+)\s*accommodations'),
+    ('listings', r'(\d+)\s*listings'),
+])
+
+PHONE = RuleSet([
+    ('international', r'\+?\d{1,3}[-.\s]?\(?\d{3}\)?[-.\s]?\d{3}[-.\s]?\d{4}'),
+    ('local', r'\(?\d{3}\)?[-.\s]?\d{3}[-.\s]?\d{4}'),
+])
+
+EMAIL = re.compile(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b')
+STREET_ADDRESS = re.compile(r'\d+\s+[A-Za-z\s]+(?:Street|St|Avenue|Ave|Road|Rd|Boulevard|Blvd|Drive|Dr|Lane|Ln)')
+
+PROPERTY_COUNT_HREF = re.compile(r'property|accommodation|rental')
+PROPERTY_LINK_HREF = re.compile(r'property|accommodation|rental|room')
+# Index and pagination pages that list properties, followed before the details themselves
+PROPERTY_LISTING_HREF = re.compile(r'[?&]page=\d+|/page/\d+|/(?:properties|rentals|accommodations|listings|search)/?(?:\?|$)')
+EXTERNAL_HREF = re.compile(r'^https?://(?!.*lodgify)')
+MAILTO_HREF = re.compile(r'^mailto:')
+
+ADDRESS_SELECTORS = ['.address', '.contact-address', '.location', '[data-address]', '.company-address']
+
+AMENITIES = KeywordSet(['pool', 'wifi', 'parking', 'kitchen', 'gym', 'spa', 'beach', 'pet'])
+
+# Map common countries based on address patterns
+COUNTRY_PATTERNS = {
+    'United States': [r'USA', r'US\b', r'United States', r'\bState\s+\d{5}', r'[A-Z]{2}\s+\d{5}'],
+    'Canada': [r'Canada', r'CA\b', r'[A-Z]\d[A-Z]\s*\d[A-Z]\d'],
+    'United Kingdom': [r'UK\b', r'United Kingdom', r'England', r'Scotland', r'Wales', r'[A-Z]{1,2}\d{1,2}[A-Z]?\s*\d[A-Z]{2}'],
+    'Australia': [r'Australia', r'AU\b', r'NSW', r'VIC', r'QLD', r'SA', r'WA', r'TAS', r'NT', r'ACT'],
+    'Germany': [r'Germany', r'DE\b', r'Deutschland', r'\d{5}\s+[A-Za-z]'],
+    'France': [r'France', r'FR\b', r'\d{5}\s+[A-Za-z]'],
+    'Spain': [r'Spain', r'ES\b', r'España', r'\d{5}\s+[A-Za-z]'],
+    'Italy': [r'Italy', r'IT\b', r'Italia', r'\d{5}\s+[A-Za-z]'],
+    'Netherlands': [r'Netherlands', r'NL\b', r'Holland', r'\d{4}\s*[A-Z]{2}'],
+    'Brazil': [r'Brazil', r'BR\b', r'Brasil', r'\d{5}-?\d{3}'],
+    'Mexico': [r'Mexico', r'MX\b', r'México', r'C\.P\.\s*\d{5}']
+}
+
+
+def country_rules(country_patterns: Dict[str, List[str]]) -> RuleSet:
+    """
+    Compile country patterns in priority order. Patterns are applied uppercased to the
+    uppercased address, exactly as bonus_4 has always matched them.
+    """
+    return RuleSet([
+        (country, pattern.upper())
+        for country, patterns in country_patterns.items()
+        for pattern in patterns
+    ])
+
+
+COUNTRIES = country_rules(COUNTRY_PATTERNS)
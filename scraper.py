@@ -1,90 +1,525 @@
 #!/usr/bin/env python3
 import json
-import requests
 import time
-import re
-import pandas as pd
-from bs4 import BeautifulSoup
 from urllib.parse import urljoin
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Set, Tuple, Optional, Callable, Iterable, Iterator, Union
 import logging
 import random
-from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import itertools
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from executors import bounded_map
+from page_document import PageDocument, DEFAULT_PARSER, check_parser
+import record_io
+import http_cache
+from bounded_read import DEFAULT_MAX_BYTES, get_bounded
+import rate_limit
+from crawler import PropertyCrawler
+from fingerprint import FingerprintStore
+from record_store import RecordStore
+from work_queue import WorkQueue, default_worker_id
+import metrics
+import transport
+import rules
+from records import Record, jsonable
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-session = requests.Session()
-session.headers.update({
-    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-    'Accept-Language': 'en-US,en;q=0.5',
-    'Accept-Encoding': 'gzip, deflate',
-    'Connection': 'keep-alive',
-    'Upgrade-Insecure-Requests': '1'
-})
+# Page bodies are read in chunks and cut at this size, bounding memory per request
+MAX_PAGE_BYTES = DEFAULT_MAX_BYTES
 
-def scrape_subdomain_data(subdomains: List[str], limit: int = 100) -> List[Dict[str, Any]]:
+# Shared connection pools, DNS cache and headers; see transport.py
+session = transport.new_session()
+
+def scrape_subdomain_data(subdomains: Iterable[str], limit: int = 100, mode: str = 'threads',
+                          concurrency: int = 100, delay_range: Tuple[float, float] = (1, 3),
+                          parser: str = DEFAULT_PARSER, json_file: str = 'jsons/scraped_data.json',
+                          jsonl_file: Optional[str] = None, resume: bool = False, compact: bool = True,
+                          collect: bool = True, parse_workers: Optional[int] = None,
+                          batch_size: int = 8, crawl_properties: bool = False, crawl_depth: int = 2,
+                          crawl_pages: int = 50, fingerprint_file: Optional[str] = None,
+                          due_only: bool = False, record_db: Optional[str] = None) -> List[Dict[str, Any]]:
     """
     Scrap data from a list of subdomains
+
+    mode='threads' uses the original pool of 5 blocking workers. mode='async' runs
+    the aiohttp engine, keeping up to `concurrency` requests in flight at once with
+    non-blocking politeness delays. mode='process' keeps `concurrency` fetch threads
+    on the network and hands downloaded pages, batch_size at a time, to a pool of
+    parse_workers processes (default: one per core), so parsing no longer holds the GIL
+    the fetchers need. All modes return the same records.
+
+    parser selects the HTML backend ('html.parser', 'lxml' or 'selectolax'); every
+    backend yields the same records, the faster ones just get there sooner.
+
+    With jsonl_file set, every record is appended to that file as soon as it is
+    scraped. resume=True skips subdomains already recorded there, compact=True
+    rewrites the whole JSONL as the json_file array at the end, and collect=False
+    stops records from piling up in memory (an empty list is returned).
+
+    crawl_properties=True follows each site's property links into the detail pages
+    (crawler.PropertyCrawler, at most crawl_pages pages up to crawl_depth hops), for an
+    accurate property_count and additional_info plus a per-property `properties` list.
+
+    fingerprint_file keeps a fingerprint.FingerprintStore across runs: a page whose
+    normalized HTML is unchanged reuses its stored record (crawled properties included)
+    instead of being parsed again, provided it was stored with the same parser and crawl
+    options. due_only=True also skips fetching sites whose
+    recrawl interval has not elapsed; their stored records are returned as they are.
+
+    record_db upserts every record into a record_store.RecordStore in batched
+    transactions; resume=True then skips subdomains already stored, and json_file is
+    exported from the store (every record it holds, not only this run's).
+
+    subdomains may also be an iterator that is still being produced (e.g. discovery
+    through executors.prefetch): scraping starts with its first item and pulls the
+    next ones as workers free up, records come out in completion order, and due_only
+    checks each subdomain as it arrives instead of ordering them most overdue first.
     """
-    logger.info(f"Starting to scrape data for {min(limit, len(subdomains))} subdomains")
+    check_parser(parser)
+    streaming = not isinstance(subdomains, list)
+    subdomains_to_scrape = itertools.islice(subdomains, limit) if streaming else subdomains[:limit]
+
+    # Records saved without crawling (or with other limits) lack what this run crawls
+    crawl_settings = f"crawl depth={crawl_depth} pages={crawl_pages}" if crawl_properties else ''
+    store = FingerprintStore(fingerprint_file, settings=crawl_settings) if fingerprint_file else None
+    stored_subdomains = []
+    if store and due_only:
+        if streaming:
+            subdomains_to_scrape = _split_due(store, subdomains_to_scrape, stored_subdomains)
+        else:
+            due = store.due(subdomains_to_scrape)
+            due_set = set(due)
+            stored_subdomains = [sub for sub in subdomains_to_scrape if sub not in due_set]
+            subdomains_to_scrape = due
+            logger.info(f"{len(stored_subdomains)} subdomains not due for a recrawl")
+
+    writer = None
+    if jsonl_file:
+        if resume:
+            done = record_io.completed_subdomains(jsonl_file)
+            subdomains_to_scrape = _without(subdomains_to_scrape, done)
+            logger.info(f"Resuming: {len(done)} subdomains already in {jsonl_file}")
+        writer = record_io.JsonlWriter(jsonl_file)
+
+    db = None
+    if record_db:
+        db = RecordStore(record_db)
+        if resume:
+            done = set(db.subdomains())
+            subdomains_to_scrape = _without(subdomains_to_scrape, done)
+            logger.info(f"Resuming: {len(done)} subdomains already in {record_db}")
+
+    crawler = None
+    if crawl_properties:
+        crawler = PropertyCrawler(session, parser, crawl_depth, crawl_pages, delay_range=delay_range,
+                                  max_bytes=MAX_PAGE_BYTES)
+
+    def on_record(record: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        # Records reused from the store were crawled and saved when first extracted
+        fresh = store is None or store.is_pending(record['subdomain'])
+        if crawler and record and fresh:
+            record = crawler.crawl_record(record)
+        if isinstance(record, Record):
+            record.homepage_hrefs = None
+        if store and fresh:
+            store.save(record, parser)
+        metrics.inc('records_total', stage='scrape')
+        if writer and record:
+            writer.write(record)
+        if db and record:
+            db.write(record)
+        # Only records kept in memory are worth the conversion to compact Records
+        return Record.coerce(record) if collect else None
+
+    if streaming:
+        logger.info(f"Starting to scrape data for up to {limit} subdomains as they arrive ({mode} mode)")
+    else:
+        logger.info(f"Starting to scrape data for {len(subdomains_to_scrape)} subdomains ({mode} mode)")
 
     scraped_data = []
-    subdomains_to_scrape = subdomains[:limit]
-    
-    with ThreadPoolExecutor(max_workers=5) as executor:
-        results = list(executor.map(_scrape_single_subdomain, subdomains_to_scrape))
+
+    try:
+        results = [on_record(record) for record in store.records(stored_subdomains)] if stored_subdomains else []
+        emitted = len(stored_subdomains)
+        if mode == 'async':
+            results += asyncio.run(_scrape_subdomains_async(subdomains_to_scrape, concurrency, delay_range, parser,
+                                                            on_record, offload=crawler is not None, store=store))
+        elif mode == 'threads':
+            scrape_one = lambda sub: on_record(_scrape_single_subdomain(sub, delay_range, parser, store))
+            if streaming:
+                # Executor.map would drain the whole stream before scraping the first item
+                results += list(bounded_map(scrape_one, subdomains_to_scrape, 5, name='scrape'))
+            else:
+                with ThreadPoolExecutor(max_workers=5) as executor:
+                    results += list(executor.map(scrape_one, subdomains_to_scrape))
+        elif mode == 'process':
+            records = _scrape_subdomains_process(subdomains_to_scrape, concurrency, delay_range, parser,
+                                                 parse_workers, batch_size, store)
+            if crawler:
+                results += list(bounded_map(on_record, records, concurrency, name='crawl_sites'))
+            else:
+                results += [on_record(record) for record in records]
+        else:
+            raise ValueError(f"Unknown scrape mode: {mode}")
+
+        # Subdomains of a stream found not due while it was being scraped
+        if stored_subdomains[emitted:]:
+            logger.info(f"{len(stored_subdomains) - emitted} subdomains not due for a recrawl")
+            results += [on_record(record) for record in store.records(stored_subdomains[emitted:])]
+    finally:
+        if writer:
+            writer.close()
+        if store:
+            store.close()
+        if db:
+            db.close()
     
     scraped_data = [result for result in results if result]
 
+    if writer:
+        logger.info(f"Records streamed to {jsonl_file}")
+        if compact:
+            record_io.compact_jsonl(jsonl_file, json_file)
+        return scraped_data
+
+    if record_db:
+        logger.info(f"Records stored in {record_db}")
+        if compact:
+            with RecordStore(record_db) as db:
+                db.export_json(json_file)
+        return scraped_data
+
     logger.info(f"Data collected from {len(scraped_data)} subdomains")
 
     # Save to JSON
-    with open('jsons/scraped_data.json', 'w') as f:
-        json.dump(scraped_data, f, indent=2, ensure_ascii=False)
+    with open(json_file, 'w') as f:
+        json.dump(scraped_data, f, indent=2, ensure_ascii=False, default=jsonable)
     
     return scraped_data
 
-def _scrape_single_subdomain(subdomain: str) -> Dict[str, Any]:
-    """Scrape data from a single subdomain"""
+def scrape_from_queue(queue_file: str = 'jsons/work_queue.sqlite', record_db: str = 'jsons/records.sqlite',
+                      worker_id: Optional[str] = None, batch_size: int = 20, lease_seconds: float = 300.0,
+                      **scrape_options) -> int:
+    """
+    Work-queue mode: lease batches of subdomains from a work_queue.WorkQueue, scrape
+    them into record_db and mark them done until the queue is drained. Any number of
+    processes on the host holding the two files (on a local disk, see work_queue) can
+    run this at once. When only other workers' leases are left, it waits for them: a
+    crashed worker's batch is taken over once its lease expires. A batch scraped twice that way is harmless, since
+    records are upserted by subdomain.
+
+    scrape_options go to scrape_subdomain_data. Returns the number of subdomains
+    this worker completed.
+    """
+    queue = WorkQueue(queue_file, lease_seconds=lease_seconds)
+    worker_id = worker_id or default_worker_id()
+    completed = 0
+    logger.info(f"Worker {worker_id} starting on {queue_file}: {queue.stats()}")
+
+    try:
+        while True:
+            batch = queue.lease(worker_id, batch_size)
+            if not batch:
+                wait = queue.next_expiry()
+                if wait is None:
+                    break
+                time.sleep(min(wait + 0.1, lease_seconds))
+                continue
+
+            try:
+                with queue.keep_alive(worker_id, batch):
+                    scrape_subdomain_data(batch, limit=len(batch), record_db=record_db, compact=False, collect=False,
+                                          **scrape_options)
+            except Exception as e:
+                logger.error(f"Worker {worker_id} failed a batch of {len(batch)}: {str(e)}")
+                queue.fail(worker_id, batch, str(e))
+                continue
+            completed += queue.complete(worker_id, batch)
+    finally:
+        queue.release(worker_id)
+        logger.info(f"Worker {worker_id} done: {completed} subdomains, queue {queue.stats()}")
+        queue.close()
+
+    return completed
+
+def _without(subdomains: Iterable[str], done: Set[str]) -> Iterable[str]:
+    """Subdomains not in done; a list stays a list, a stream is filtered as it flows"""
+    if isinstance(subdomains, list):
+        return [sub for sub in subdomains if sub not in done]
+    return (sub for sub in subdomains if sub not in done)
+
+def _split_due(store: FingerprintStore, subdomains: Iterable[str], not_due: List[str]) -> Iterator[str]:
+    """Pass on the subdomains due for a recrawl, collecting the others in not_due"""
+    for subdomain in subdomains:
+        if store.is_due(subdomain):
+            yield subdomain
+        else:
+            not_due.append(subdomain)
+
+def _subdomain_url(subdomain: str) -> str:
+    """Build the URL to scrape for a subdomain"""
+    return f"https://{subdomain}" if not subdomain.startswith('http') else subdomain
+
+def _build_record(subdomain: str, url: str, content: bytes, parser: str = DEFAULT_PARSER) -> Record:
+    """Parse a downloaded page and extract the record fields, timing each step"""
+    with metrics.timer('parse_seconds', parser=parser):
+        doc = PageDocument.from_content(content, parser)
+
+    extractors = {
+        'property_count': lambda: _extract_property_count(doc),
+        'property_links': lambda: _extract_property_links(doc, url),
+        'company_address': lambda: _extract_address(doc),
+        'website': lambda: _extract_website(doc),
+        'social_media': lambda: _extract_social_media(doc),
+        'phone': lambda: _extract_phone(doc),
+        'email': lambda: _extract_email(doc),
+        'additional_info': lambda: _extract_additional_info(doc),
+    }
+
+    record = Record(subdomain, url)
+    for field, extract in extractors.items():
+        with metrics.timer('extract_seconds', field=field):
+            record[field] = extract()
+    # Seeds the property crawler; on_record drops it
+    record.homepage_hrefs = doc.hrefs
+    return record
+
+def _scrape_single_subdomain(subdomain: str, delay_range: Tuple[float, float] = (1, 3),
+                             parser: str = DEFAULT_PARSER, store: Optional[FingerprintStore] = None) -> Dict[str, Any]:
+    """Scrape data from a single subdomain; an unchanged page reuses its record from store"""
     try:
-        url = f"https://{subdomain}" if not subdomain.startswith('http') else subdomain
+        url = _subdomain_url(subdomain)
 
         logger.info(f"Scraping: {url}")
 
-        response = session.get(url, timeout=10)
+        response, body = get_bounded(session, url, MAX_PAGE_BYTES)
         if response.status_code != 200:
             logger.warning(f"Error accessing {url}: Status {response.status_code}")
             return _generate_mock_data(subdomain)
         
-        soup = BeautifulSoup(response.content, 'html.parser')
-
-        # Extract data
-        data = {
-            'subdomain': subdomain,
-            'url': url,
-            'property_count': _extract_property_count(soup),
-            'property_links': _extract_property_links(soup, url),
-            'company_address': _extract_address(soup),
-            'website': _extract_website(soup),
-            'social_media': _extract_social_media(soup),
-            'phone': _extract_phone(soup),
-            'email': _extract_email(soup),
-            'additional_info': _extract_additional_info(soup)
-        }
+        # Extract data, unless the page is unchanged since the last run
+        data = store.check(subdomain, body.content, parser) if store else None
+        if data is None:
+            data = _build_record(subdomain, url, body.content, parser)
 
         # Some sleep
-        time.sleep(random.uniform(1, 3))
+        time.sleep(random.uniform(*delay_range))
         
         return data
         
     except Exception as e:
         logger.error(f"Error scraping {subdomain}: {str(e)}")
+        if store:
+            store.discard(subdomain)
         return _generate_mock_data(subdomain)
 
-def _generate_mock_data(subdomain: str) -> Dict[str, Any]:
+def _fetch_page(subdomain: str, delay_range: Tuple[float, float] = (1, 3), parser: str = DEFAULT_PARSER,
+                store: Optional[FingerprintStore] = None) -> Tuple[str, str, Union[bytes, Dict[str, Any], None]]:
+    """
+    Download a subdomain's page for the process pool; content is None on failure, or
+    the stored record when store finds the page unchanged
+    """
+    url = _subdomain_url(subdomain)
+    try:
+        logger.info(f"Scraping: {url}")
+
+        response, body = get_bounded(session, url, MAX_PAGE_BYTES)
+        if response.status_code != 200:
+            logger.warning(f"Error accessing {url}: Status {response.status_code}")
+            return subdomain, url, None
+
+        reused = store.check(subdomain, body.content, parser) if store else None
+
+        # Some sleep
+        time.sleep(random.uniform(*delay_range))
+
+        return subdomain, url, reused if reused is not None else body.content
+
+    except Exception as e:
+        logger.error(f"Error scraping {subdomain}: {str(e)}")
+        if store:
+            store.discard(subdomain)
+        return subdomain, url, None
+
+def _build_records_batch(pages: List[Tuple[str, str, Optional[bytes]]], parser: str = DEFAULT_PARSER,
+                         failed: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """
+    Parse a batch of fetched pages; runs inside a worker process. Subdomains that
+    fell back to mock data are appended to failed, if given.
+    """
+    records = []
+    for subdomain, url, content in pages:
+        if content is None:
+            records.append(_generate_mock_data(subdomain))
+            if failed is not None:
+                failed.append(subdomain)
+            continue
+        if isinstance(content, dict):
+            records.append(content)
+            continue
+        try:
+            records.append(_build_record(subdomain, url, content, parser))
+        except Exception as e:
+            logger.error(f"Error parsing {subdomain}: {str(e)}")
+            records.append(_generate_mock_data(subdomain))
+            if failed is not None:
+                failed.append(subdomain)
+    return records
+
+def _build_records_batch_in_worker(pages: List[Tuple[str, str, Optional[bytes]]], parser: str = DEFAULT_PARSER
+                                   ) -> Tuple[List[Dict[str, Any]], List[str], Dict[str, Any]]:
+    """
+    _build_records_batch plus the subdomains that got mock data and the worker's
+    metrics, which the parent merges into its own
+    """
+    failed = []
+    records = _build_records_batch(pages, parser, failed)
+    return records, failed, metrics.registry.drain()
+
+_PARSE_START_METHOD = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
+def _batches(items: Iterable, batch_size: int) -> Iterator[List]:
+    iterator = iter(items)
+    while True:
+        batch = list(itertools.islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
+def _parse_in_processes(pages: Iterable[Tuple[str, str, Optional[bytes]]], parse_workers: Optional[int] = None,
+                        batch_size: int = 8, parser: str = DEFAULT_PARSER,
+                        store: Optional[FingerprintStore] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Parse pages on a process pool as they arrive. At most two batches per worker are
+    queued, so a slow pool pushes back on the fetchers instead of buffering pages.
+    Pages that failed to parse are discarded from store, so their mock records are
+    never saved as the extraction of an unchanged page.
+
+    Workers are started by a fork server (spawned where there is none), never forked
+    from this process: the fetch threads are already running, and a fork taken while
+    one holds the metrics, logging or DNS cache lock would deadlock the worker.
+    """
+    parse_workers = parse_workers or os.cpu_count() or 1
+    context = multiprocessing.get_context(_PARSE_START_METHOD)
+    with ProcessPoolExecutor(max_workers=parse_workers, initializer=metrics.reset, mp_context=context) as executor:
+        for records, failed, worker_metrics in bounded_map(partial(_build_records_batch_in_worker, parser=parser),
+                                                   _batches(pages, batch_size), parse_workers,
+                                                   max_pending=parse_workers * 2, executor=executor, name='parse'):
+            metrics.registry.merge(worker_metrics)
+            if store:
+                for subdomain in failed:
+                    store.discard(subdomain)
+            yield from records
+
+def _scrape_subdomains_process(subdomains: List[str], fetch_workers: int, delay_range: Tuple[float, float],
+                               parser: str, parse_workers: Optional[int], batch_size: int,
+                               store: Optional[FingerprintStore] = None) -> Iterator[Dict[str, Any]]:
+    """Fetch on a thread pool and parse on a process pool, records in completion order"""
+    pages = bounded_map(partial(_fetch_page, delay_range=delay_range, parser=parser, store=store), subdomains,
+                        fetch_workers, name='fetch')
+    return _parse_in_processes(pages, parse_workers, batch_size, parser, store)
+
+async def _scrape_subdomains_async(subdomains: Iterable[str], concurrency: int, delay_range: Tuple[float, float],
+                                   parser: str, on_record: Callable, offload: bool = False,
+                                   store: Optional[FingerprintStore] = None) -> List[Dict[str, Any]]:
+    """
+    Scrape subdomains on a single event loop with a global concurrency limit.
+    offload runs a blocking on_record (e.g. one that crawls) in a worker thread.
+    """
+    import aiohttp
+
+    semaphore = asyncio.Semaphore(concurrency)
+    connector = aiohttp.TCPConnector(limit=concurrency, limit_per_host=transport.POOL_PER_HOST,
+                                    ttl_dns_cache=transport.dns_cache.ttl)
+    timeout = aiohttp.ClientTimeout(total=10)
+
+    async with aiohttp.ClientSession(headers=dict(session.headers), connector=connector, timeout=timeout) as client:
+        async def scrape(subdomain: str):
+            record = await _scrape_single_subdomain_async(client, semaphore, subdomain, delay_range, parser, store)
+            if offload:
+                return await asyncio.to_thread(on_record, record)
+            return on_record(record)
+
+        if isinstance(subdomains, list):
+            return await asyncio.gather(*(scrape(subdomain) for subdomain in subdomains))
+        return await _gather_stream(scrape, subdomains, concurrency * 2)
+
+async def _gather_stream(fn: Callable, items: Iterable, max_pending: int) -> List:
+    """
+    asyncio.gather over a blocking iterator that may still be producing: items are
+    pulled on a worker thread, at most max_pending tasks run at once, and results are
+    returned in completion order
+    """
+    iterator = iter(items)
+    end = object()
+    slots = asyncio.Semaphore(max_pending)
+    tasks, results = set(), []
+
+    async def run(item):
+        try:
+            results.append(await fn(item))
+        finally:
+            slots.release()
+
+    while True:
+        await slots.acquire()
+        item = await asyncio.to_thread(next, iterator, end)
+        if item is end:
+            break
+        task = asyncio.create_task(run(item))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+    await asyncio.gather(*tasks)
+    return results
+
+async def _scrape_single_subdomain_async(client, semaphore: asyncio.Semaphore, subdomain: str,
+                                         delay_range: Tuple[float, float], parser: str,
+                                         store: Optional[FingerprintStore] = None) -> Dict[str, Any]:
+    """Async counterpart of _scrape_single_subdomain"""
+    async with semaphore:
+        try:
+            url = _subdomain_url(subdomain)
+
+            logger.info(f"Scraping: {url}")
+
+            status, content = await http_cache.cached_get_async(client, url, http_cache.get_cache_adapter(session, url),
+                                                                rate_limit.get_rate_limiter(session, url),
+                                                                max_bytes=MAX_PAGE_BYTES)
+            if status != 200:
+                logger.warning(f"Error accessing {url}: Status {status}")
+                return _generate_mock_data(subdomain)
+
+            # Parsing (and the store's hashing and SQLite lookup) would stall every socket
+            # on the loop, so it runs on the default executor's threads
+            data = await asyncio.to_thread(_check_or_build_record, subdomain, url, content, parser, store)
+
+            # Politeness delay: keeps this slot busy without blocking the event loop
+            await asyncio.sleep(random.uniform(*delay_range))
+
+            return data
+
+        except Exception as e:
+            logger.error(f"Error scraping {subdomain}: {str(e)}")
+            if store:
+                store.discard(subdomain)
+            return _generate_mock_data(subdomain)
+
+def _check_or_build_record(subdomain: str, url: str, content: bytes, parser: str,
+                           store: Optional[FingerprintStore] = None) -> Dict[str, Any]:
+    """The stored record of an unchanged page, else a freshly extracted one"""
+    data = store.check(subdomain, content, parser) if store else None
+    if data is None:
+        data = _build_record(subdomain, url, content, parser)
+    return data
+
+def _generate_mock_data(subdomain: str) -> Record:
     """Generate mock data for subdomains that could not be accessed"""
+    metrics.inc('mock_fallbacks_total', stage='scrape')
     import random
     
     mock_data = {
@@ -110,132 +545,90 @@ def _generate_mock_data(subdomain: str) -> Dict[str, Any]:
             'cancellation_policy': 'Free cancellation up to 24 hours before check-in'
         }
     }
-    return mock_data
+    record = Record.from_dict(mock_data)
+    record.mock = True
+    return record
 
-def _extract_property_count(soup: BeautifulSoup) -> int:
+def _extract_property_count(doc: PageDocument) -> int:
     """Extract property count from the page"""
-
-    patterns = [
-        r'(\d+)\s*properties',
-        r'(\d+)\s*rentals',
-        r'(\d+)\s*accommodations',
-        r'(\d+)\s*listings'
-    ]
-    
-    text = soup.get_text().lower()
-    for pattern in patterns:
-        match = re.search(pattern, text)
-        if match:
-            return int(match.group(1))
+    found = rules.PROPERTY_COUNT.first_match(doc.text_lower)
+    if found:
+        return int(found[1].group(1))
     
-    property_links = soup.find_all('a', href=re.compile(r'property|accommodation|rental'))
+    property_links = doc.hrefs_matching(rules.PROPERTY_COUNT_HREF)
     return len(property_links) if property_links else random.randint(5, 30)
 
-def _extract_property_links(soup: BeautifulSoup, base_url: str) -> List[str]:
+def _extract_property_links(doc: PageDocument, base_url: str) -> List[str]:
     """Extract links to individual properties"""
     links = []
-    property_links = soup.find_all('a', href=re.compile(r'property|accommodation|rental|room'))
+    property_links = doc.hrefs_matching(rules.PROPERTY_LINK_HREF)
 
-    for link in property_links[:10]:  # Limit to first 10 links
-        href = link.get('href')
+    for href in property_links[:10]:  # Limit to first 10 links
         if href:
             full_url = urljoin(base_url, href)
             links.append(full_url)
     
     return links
 
-def _extract_address(soup: BeautifulSoup) -> str:
+def _extract_address(doc: PageDocument) -> str:
     """Extract address from the company/property"""
-    address_selectors = [
-        '.address', '.contact-address', '.location',
-        '[data-address]', '.company-address'
-    ]
-    
-    for selector in address_selectors:
-        element = soup.select_one(selector)
-        if element:
-            return element.get_text(strip=True)
-    
-    text = soup.get_text()
-    address_pattern = r'\d+\s+[A-Za-z\s]+(?:Street|St|Avenue|Ave|Road|Rd|Boulevard|Blvd|Drive|Dr|Lane|Ln)'
-    match = re.search(address_pattern, text)
+    element_text = doc.select_first_text(rules.ADDRESS_SELECTORS)
+    if element_text is not None:
+        return element_text
+    
+    match = rules.STREET_ADDRESS.search(doc.text)
     if match:
         return match.group()
     
     return ""
 
-def _extract_website(soup: BeautifulSoup) -> str:
+def _extract_website(doc: PageDocument) -> str:
     """Extract website of the company"""
     # Search for external links
-    links = soup.find_all('a', href=re.compile(r'^https?://(?!.*lodgify)'))
-    for link in links:
-        href = link.get('href')
+    for href in doc.hrefs_matching(rules.EXTERNAL_HREF):
         if href and any(domain in href for domain in ['.com', '.net', '.org']):
             return href
     
     return ""
 
-def _extract_social_media(soup: BeautifulSoup) -> Dict[str, str]:
+def _extract_social_media(doc: PageDocument) -> Dict[str, str]:
     """Extract social media links"""
     social_media = {}
     
-    social_patterns = {
-        'facebook': r'facebook\.com',
-        'instagram': r'instagram\.com',
-        'twitter': r'twitter\.com',
-        'linkedin': r'linkedin\.com',
-        'youtube': r'youtube\.com'
-    }
-    
-    links = soup.find_all('a', href=True)
-    for link in links:
-        href = link.get('href')
-        for platform, pattern in social_patterns.items():
-            if re.search(pattern, href):
-                social_media[platform] = href
-                break
+    for href in doc.hrefs:
+        platform = rules.SOCIAL_MEDIA.first(href)
+        if platform:
+            social_media[platform] = href
     
     return social_media
 
-def _extract_phone(soup: BeautifulSoup) -> str:
+def _extract_phone(doc: PageDocument) -> str:
     """Extract phone number"""
-    text = soup.get_text()
-    
-    phone_patterns = [
-        r'\+?\d{1,3}[-.\s]?\(?\d{3}\)?[-.\s]?\d{3}[-.\s]?\d{4}',
-        r'\(?\d{3}\)?[-.\s]?\d{3}[-.\s]?\d{4}'
-    ]
-    
-    for pattern in phone_patterns:
-        match = re.search(pattern, text)
-        if match:
-            return match.group()
+    found = rules.PHONE.first_match(doc.text)
+    if found:
+        return found[1].group()
     
     return ""
 
-def _extract_email(soup: BeautifulSoup) -> str:
+def _extract_email(doc: PageDocument) -> str:
     """Extract email address"""
-    text = soup.get_text()
-    
-    email_pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
-    match = re.search(email_pattern, text)
+    match = rules.EMAIL.search(doc.text)
     if match:
         return match.group()
     
-    mailto_links = soup.find_all('a', href=re.compile(r'^mailto:'))
+    mailto_links = doc.hrefs_matching(rules.MAILTO_HREF)
     if mailto_links:
-        return mailto_links[0]['href'].replace('mailto:', '')
+        return mailto_links[0].replace('mailto:', '')
     
     return ""
 
-def _extract_additional_info(soup: BeautifulSoup) -> Dict[str, Any]:
+def _extract_additional_info(doc: PageDocument) -> Dict[str, Any]:
     """Extract additional useful information"""
     additional_info = {}
     
     # Search for amenities
-    amenities_keywords = ['pool', 'wifi', 'parking', 'kitchen', 'gym', 'spa', 'beach', 'pet']
-    text = soup.get_text().lower()
-    found_amenities = [keyword for keyword in amenities_keywords if keyword in text]
+    text = doc.text_lower
+    found_amenities = rules.AMENITIES.found_in(text)
     if found_amenities:
         additional_info['amenities'] = found_amenities
 
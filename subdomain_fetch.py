@@ -1,64 +1,91 @@
 #!/usr/bin/env python3
 import json
-import requests
+from functools import partial
 import logging
-from typing import List
-from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List, Optional
+from candidates import iter_candidates, padding_subdomains
+from executors import bounded_map
+import metrics
+import transport
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-session = requests.Session()
-session.headers.update({
-    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-    'Accept-Language': 'en-US,en;q=0.5',
-    'Accept-Encoding': 'gzip, deflate',
-    'Connection': 'keep-alive',
-    'Upgrade-Insecure-Requests': '1'
-})
-
-def discover_subdomains() -> List[str]:
+# Shared connection pools, DNS cache and headers; see transport.py
+session = transport.new_session()
+
+def discover_subdomains(use_dns: bool = True, nameservers: Optional[List[str]] = None, dns_port: int = 53,
+                        dns_concurrency: int = 200, wildcard_policy: str = 'check',
+                        wordlists: Optional[List[str]] = None, permute_wordlists: bool = False,
+                        previous_file: Optional[str] = 'jsons/discovered_subdomains.json',
+                        expected_candidates: int = 1_000_000, pad_to: int = 100,
+                        url_template: str = 'https://{domain}',
+                        output_file: str = 'jsons/discovered_subdomains.json') -> List[str]:
     """
     Discover subdomains of lodgify.com
+
+    Candidates are streamed from candidates.iter_candidates (built-in lists and
+    permutations, names found by the previous run and any wordlist files) and
+    deduplicated with a Bloom filter, so huge wordlists run in constant memory.
+
+    With use_dns, candidates are first resolved concurrently (dnspython) and only the
+    names that resolve go on to the HTTP check. nameservers/dns_port point the resolver
+    at a specific (e.g. local stub) server; see dns_resolver.iter_resolvable for
+    wildcard_policy.
+
+    Each candidate is checked with a HEAD request to url_template, where {domain} is
+    the full subdomain; point it at a local server (see synthetic_site) to run offline.
+
+    If fewer than pad_to subdomains are found, synthetic ones fill the gap.
+    See iter_subdomains to consume subdomains as they are found.
+    """
+    return list(iter_subdomains(use_dns=use_dns, nameservers=nameservers, dns_port=dns_port,
+                                dns_concurrency=dns_concurrency, wildcard_policy=wildcard_policy,
+                                wordlists=wordlists, permute_wordlists=permute_wordlists,
+                                previous_file=previous_file, expected_candidates=expected_candidates,
+                                pad_to=pad_to, url_template=url_template, output_file=output_file))
+
+def iter_subdomains(use_dns: bool = True, nameservers: Optional[List[str]] = None, dns_port: int = 53,
+                    dns_concurrency: int = 200, wildcard_policy: str = 'check',
+                    wordlists: Optional[List[str]] = None, permute_wordlists: bool = False,
+                    previous_file: Optional[str] = 'jsons/discovered_subdomains.json',
+                    expected_candidates: int = 1_000_000, pad_to: int = 100,
+                    url_template: str = 'https://{domain}',
+                    output_file: Optional[str] = 'jsons/discovered_subdomains.json') -> Iterator[str]:
+    """
+    discover_subdomains as a generator: each subdomain is yielded as soon as its check
+    confirms it, then the known and padding subdomains. output_file (if any) is
+    written once the generator is exhausted.
     """
     logger.info("Initiating subdomain discovery...")
-        
-    # Common subdomain prefixes
-    common_subdomains = [
-        'www', 'app', 'api', 'admin', 'blog', 'help', 'support', 'mail',
-        'test', 'staging', 'dev', 'demo', 'booking', 'reservation', 'property',
-        'properties', 'rental', 'rentals', 'vacation', 'holiday', 'resort',
-        'hotel', 'villa', 'apartment', 'cabin', 'house', 'beach', 'mountain',
-        'city', 'downtown', 'luxury', 'budget', 'family', 'business'
-    ]
-    
-    # Tried and true known examples
-    known_examples = [
-        'bandycanyon', 'riversresortrentals', 'tideway-hotel',
-        'oceanview', 'mountainlodge', 'citystay', 'beachfront',
-        'luxuryresort', 'familyhotel', 'businesshotel', 'vacationrental',
-        'holidayinn', 'grandhotel', 'boutique', 'resort', 'spa'
-    ]
-    
-    # Search for patterns
-    patterns = []
-    for base in ['resort', 'hotel', 'rental', 'property', 'vacation', 'holiday']:
-        for modifier in ['', 's', 'beach', 'mountain', 'city', 'luxury', 'grand', 'royal']:
-            if modifier:
-                patterns.extend([f"{base}{modifier}", f"{modifier}{base}", f"{base}-{modifier}", f"{modifier}-{base}"])
-            else:
-                patterns.append(base)
-    
-    all_potential_subdomains = list(set(common_subdomains + known_examples + patterns))
 
-    logger.info(f"Testing {len(all_potential_subdomains)} potential subdomains...")
+    all_potential_subdomains = iter_candidates(wordlists=wordlists, previous_file=previous_file,
+                                               permute_wordlists=permute_wordlists,
+                                               expected_candidates=expected_candidates)
+
+    if use_dns:
+        try:
+            from dns_resolver import DnsResolver, iter_resolvable
+            resolver = DnsResolver(nameservers=nameservers, port=dns_port, concurrency=dns_concurrency)
+            all_potential_subdomains = iter_resolvable(all_potential_subdomains, resolver=resolver,
+                                                       wildcard_policy=wildcard_policy)
+        except ImportError as e:
+            logger.warning(f"DNS stage skipped, dnspython not available: {str(e)}")
+
+    logger.info("Testing potential subdomains...")
 
     # Test subdomains concurrently
-    with ThreadPoolExecutor(max_workers=10) as executor:
-        results = list(executor.map(_check_subdomain, all_potential_subdomains))
-    
-    valid_subdomains = [sub for sub, valid in results if valid]
+    valid_subdomains = []
+    tested = 0
+    check = partial(_check_subdomain, url_template=url_template)
+    for sub, valid in bounded_map(check, all_potential_subdomains, max_workers=10, name='discovery'):
+        tested += 1
+        metrics.inc('discovery_checks_total', result='found' if valid else 'missing')
+        if valid:
+            valid_subdomains.append(sub)
+            yield sub
+
+    logger.info(f"Tested {tested} potential subdomains")
 
     # Add some known subdomains to ensure data
     guaranteed_subdomains = [
@@ -70,44 +97,28 @@ def discover_subdomains() -> List[str]:
     for subdomain in guaranteed_subdomains:
         if subdomain not in valid_subdomains:
             valid_subdomains.append(subdomain)
+            yield subdomain
     
-    # Generate additional subdomains if less than 100 found
-    additional_subdomains = _generate_additional_subdomains(100 - len(valid_subdomains))
+    # Generate additional subdomains if less than pad_to found
+    additional_subdomains = padding_subdomains(pad_to - len(valid_subdomains))
     valid_subdomains.extend(additional_subdomains)
+    yield from additional_subdomains
 
     logger.info(f"Discovered {len(valid_subdomains)} subdomains")
     logger.info(f"Valid subdomains: {valid_subdomains}")
 
-    with open('jsons/discovered_subdomains.json', 'w') as f:
-        json.dump(valid_subdomains, f, indent=2)
-    
-    return valid_subdomains
+    if output_file:
+        with open(output_file, 'w') as f:
+            json.dump(valid_subdomains, f, indent=2)
 
-def _check_subdomain(subdomain: str) -> tuple:
+def _check_subdomain(subdomain: str, url_template: str = 'https://{domain}') -> tuple:
     """Verify if a subdomain is valid by making a HEAD request"""
     full_domain = f"{subdomain}.lodgify.com" if not subdomain.endswith('.lodgify.com') else subdomain
     try:
-        response = session.head(f"https://{full_domain}", timeout=5)
+        response = session.head(url_template.format(domain=full_domain), timeout=5)
         if response.status_code == 200:
             logger.info(f"Subdomain found: {full_domain}")
             return full_domain, True
     except:
         pass
     return subdomain, False
-
-def _generate_additional_subdomains(count: int) -> List[str]:
-    """Generate additional subdomains based on common patterns"""
-    prefixes = ['ocean', 'mountain', 'city', 'beach', 'lake', 'forest', 'valley', 'hill', 'river', 'sunset']
-    suffixes = ['resort', 'hotel', 'lodge', 'inn', 'suites', 'rentals', 'properties', 'vacation']
-    additional = []
-    
-    for i in range(count):
-        if i < len(prefixes) * len(suffixes):
-            prefix = prefixes[i % len(prefixes)]
-            suffix = suffixes[i // len(prefixes)]
-            subdomain = f"{prefix}{suffix}.lodgify.com"
-        else:
-            subdomain = f"property{i:03d}.lodgify.com"
-        additional.append(subdomain)
-    
-    return additional
\ No newline at end of file
@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+"""
+Synthetic Lodgify-like sites for offline benchmarks.
+
+make_property_page() generates a homepage with property links, social links, an
+address and contact details. SyntheticSiteServer serves many such sites from one
+local HTTP server, with configurable latency, error rate and throttling, so every
+stage from discovery to enrichment can run without the internet. ThrottlingHttpServer
+answers 429 above a fixed rate, for exercising rate_limit.RateLimiter alone.
+"""
+import http.server
+import logging
+import random
+import re
+import threading
+import time
+from typing import List, Optional, Tuple
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Street address templates in several countries, so country categorization has work to do
+ADDRESS_TEMPLATES = [
+    "{number} Ocean Drive, Miami, FL 33139",
+    "{number} High Street, London SW1A 2AA, UK",
+    "{number} George St, Sydney NSW 2000",
+    "{number} Yonge St, Toronto, ON M5E 1W7, Canada",
+    "Calle Mayor {number}, 28013 Madrid, España",
+    "Rua Augusta {number}, 01304-001 Sao Paulo, Brasil",
+    "Keizersgracht {number}, 1015 CJ Amsterdam",
+    "{number} Lakeside Road, somewhere quiet",
+]
+
+SITE_PATH = re.compile(r'^/s/([^/]+)/?$')
+PROPERTY_PATH = re.compile(r'^/s/([^/]+)/property/villa-(\d+)/?$')
+# The company domain is kept in the path: the website extractor looks for .com/.net/.org
+WEBSITE_PATH = re.compile(r'^/w/www\.([^/]+)\.com/?$')
+
+
+class _ThreadingServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+    # Hundreds of concurrent scrapers connect at once
+    request_queue_size = 1024
+
+
+def site_name(index: int) -> str:
+    return f"site{index:05d}"
+
+
+def make_property_page(index: int, properties: int = 200, paragraphs: int = 50, website: Optional[str] = None) -> str:
+    """Generate a synthetic Lodgify-like homepage; the index seeds which fields appear and how"""
+    rng = random.Random(index)
+    name = site_name(index)
+    links = '\n'.join(
+        f'<li><a href="property/villa-{i}">Villa {i}</a> <a href="property/villa-{i}#rooms">Rooms</a></li>'
+        for i in range(properties)
+    )
+    filler = '\n'.join(
+        f'<p>Enjoy the pool, free wifi and parking at cabin {i}. '
+        f'Guests love the kitchen and the beach walk. Lorem ipsum dolor sit amet.</p>'
+        for i in range(paragraphs)
+    )
+    street = rng.choice(ADDRESS_TEMPLATES).format(number=rng.randint(100, 9999))
+    if rng.random() < 0.5:
+        address = f'<div class="address">{street}</div>'
+    else:
+        address = f'<p>Visit us at {street}.</p>'
+    count = f'<p>{properties} properties available</p>' if rng.random() < 0.7 else ''
+    email = f' or write to info@{name}.com' if rng.random() < 0.7 else ''
+    social = '\n'.join(
+        f'<a href="https://{platform}.com/{name}">{platform}</a>'
+        for platform in ('facebook', 'instagram', 'twitter', 'linkedin', 'youtube') if rng.random() < 0.6
+    )
+    website = website or f"https://www.{name}.com"
+    return f"""<!DOCTYPE html>
+<html><head><title>{name} | Vacation Rentals</title>
+<meta name="description" content="Holiday homes by {name} &amp; friends">
+<style>.address {{ color: #333; }}</style>
+<script>window.config = {{"email": "tracking@analytics.example.com"}};</script></head>
+<body>
+<!-- generated page {index} -->
+<h1>{name}</h1>{count}
+<ul>{links}</ul>
+{filler}
+{address}
+<p>Call us at +1-{rng.randint(200, 999)}-555-{rng.randint(1000, 9999)}{email}</p>
+<p>Check-in from 3 PM. Cancellation is free up to 24 hours before arrival.</p>
+<a href="{website}">Website</a>
+{social}
+<a href="mailto:info@{name}.com">Email</a>
+</body></html>"""
+
+
+def encode_page(index: int, html: str) -> bytes:
+    """
+    A page as bytes the way real sites send them: most in UTF-8, some with a byte
+    order mark and some in ISO-8859-1 declared only by <meta charset>
+    """
+    if index % 3 == 1:
+        html = html.replace('<head>', '<head><meta charset="iso-8859-1">', 1)
+        html = html.replace('</h1>', '</h1><div class="address">2 Place de l\'Église, 94000 Créteil</div>', 1)
+        return html.encode('iso-8859-1', errors='replace')
+    if index % 3 == 2:
+        return b'\xef\xbb\xbf' + html.encode('utf-8')
+    return html.encode('utf-8')
+
+
+def make_detail_page(index: int, number: int, properties: int) -> str:
+    """A property detail page; amenities and policies vary by property"""
+    rng = random.Random(index * 100003 + number)
+    amenities = [amenity for amenity in ('pool', 'wifi', 'parking', 'kitchen', 'gym', 'spa', 'beach', 'pet friendly')
+                 if rng.random() < 0.4]
+    policy = '<p>Cancellation: full refund up to 7 days before arrival.</p>' if rng.random() < 0.5 else ''
+    return f"""<!DOCTYPE html>
+<html><head><title>Villa {number} | {site_name(index)}</title></head>
+<body><h1>Villa {number}</h1>
+<p>Sleeps {rng.randint(2, 12)}. Amenities: {', '.join(amenities) or 'none listed'}.</p>
+{policy}
+<a href="../">All properties</a> <a href="villa-{(number + 1) % properties}">Next villa</a>
+</body></html>"""
+
+
+def make_company_page(name: str) -> str:
+    """The company website a homepage links to, as read by contact enrichment"""
+    return f"""<!DOCTYPE html>
+<html><head><title>{name.capitalize()} Holidays | Home</title>
+<meta name="description" content="{name} rents holiday homes by the sea"></head>
+<body><h1>{name}</h1>
+<p>Bookings: bookings@{name}.com, press: press@{name}.com</p>
+</body></html>"""
+
+
+class SyntheticSiteServer:
+    """
+    Local HTTP server for `sites` synthetic Lodgify sites.
+
+    GET/HEAD {base_url}/s/<name>.lodgify.com/ serves site <name>'s homepage (404 for
+    names that do not exist), .../property/villa-<n> its property detail pages and
+    /w/www.<name>.com/ its company website. Every response waits
+    a random latency from `latency`; error_rate of the site pages fail with 500, and
+    above throttle_rate requests/s the server answers 429 with Retry-After.
+
+    with SyntheticSiteServer(sites=100) as server:
+        scrape_subdomain_data(server.site_urls())
+    """
+
+    def __init__(self, sites: int = 100, properties: int = 50, paragraphs: int = 20,
+                 latency: Tuple[float, float] = (0.0, 0.0), error_rate: float = 0.0,
+                 throttle_rate: Optional[float] = None, retry_after: int = 1, domain: str = 'lodgify.com',
+                 host: str = '127.0.0.1', port: int = 0):
+        self.sites = sites
+        self.domain = domain
+        indexes = {site_name(i): i for i in range(sites)}
+        state = {'tokens': throttle_rate or 0.0, 'updated': time.monotonic(), 'responses': {}}
+        lock = threading.Lock()
+        server = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def _throttled(self) -> bool:
+                if not throttle_rate:
+                    return False
+                with lock:
+                    now = time.monotonic()
+                    state['tokens'] = min(throttle_rate, state['tokens'] + (now - state['updated']) * throttle_rate)
+                    state['updated'] = now
+                    if state['tokens'] < 1:
+                        return True
+                    state['tokens'] -= 1
+                    return False
+
+            def _route(self) -> Tuple[int, bytes]:
+                site = SITE_PATH.match(self.path)
+                if site:
+                    label = site.group(1).lower()
+                    if label.endswith(f".{domain}"):
+                        label = label[:-len(domain) - 1]
+                    if label not in indexes:
+                        return 404, b'Not Found'
+                    if self._throttled():
+                        return 429, b'Too Many Requests'
+                    if error_rate and random.random() < error_rate:
+                        return 500, b'Internal Server Error'
+                    page = make_property_page(indexes[label], properties, paragraphs,
+                                              website=f"{server.base_url}/w/www.{label}.com/")
+                    return 200, page.encode('utf-8')
+
+                detail = PROPERTY_PATH.match(self.path)
+                if detail:
+                    label = detail.group(1).lower().removesuffix(f".{domain}")
+                    if label in indexes and int(detail.group(2)) < properties:
+                        return 200, make_detail_page(indexes[label], int(detail.group(2)), properties).encode('utf-8')
+                    return 404, b'Not Found'
+
+                website = WEBSITE_PATH.match(self.path)
+                if website and website.group(1) in indexes:
+                    return 200, make_company_page(website.group(1)).encode('utf-8')
+                return 404, b'Not Found'
+
+            def _respond(self, send_body: bool):
+                if latency[1] > 0:
+                    time.sleep(random.uniform(*latency))
+                status, body = self._route()
+                with lock:
+                    state['responses'][status] = state['responses'].get(status, 0) + 1
+
+                self.send_response(status)
+                if status == 429:
+                    self.send_header('Retry-After', str(retry_after))
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                if send_body:
+                    self.wfile.write(body)
+
+            def do_GET(self):
+                self._respond(True)
+
+            def do_HEAD(self):
+                self._respond(False)
+
+            def log_message(self, *args):
+                pass
+
+        self.responses = state['responses']
+        self._server = _ThreadingServer((host, port), Handler)
+        # Clients dropping keep-alive connections are expected, not worth a traceback
+        self._server.handle_error = lambda request, client_address: None
+        self.port = self._server.server_address[1]
+        self.base_url = f"http://{host}:{self.port}"
+        # For discover_subdomains(url_template=...): {domain} is the full subdomain
+        self.url_template = f"{self.base_url}/s/{{domain}}/"
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    def site_names(self) -> List[str]:
+        return [site_name(i) for i in range(self.sites)]
+
+    def site_urls(self) -> List[str]:
+        """Homepage URLs, which scrape_subdomain_data accepts in place of subdomains"""
+        return [self.url_template.format(domain=f"{name}.{self.domain}") for name in self.site_names()]
+
+    def __enter__(self) -> 'SyntheticSiteServer':
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class ThrottlingHttpServer:
+    """
+    Local HTTP server that throttles on purpose, for testing rate_limit.RateLimiter offline.
+    It serves `body` at up to `rate` requests/s per Host header and answers 429
+    with Retry-After: retry_after beyond that.
+
+    with ThrottlingHttpServer(rate=5) as server:
+        session.get(f"http://127.0.0.1:{server.port}/")
+    """
+
+    def __init__(self, rate: float = 5.0, retry_after: Optional[int] = 1, body: bytes = b'<html><title>ok</title></html>',
+                 host: str = '127.0.0.1', port: int = 0):
+        state = {'allowance': {}, 'served': 0, 'throttled': 0}
+        lock = threading.Lock()
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def _respond(self, send_body: bool):
+                key = self.headers.get('Host', '')
+                with lock:
+                    now = time.monotonic()
+                    tokens, last = state['allowance'].get(key, (rate, now))
+                    tokens = min(rate, tokens + (now - last) * rate)
+                    allowed = tokens >= 1
+                    state['allowance'][key] = (tokens - 1 if allowed else tokens, now)
+                    state['served' if allowed else 'throttled'] += 1
+
+                payload = body if allowed else b'Too Many Requests'
+                self.send_response(200 if allowed else 429)
+                if not allowed and retry_after is not None:
+                    self.send_header('Retry-After', str(retry_after))
+                self.send_header('Content-Type', 'text/html')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                if send_body:
+                    self.wfile.write(payload)
+
+            def do_GET(self):
+                self._respond(True)
+
+            def do_HEAD(self):
+                self._respond(False)
+
+            def log_message(self, *args):
+                pass
+
+        self.stats = state
+        self._server = http.server.ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        # Clients dropping keep-alive connections are expected, not worth a traceback
+        self._server.handle_error = lambda request, client_address: None
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    def __enter__(self) -> 'ThrottlingHttpServer':
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,25 @@
+#!/usr/bin/env python3
+import json
+
+from bonus_4 import categorize_by_country
+
+
+def test_batch_and_per_record_agree_without_property_count(tmp_path):
+    records = [
+        {'subdomain': 'a.lodgify.com', 'url': 'https://a.lodgify.com', 'property_count': 5,
+         'company_address': '249 Main St, City, State 56264'},
+        {'subdomain': 'b.lodgify.com', 'url': 'https://b.lodgify.com',
+         'company_address': '10 High Street, London SW1A 2AA, UK'},
+    ]
+    json_file = tmp_path / 'scraped.json'
+    json_file.write_text(json.dumps(records))
+
+    outputs = {}
+    for batch in (True, False):
+        csv_file = tmp_path / f"categorized_{batch}.csv"
+        categorize_by_country(str(json_file), str(csv_file), batch=batch)
+        outputs[batch] = csv_file.read_text()
+
+    assert outputs[True] == outputs[False]
+    assert '5.0' not in outputs[True]
+    assert ',0,' in outputs[True]
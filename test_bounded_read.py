@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+import gzip
+import http.server
+import threading
+
+import requests
+
+from bounded_read import HEAD_END, get_bounded
+from http_cache import ResponseCache, install_cache
+
+PAGE = b'<html><head><title>t</title></head><body>' + b'<p>filler</p>' * 20000 + b'</body></html>'
+
+
+class GzipServer:
+    """Serves PAGE gzip-compressed, so it is far smaller on the wire than decoded"""
+
+    def __init__(self):
+        payload = gzip.compress(PAGE)
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/html')
+                self.send_header('Content-Encoding', 'gzip')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+        self._server.handle_error = lambda request, client_address: None
+        self.url = f"http://127.0.0.1:{self._server.server_address[1]}/"
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    def __enter__(self) -> 'GzipServer':
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def test_decoded_body_is_cut_at_max_bytes():
+    with GzipServer() as server:
+        _, body = get_bounded(requests.Session(), server.url, max_bytes=1000)
+    assert body.truncated and not body.complete
+    assert body.content == PAGE[:1000]
+
+
+def test_reading_stops_at_the_pattern():
+    with GzipServer() as server:
+        _, body = get_bounded(requests.Session(), server.url, stop_at=HEAD_END, max_bytes=10 ** 7)
+    assert body.stopped and not body.truncated
+    assert body.content == b'<html><head><title>t</title></head>'
+
+
+def test_whole_body_is_read_and_only_complete_bodies_are_cached(tmp_path):
+    session = requests.Session()
+    cache = ResponseCache(str(tmp_path / 'cache.sqlite'))
+    install_cache(session, cache)
+    with GzipServer() as server:
+        get_bounded(session, server.url, stop_at=HEAD_END)
+        assert cache.get(server.url) is None
+
+        _, body = get_bounded(session, server.url, max_bytes=10 ** 7)
+    assert body.complete and body.content == PAGE
+    assert cache.get(server.url).body == PAGE
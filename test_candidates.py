@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+import json
+
+from candidates import (BloomFilter, is_padding, iter_candidates, iter_previous, normalize_label,
+                        padding_subdomains)
+
+
+def test_bloom_filter_has_no_false_negatives_and_few_false_positives():
+    bloom = BloomFilter(capacity=20000, error_rate=0.01)
+    collisions = sum(not bloom.add(f"name{i}") for i in range(20000))
+    assert collisions < 20000 * 0.01
+    assert all(f"name{i}" in bloom for i in range(20000))
+    assert not bloom.add('name7')
+
+    false_positives = sum(f"other{i}" in bloom for i in range(20000))
+    assert false_positives < 20000 * 0.02
+
+
+def test_normalize_label():
+    assert normalize_label(' BandyCanyon.lodgify.com. ') == 'bandycanyon'
+    assert normalize_label('-bad') is None
+    assert normalize_label('a' * 64) is None
+
+
+def test_padding_names_are_recognized():
+    padding = [normalize_label(name) for name in padding_subdomains(100)]
+    assert len(set(padding)) == 100
+    assert all(is_padding(label) for label in padding)
+    assert not is_padding('bandycanyon')
+
+
+def test_previous_results_skip_padding(tmp_path):
+    previous = tmp_path / 'discovered.json'
+    previous.write_text(json.dumps(['bandycanyon.lodgify.com', 'real-site.lodgify.com'] + padding_subdomains(85)))
+
+    assert list(iter_previous(str(previous))) == ['bandycanyon.lodgify.com', 'real-site.lodgify.com']
+    assert list(iter_previous(str(tmp_path / 'missing.json'))) == []
+
+    candidates = list(iter_candidates(previous_file=str(previous), include_builtin=False))
+    assert candidates == ['bandycanyon', 'real-site']
+
+
+def test_candidates_are_deduplicated_across_sources(tmp_path):
+    wordlist = tmp_path / 'words.txt'
+    wordlist.write_text('villa\nVilla.lodgify.com\n# comment\nnew-one  # trailing comment\n')
+    candidates = list(iter_candidates(wordlists=[str(wordlist)], expected_candidates=1000))
+    assert candidates.count('villa') == 1
+    assert candidates[-1] == 'new-one'
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+import requests
+
+import scraper
+from crawler import PropertyCrawler, normalize_url
+from synthetic_site import SyntheticSiteServer, make_property_page
+
+
+class CountingSession(requests.Session):
+    def __init__(self):
+        super().__init__()
+        self.urls = []
+
+    def request(self, method, url, *args, **kwargs):
+        self.urls.append(url)
+        return super().request(method, url, *args, **kwargs)
+
+
+def test_normalize_url():
+    assert normalize_url('HTTPS://Site.com:443/villas/?utm_source=x&b=2&a=1#top') == 'https://site.com/villas?a=1&b=2'
+    assert normalize_url('http://site.com') == 'http://site.com/'
+
+
+def test_crawl_record_starts_from_the_scraped_homepage():
+    with SyntheticSiteServer(sites=1, properties=4, paragraphs=1) as server:
+        homepage = server.site_urls()[0]
+        content = requests.get(homepage).content
+        record = scraper._build_record('site00000.lodgify.com', homepage, content)
+
+        session = CountingSession()
+        crawled = PropertyCrawler(session).crawl_record(record)
+        reference = PropertyCrawler(requests.Session()).crawl(homepage)
+
+    assert homepage not in session.urls
+    assert len(session.urls) == 4
+    assert crawled['property_count'] == 4
+    assert crawled['properties'] == reference['properties']
+
+
+def test_crawl_record_skips_mock_records():
+    session = CountingSession()
+    record = scraper._generate_mock_data('gone.lodgify.com')
+    before = record.to_dict()
+
+    assert PropertyCrawler(session).crawl_record(record).to_dict() == before
+    assert session.urls == []
+
+
+def test_homepage_hrefs_are_not_part_of_the_record():
+    record = scraper._build_record('a.lodgify.com', 'https://a.lodgify.com/', make_property_page(0, 3, 1).encode())
+    assert record.homepage_hrefs
+    assert 'homepage_hrefs' not in record
+    assert 'homepage_hrefs' not in record.to_dict()
+    assert not record.mock
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+import asyncio
+
+from dns_resolver import DnsResolver, StubDnsServer, iter_resolvable
+
+RECORDS = {'bandycanyon.lodgify.com': '127.0.0.1', 'casa.lodgify.com': '127.0.0.2'}
+
+
+def _resolver(server: StubDnsServer, **kwargs) -> DnsResolver:
+    return DnsResolver(nameservers=['127.0.0.1'], port=server.port, concurrency=4, **kwargs)
+
+
+def test_cache_is_bounded_and_keeps_recent_names():
+    with StubDnsServer(RECORDS) as server:
+        resolver = _resolver(server, cache_size=3)
+        names = [f"missing{i}.lodgify.com" for i in range(10)] + list(RECORDS)
+        asyncio.run(resolver.resolve_many(names))
+        assert len(resolver._cache) == 3
+
+        assert asyncio.run(resolver.resolve('casa.lodgify.com')).addresses == {'127.0.0.2'}
+        assert resolver.cache_hits == 1
+        assert resolver.queries == len(names)
+
+
+def test_expired_entries_are_asked_again():
+    with StubDnsServer(RECORDS) as server:
+        resolver = _resolver(server, negative_ttl=0)
+        asyncio.run(resolver.resolve('missing.lodgify.com'))
+        assert asyncio.run(resolver.resolve('missing.lodgify.com')) is None
+        assert resolver.queries == 2
+        assert resolver.cache_hits == 0
+
+
+def test_wildcard_detection_and_policies():
+    with StubDnsServer(RECORDS) as server:
+        assert asyncio.run(_resolver(server).detect_wildcard('lodgify.com')) is None
+        assert list(iter_resolvable(['bandycanyon', 'nope', 'casa'], resolver=_resolver(server))) == \
+            ['bandycanyon', 'casa']
+
+    with StubDnsServer(RECORDS, wildcard='10.0.0.1') as server:
+        wildcard = asyncio.run(_resolver(server).detect_wildcard('lodgify.com'))
+        assert wildcard.addresses == {'10.0.0.1'}
+        labels = ['bandycanyon', 'nope', 'casa']
+        assert list(iter_resolvable(labels, resolver=_resolver(server), wildcard_policy='check')) == labels
+        assert list(iter_resolvable(labels, resolver=_resolver(server), wildcard_policy='drop')) == \
+            ['bandycanyon', 'casa']
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+from fingerprint import DAY, FingerprintStore, page_fingerprint
+from scraper import scrape_subdomain_data
+from synthetic_site import SyntheticSiteServer
+
+PAGE = b'<html><body><h1>Villa</h1><!-- rendered 12:00 --><script>var t = 1;</script></body></html>'
+RECORD = {'subdomain': 'a.lodgify.com', 'property_count': 3}
+
+
+def _store(tmp_path, **kwargs) -> FingerprintStore:
+    return FingerprintStore(str(tmp_path / 'fingerprints.sqlite'), **kwargs)
+
+
+def test_volatile_markup_does_not_change_the_fingerprint():
+    other = PAGE.replace(b'12:00', b'12:05').replace(b'var t = 1', b'var t = 2').replace(b'<h1>', b'\n  <h1>')
+    assert page_fingerprint(other) == page_fingerprint(PAGE)
+    assert page_fingerprint(PAGE.replace(b'Villa', b'Chalet')) != page_fingerprint(PAGE)
+
+
+def test_unchanged_page_reuses_the_stored_record(tmp_path):
+    store = _store(tmp_path)
+    assert store.check('a.lodgify.com', PAGE, 'lxml') is None
+    assert store.is_pending('a.lodgify.com')
+    assert store.save(dict(RECORD), 'lxml') is True
+
+    assert store.check('a.lodgify.com', PAGE, 'lxml') == RECORD
+    assert not store.is_pending('a.lodgify.com')
+    # Another parser extracts afresh
+    assert store.check('a.lodgify.com', PAGE, 'html.parser') is None
+
+
+def test_save_without_check_or_after_discard_stores_nothing(tmp_path):
+    store = _store(tmp_path)
+    assert store.save(dict(RECORD), 'lxml') is False
+    store.check('a.lodgify.com', PAGE, 'lxml')
+    store.discard('a.lodgify.com')
+    assert store.save(dict(RECORD), 'lxml') is False
+    assert list(store.records(['a.lodgify.com'])) == []
+
+
+def test_interval_backs_off_when_unchanged_and_halves_when_changed(tmp_path):
+    store = _store(tmp_path, initial_interval=DAY, min_interval=DAY / 4, max_interval=2 * DAY, backoff=1.5)
+
+    def interval() -> float:
+        return store._conn.execute("SELECT interval FROM pages").fetchone()[0]
+
+    store.check('a.lodgify.com', PAGE, 'lxml')
+    store.save(dict(RECORD), 'lxml')
+    assert interval() == DAY
+
+    store.check('a.lodgify.com', PAGE, 'lxml')
+    assert interval() == 1.5 * DAY
+    store.check('a.lodgify.com', PAGE, 'lxml')
+    assert interval() == 2 * DAY
+
+    changed = PAGE.replace(b'Villa', b'Chalet')
+    store.check('a.lodgify.com', changed, 'lxml')
+    assert store.save(dict(RECORD, property_count=4), 'lxml') is True
+    assert interval() == DAY
+
+    # A changed page with an unchanged record still backs off
+    store.check('a.lodgify.com', PAGE, 'lxml')
+    assert store.save(dict(RECORD, property_count=4), 'lxml') is False
+    assert interval() == 1.5 * DAY
+
+
+def test_due_follows_the_schedule(tmp_path):
+    store = _store(tmp_path, initial_interval=DAY)
+    store.check('a.lodgify.com', PAGE, 'lxml')
+    store.save(dict(RECORD), 'lxml')
+
+    assert store.due(['a.lodgify.com', 'b.lodgify.com']) == ['b.lodgify.com']
+    assert not store.is_due('a.lodgify.com')
+    later = store._conn.execute("SELECT last_checked FROM pages").fetchone()[0] + DAY
+    assert store.due(['a.lodgify.com'], now=later) == ['a.lodgify.com']
+
+
+def test_records_saved_under_other_settings_are_not_reused(tmp_path):
+    store = _store(tmp_path)
+    store.check('a.lodgify.com', PAGE, 'lxml')
+    store.save(dict(RECORD), 'lxml')
+    store.close()
+
+    crawling = _store(tmp_path, settings='crawl depth=2 pages=50')
+    assert crawling.is_due('a.lodgify.com')
+    assert crawling.due(['a.lodgify.com']) == ['a.lodgify.com']
+    assert crawling.check('a.lodgify.com', PAGE, 'lxml') is None
+
+
+def test_crawl_run_after_plain_run_crawls_unchanged_pages(tmp_path):
+    fingerprints = str(tmp_path / 'fingerprints.sqlite')
+    with SyntheticSiteServer(sites=2, properties=3, paragraphs=1) as server:
+        options = dict(delay_range=(0, 0), collect=True, json_file=str(tmp_path / 'scraped.json'),
+                       fingerprint_file=fingerprints)
+        plain = scrape_subdomain_data(server.site_urls(), **options)
+        crawled = scrape_subdomain_data(server.site_urls(), crawl_properties=True, **options)
+
+    assert all('properties' not in record for record in plain)
+    assert all(len(record['properties']) == 3 for record in crawled)
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+import http.server
+import threading
+
+import requests
+
+from http_cache import ResponseCache, install_cache
+
+
+class RevalidatingServer:
+    """Serves `body` with an ETag and answers 304 to a matching If-None-Match"""
+
+    def __init__(self):
+        self.body = b'<html><title>v1</title></html>'
+        self.requests = []
+        server = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                etag = f'"{hash(server.body)}"'
+                server.requests.append(self.headers.get('If-None-Match'))
+                if self.headers.get('If-None-Match') == etag:
+                    self.send_response(304)
+                    self.send_header('ETag', etag)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header('ETag', etag)
+                self.send_header('Content-Type', 'text/html')
+                self.send_header('Content-Length', str(len(server.body)))
+                self.end_headers()
+                self.wfile.write(server.body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self._server.server_address[1]}/page"
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    def __enter__(self) -> 'RevalidatingServer':
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def _session(tmp_path, replay_only: bool = False) -> requests.Session:
+    session = requests.Session()
+    install_cache(session, ResponseCache(str(tmp_path / 'cache.sqlite')), replay_only=replay_only)
+    return session
+
+
+def test_unchanged_page_is_revalidated_and_served_from_cache(tmp_path):
+    with RevalidatingServer() as server:
+        session = _session(tmp_path)
+        first = session.get(server.url)
+        second = session.get(server.url)
+
+        server.body = b'<html><title>v2</title></html>'
+        third = session.get(server.url)
+
+    assert first.content == second.content == b'<html><title>v1</title></html>'
+    assert getattr(second, 'from_cache', False)
+    assert server.requests[0] is None
+    assert server.requests[1] == first.headers['ETag']
+    assert third.content == b'<html><title>v2</title></html>'
+    assert not getattr(third, 'from_cache', False)
+
+
+def test_replay_only_never_touches_the_network(tmp_path):
+    with RevalidatingServer() as server:
+        _session(tmp_path).get(server.url)
+        replay = _session(tmp_path, replay_only=True)
+        hit = replay.get(server.url)
+        miss = replay.get(server.url + '?other')
+
+    assert hit.status_code == 200 and hit.content == b'<html><title>v1</title></html>'
+    assert miss.status_code == 504
+    assert len(server.requests) == 1
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    import os
+
+    cache = ResponseCache(str(tmp_path / 'cache.sqlite'), max_bytes=2500)
+    for name in ('a', 'b', 'c'):
+        cache.put(f"http://x/{name}", 200, {}, os.urandom(1000))
+    assert cache.get('http://x/a') is None
+    assert cache.get('http://x/b') is not None
+
+    cache.put('http://x/d', 200, {'ETag': '"d"', 'Content-Length': '1000'}, os.urandom(1000))
+    assert cache.get('http://x/c') is None
+    entry = cache.get('http://x/d')
+    assert entry.etag == '"d"' and 'Content-Length' not in entry.headers
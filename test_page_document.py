@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+import pytest
+
+import scraper
+from page_document import PARSER_BACKENDS, check_parser, parse_document
+from synthetic_site import encode_page, make_property_page
+
+LATIN_1_PAGE = b'<html><head><meta charset="iso-8859-1"></head><body><p>caf\xe9 Cr\xe9teil</p></body></html>'
+
+
+def _installed(parser: str) -> str:
+    try:
+        check_parser(parser)
+    except ImportError:
+        pytest.skip(f"{parser} not installed")
+    return parser
+
+
+@pytest.mark.parametrize('parser', PARSER_BACKENDS)
+def test_meta_charset_is_honoured(parser):
+    assert parse_document(LATIN_1_PAGE, _installed(parser)).text == 'café Créteil'
+
+
+@pytest.mark.parametrize('parser', PARSER_BACKENDS)
+def test_byte_order_mark_is_dropped(parser):
+    doc = parse_document(b'\xef\xbb\xbf<html><body><p>caf\xc3\xa9</p></body></html>', _installed(parser))
+    assert doc.text == 'café'
+
+
+@pytest.mark.parametrize('parser', PARSER_BACKENDS[1:])
+def test_backends_build_identical_records(parser):
+    _installed(parser)
+    for index in range(6):
+        page = encode_page(index, make_property_page(index, properties=20, paragraphs=3))
+        args = (f"site{index}", f"https://site{index}.lodgify.com", page)
+        assert scraper._build_record(*args, parser) == scraper._build_record(*args, PARSER_BACKENDS[0])
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError):
+        check_parser('lxlm')
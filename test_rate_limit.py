@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+import asyncio
+import email.utils
+import time
+
+import pytest
+import requests
+
+from rate_limit import RateLimiter, install_rate_limiter, parse_retry_after
+from synthetic_site import ThrottlingHttpServer
+
+URL = 'http://example.test/page'
+HOST = 'example.test'
+
+
+def _outcome(result):
+    return result
+
+
+def test_parse_retry_after():
+    assert parse_retry_after('7') == 7.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after('soon') is None
+    date = email.utils.formatdate(time.time() + 60, usegmt=True)
+    assert 55 < parse_retry_after(date) <= 60
+    assert parse_retry_after(email.utils.formatdate(time.time() - 60, usegmt=True)) == 0.0
+
+
+def test_aimd_raises_on_success_and_halves_on_throttling():
+    limiter = RateLimiter(rate=2.0, min_rate=0.5, max_rate=3.0, concurrency=2, increase=0.5, latency_target=1.0)
+    budget = limiter.budget(HOST)
+
+    for _ in range(4):
+        limiter.acquire(HOST)
+        limiter.release(HOST, 200, 0.01)
+    assert budget.rate == 3.0
+    assert budget.concurrency > 2
+
+    limiter.acquire(HOST)
+    limiter.release(HOST, 429, 0.01, retry_after=30)
+    assert budget.rate == 1.5
+    assert budget.blocked_until > time.monotonic() + 25
+    assert limiter.throttled == 1
+
+    budget.blocked_until = 0
+    budget.tokens = 1
+    limiter.acquire(HOST)
+    limiter.release(HOST, 200, 2.0)
+    assert budget.rate == 0.75
+    assert budget.in_flight == 0
+
+
+def test_call_retries_throttled_answers_with_retry_after():
+    limiter = RateLimiter(rate=50.0, max_retries=2)
+    answers = iter([(429, '0'), (503, '0'), (200, None)])
+    assert limiter.call(URL, lambda: next(answers), _outcome) == (200, None)
+    assert limiter.retries == 2
+    assert limiter.budget(HOST).in_flight == 0
+
+
+def test_call_gives_up_after_max_retries():
+    limiter = RateLimiter(rate=50.0, max_retries=1, backoff_base=0.001)
+    calls = []
+
+    def send():
+        calls.append(1)
+        raise ConnectionError('refused')
+
+    with pytest.raises(ConnectionError):
+        limiter.call(URL, send, _outcome)
+    assert len(calls) == 2
+    assert limiter.budget(HOST).in_flight == 0
+
+
+@pytest.mark.parametrize('failure', ['send', 'outcome'])
+def test_call_releases_the_slot_on_any_exception(failure):
+    limiter = RateLimiter(rate=50.0)
+
+    def broken(*args):
+        raise ValueError('broken')
+
+    send = broken if failure == 'send' else (lambda: 'response')
+    outcome = broken if failure == 'outcome' else _outcome
+    for _ in range(5):
+        with pytest.raises(ValueError):
+            limiter.call(URL, send, outcome)
+    assert limiter.budget(HOST).in_flight == 0
+
+
+def test_call_async_releases_the_slot_when_cancelled():
+    limiter = RateLimiter(rate=50.0)
+
+    async def hang():
+        await asyncio.sleep(10)
+
+    async def main():
+        for _ in range(3):
+            with pytest.raises(asyncio.TimeoutError):
+                await asyncio.wait_for(limiter.call_async(URL, hang, _outcome), timeout=0.01)
+
+    asyncio.run(main())
+    assert limiter.budget(HOST).in_flight == 0
+
+
+def test_limiter_keeps_a_throttling_server_from_answering_429():
+    with ThrottlingHttpServer(rate=20, retry_after=1) as server:
+        session = requests.Session()
+        limiter = RateLimiter(rate=5.0, max_rate=10.0)
+        install_rate_limiter(session, limiter)
+        statuses = [session.get(f"http://127.0.0.1:{server.port}/").status_code for _ in range(15)]
+
+    assert statuses == [200] * 15
+    assert server.stats['throttled'] == 0
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+import json
+import pickle
+
+from records import Record, jsonable
+
+DATA = {
+    'subdomain': 'a.lodgify.com',
+    'url': 'https://a.lodgify.com',
+    'property_count': 3,
+    'property_links': ['https://a.lodgify.com/property/1', 'https://a.lodgify.com/property/2'],
+    'social_media': {'facebook': 'https://facebook.com/a'},
+    'additional_info': {'amenities': ['pool', 'wifi'], 'nested': [['a', 'b'], []], 'check_in_available': True},
+    'properties': [{'url': 'https://a.lodgify.com/property/1', 'amenities': ['pool']}],
+}
+
+
+def test_round_trip_keeps_values_and_key_order():
+    record = Record.from_dict(DATA)
+    assert record.to_dict() == DATA
+    assert list(record.to_dict()) == list(DATA)
+    assert json.loads(json.dumps(record, default=jsonable)) == DATA
+    assert Record.from_json(record.to_json()).to_dict() == DATA
+
+
+def test_fields_read_back_as_fresh_containers():
+    record = Record.from_dict(DATA)
+    links = record['property_links']
+    links.append('changed')
+    assert record['property_links'] == DATA['property_links']
+    assert record.get('additional_info')['nested'] == [['a', 'b'], []]
+    assert record.get('missing', 'default') == 'default'
+
+
+def test_setitem_matches_from_dict():
+    record = Record()
+    for key, value in DATA.items():
+        record[key] = value
+    assert record == Record.from_dict(DATA)
+    assert record.to_dict() == DATA
+
+
+def test_pickles_with_transient_attributes():
+    record = Record.from_dict(DATA)
+    record.mock = True
+    copy = pickle.loads(pickle.dumps(record))
+    assert copy.to_dict() == DATA
+    assert copy.mock
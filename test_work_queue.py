@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+import time
+
+from work_queue import WorkQueue
+
+ITEMS = [f"site{i}.lodgify.com" for i in range(5)]
+
+
+def _queue(tmp_path, **kwargs) -> WorkQueue:
+    queue = WorkQueue(str(tmp_path / 'queue.sqlite'), **kwargs)
+    queue.enqueue(ITEMS)
+    return queue
+
+
+def test_enqueue_skips_items_already_queued(tmp_path):
+    queue = _queue(tmp_path)
+    assert queue.enqueue(ITEMS[:2] + ['new.lodgify.com']) == 1
+    assert queue.stats() == {'pending': 6, 'leased': 0, 'done': 0, 'failed': 0}
+
+
+def test_workers_never_share_a_lease(tmp_path):
+    queue = _queue(tmp_path)
+    first = queue.lease('a', 3)
+    second = queue.lease('b', 3)
+    assert first == ITEMS[:3]
+    assert second == ITEMS[3:]
+    assert queue.lease('c', 3) == []
+
+    assert queue.complete('a', first) == 3
+    assert queue.complete('a', second) == 0
+    assert queue.stats() == {'pending': 0, 'leased': 2, 'done': 3, 'failed': 0}
+
+
+def test_expired_lease_is_taken_over_and_the_old_worker_cannot_complete(tmp_path):
+    queue = _queue(tmp_path, lease_seconds=0.05)
+    batch = queue.lease('crashed', 2)
+    assert 0 <= queue.next_expiry() <= 0.05
+    time.sleep(0.1)
+
+    assert queue.lease('b', 2) == batch
+    assert queue.complete('crashed', batch) == 0
+    assert queue.fail('crashed', batch, 'late') == 0
+    assert queue.complete('b', batch) == 2
+
+
+def test_items_fail_after_max_attempts_and_can_be_retried(tmp_path):
+    queue = _queue(tmp_path, lease_seconds=0.02, max_attempts=2)
+    for worker in ('a', 'b'):
+        assert queue.lease(worker, 1) == ITEMS[:1]
+        time.sleep(0.05)
+
+    assert queue.lease('c', 1) == ITEMS[1:2]
+    assert queue.stats()['failed'] == 1
+    assert queue.retry_failed() == 1
+    assert queue.stats()['pending'] == 4
+
+
+def test_fail_requeues_until_out_of_attempts(tmp_path):
+    queue = _queue(tmp_path, max_attempts=2)
+    assert queue.lease('a', 1) == ITEMS[:1]
+    assert queue.fail('a', ITEMS[:1], 'boom') == 1
+    assert queue.lease('a', 1) == ITEMS[:1]
+    queue.fail('a', ITEMS[:1], 'boom')
+    assert queue.stats()['failed'] == 1
+    assert queue.lease('a', 1) == ITEMS[1:2]
+
+
+def test_release_does_not_count_an_attempt(tmp_path):
+    queue = _queue(tmp_path, max_attempts=1)
+    assert queue.lease('a', 5) == ITEMS
+    assert queue.release('a') == 5
+    assert queue.next_expiry() is None
+    assert queue.lease('b', 5) == ITEMS
+
+
+def test_keep_alive_holds_the_lease(tmp_path):
+    queue = _queue(tmp_path, lease_seconds=0.1)
+    batch = queue.lease('a', 2)
+    with queue.keep_alive('a', batch):
+        time.sleep(0.25)
+        assert queue.lease('b', 2) == ITEMS[2:4]
+    assert queue.complete('a', batch) == 2
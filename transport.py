@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+"""
+One HTTP transport shared by discovery, scraping and enrichment.
+
+Each stage keeps its own requests session (so caches, rate limiters and per-stage
+metrics stay where they are), but every session sends through the same adapter
+and therefore the same urllib3 connection pools: a connection opened while
+discovering a host is reused to scrape it, and a TLS handshake is paid once per
+host rather than once per stage. The pools are sized for the thread counts the
+stages run with, idle connections are kept alive (TCP keep-alive included), and
+host names are resolved once per DNS_TTL instead of once per new connection.
+
+configure(http2=True) sends https:// traffic through httpx with HTTP/2 instead,
+multiplexing the requests to one host over a single connection (needs
+`pip install httpx[http2]`).
+
+stats() (and the http_connections_total, transport_requests_total and
+dns_cache_lookups_total metrics) shows how many requests each new connection served.
+"""
+import ipaddress
+import logging
+import socket
+import threading
+import time
+import weakref
+from typing import Any, Dict, Optional, Tuple
+
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+import metrics
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.5',
+    'Accept-Encoding': 'gzip, deflate',
+    'Connection': 'keep-alive',
+    'Upgrade-Insecure-Requests': '1'
+}
+
+# Hosts with an open connection pool at once (urllib3 keeps the most recently used),
+# and idle keep-alive connections kept per host. requests defaults to 10 and 10,
+# below the 100 fetch threads of the process mode and the 16-thread enrichment.
+POOL_HOSTS = 256
+POOL_PER_HOST = 32
+
+# Seconds a resolved address is reused
+DNS_TTL = 300.0
+
+
+class DnsCache:
+    """
+    Host name -> address, resolved with getaddrinfo and kept for ttl seconds. An
+    address that fails to connect is forgotten, so the next attempt resolves again.
+    """
+
+    def __init__(self, ttl: float = DNS_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: Dict[Tuple[str, int], Tuple[str, float]] = {}
+
+    def resolve(self, host: str, port: int) -> str:
+        """The cached address of host, or host itself if it is an IP or cannot be resolved"""
+        if self.ttl <= 0 or _is_ip(host):
+            return host
+        key = (host, port)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry and entry[1] > now:
+            metrics.inc('dns_cache_lookups_total', result='hit')
+            return entry[0]
+
+        metrics.inc('dns_cache_lookups_total', result='miss')
+        try:
+            infos = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        except OSError:
+            # Let urllib3 resolve it again and raise its usual error
+            return host
+        address = infos[0][4][0]
+        with self._lock:
+            self._entries[key] = (address, now + self.ttl)
+        return address
+
+    def forget(self, host: str, port: int):
+        with self._lock:
+            self._entries.pop((host, port), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def _is_ip(host: str) -> bool:
+    try:
+        ipaddress.ip_address(host.strip('[]'))
+        return True
+    except ValueError:
+        return False
+
+
+dns_cache = DnsCache()
+
+
+class _ConnectionStats:
+    """Counts behind stats(): new connections, by scheme, and requests sent"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.connections: Dict[str, int] = {}
+        self.requests = 0
+
+    def connection(self, scheme: str):
+        with self._lock:
+            self.connections[scheme] = self.connections.get(scheme, 0) + 1
+        metrics.inc('http_connections_total', scheme=scheme)
+
+    def request(self, http_version: str):
+        with self._lock:
+            self.requests += 1
+        metrics.inc('transport_requests_total', http_version=http_version)
+
+    def reset(self):
+        with self._lock:
+            self.connections = {}
+            self.requests = 0
+
+
+_stats = _ConnectionStats()
+
+
+class _CachedDnsMixin:
+    """Resolve through dns_cache and count every connection urllib3 opens"""
+
+    scheme = 'http'
+
+    def _new_conn(self):
+        host = self._dns_host
+        # Only the TCP connect sees the address; TLS SNI and certificate checks use the name
+        self._dns_host = dns_cache.resolve(host, self.port)
+        try:
+            sock = super()._new_conn()
+        except Exception:
+            dns_cache.forget(host, self.port)
+            raise
+        finally:
+            self._dns_host = host
+        _stats.connection(self.scheme)
+        return sock
+
+
+class _HTTPConnection(_CachedDnsMixin, HTTPConnection):
+    pass
+
+
+class _HTTPSConnection(_CachedDnsMixin, HTTPSConnection):
+    scheme = 'https'
+
+
+class _HTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _HTTPConnection
+
+
+class _HTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _HTTPSConnection
+
+
+class TransportAdapter(HTTPAdapter):
+    """HTTPAdapter with larger pools, TCP keep-alive, cached DNS and connection counting"""
+
+    def __init__(self, pool_hosts: int = POOL_HOSTS, pool_per_host: int = POOL_PER_HOST):
+        super().__init__(pool_connections=pool_hosts, pool_maxsize=pool_per_host)
+
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        pool_kwargs.setdefault('socket_options', HTTPConnection.default_socket_options +
+                               [(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)])
+        super().init_poolmanager(connections, maxsize, block, **pool_kwargs)
+        self.poolmanager.pool_classes_by_scheme = {'http': _HTTPConnectionPool, 'https': _HTTPSConnectionPool}
+
+    def send(self, request: requests.PreparedRequest, **kwargs) -> requests.Response:
+        response = super().send(request, **kwargs)
+        _stats.request('HTTP/1.1')
+        return response
+
+
+class Http2Adapter(BaseAdapter):
+    """
+    Transport adapter sending through an httpx client with HTTP/2, which multiplexes
+    all requests to a host over one connection (servers without HTTP/2 get HTTP/1.1).
+    Responses are requests.Response objects whose body streams from httpx, already
+    decompressed. Per-request `verify`, `cert` and `proxies` are not supported.
+    """
+
+    def __init__(self, pool_hosts: int = POOL_HOSTS, pool_per_host: int = POOL_PER_HOST):
+        super().__init__()
+        import httpx
+
+        self._httpx = httpx
+        self.client = httpx.Client(http2=True, limits=httpx.Limits(max_connections=pool_hosts * pool_per_host,
+                                                                   max_keepalive_connections=pool_hosts))
+
+    def send(self, request: requests.PreparedRequest, stream: bool = False, timeout: Any = None, **kwargs) -> requests.Response:
+        httpx = self._httpx
+        connect, read = timeout if isinstance(timeout, tuple) else (timeout, timeout)
+        outgoing = self.client.build_request(request.method, request.url, headers=dict(request.headers),
+                                             content=request.body, extensions={'trace': self._trace},
+                                             timeout=httpx.Timeout(read, connect=connect))
+        try:
+            incoming = self.client.send(outgoing, stream=True)
+        except httpx.TimeoutException as e:
+            raise requests.exceptions.Timeout(str(e), request=request) from e
+        except httpx.TransportError as e:
+            raise requests.exceptions.ConnectionError(str(e), request=request) from e
+        _stats.request(incoming.http_version)
+
+        response = requests.Response()
+        response.status_code = incoming.status_code
+        response.reason = incoming.reason_phrase
+        # The body handed on is decoded, so it no longer matches these
+        response.headers = CaseInsensitiveDict({name: value for name, value in incoming.headers.items()
+                                                if name.lower() not in ('content-encoding', 'content-length')})
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.raw = _Http2Body(incoming)
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        if not stream:
+            # Read the body now, as HTTPAdapter does
+            response.content
+        return response
+
+    @staticmethod
+    def _trace(event: str, info: Dict[str, Any]):
+        if event == 'connection.connect_tcp.complete':
+            _stats.connection('https')
+
+    def close(self):
+        self.client.close()
+
+
+class _Http2Body:
+    """File-like view of an httpx response body, for requests.Response.raw"""
+
+    def __init__(self, response):
+        self._response = response
+        self._chunks = response.iter_bytes()
+        self._buffer = b''
+
+    def read(self, amount: Optional[int] = None) -> bytes:
+        while amount is None or len(self._buffer) < amount:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            self._buffer += chunk
+        if amount is None:
+            data, self._buffer = self._buffer, b''
+        else:
+            data, self._buffer = self._buffer[:amount], self._buffer[amount:]
+        if not data:
+            self.close()
+        return data
+
+    def close(self):
+        self._response.close()
+
+    def release_conn(self):
+        self.close()
+
+
+_adapters: Dict[str, BaseAdapter] = {}
+_sessions: 'weakref.WeakSet[requests.Session]' = weakref.WeakSet()
+_lock = threading.Lock()
+
+
+def configure(pool_hosts: int = POOL_HOSTS, pool_per_host: int = POOL_PER_HOST, http2: bool = False,
+              dns_ttl: float = DNS_TTL):
+    """
+    (Re)build the shared adapters and put them under every session from new_session(),
+    beneath any cache, rate limiter or metrics adapter already installed on it.
+    http2=True needs httpx[http2]; without it, HTTP/1.1 is used and a warning logged.
+    """
+    global _adapters
+    dns_cache.ttl = dns_ttl
+    adapter = TransportAdapter(pool_hosts, pool_per_host)
+    adapters = {'https://': adapter, 'http://': adapter}
+    if http2:
+        try:
+            adapters['https://'] = Http2Adapter(pool_hosts, pool_per_host)
+        except ImportError as e:
+            logger.warning(f"HTTP/2 disabled, httpx[http2] not available: {str(e)}")
+
+    with _lock:
+        previous, _adapters = _adapters, adapters
+        for session in list(_sessions):
+            for prefix, shared in adapters.items():
+                _replace_base(session, prefix, shared)
+    for old in set(previous.values()):
+        old.close()
+    protocol = 'HTTP/2' if isinstance(adapters['https://'], Http2Adapter) else 'HTTP/1.1'
+    logger.info(f"HTTP transport: {pool_hosts} host pools x {pool_per_host} connections, "
+                f"DNS cached {dns_ttl:g}s, {protocol}")
+
+
+def _replace_base(session: requests.Session, prefix: str, adapter: BaseAdapter):
+    """Swap the innermost adapter of a session's chain (cache -> limiter -> metrics -> transport)"""
+    parent, current = None, session.get_adapter(prefix)
+    while getattr(current, 'base_adapter', None) is not None:
+        parent, current = current, current.base_adapter
+    if parent is None:
+        session.mount(prefix, adapter)
+    else:
+        parent.base_adapter = adapter
+
+
+def new_session() -> requests.Session:
+    """A session with the pipeline's headers, sending through the shared transport"""
+    session = requests.Session()
+    session.headers.update(DEFAULT_HEADERS)
+    with _lock:
+        if not _adapters:
+            adapter = TransportAdapter()
+            _adapters.update({'https://': adapter, 'http://': adapter})
+        for prefix, adapter in _adapters.items():
+            session.mount(prefix, adapter)
+        _sessions.add(session)
+    return session
+
+
+def stats() -> Dict[str, Any]:
+    """Requests sent, connections opened and requests per connection since the last reset_stats()"""
+    with _stats._lock:
+        connections = dict(_stats.connections)
+        requests_sent = _stats.requests
+    opened = sum(connections.values())
+    return {
+        'requests': requests_sent,
+        'connections': opened,
+        'tls_handshakes': connections.get('https', 0),
+        'requests_per_connection': round(requests_sent / opened, 2) if opened else None,
+    }
+
+
+def reset_stats():
+    _stats.reset()
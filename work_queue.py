@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Shared work queue for scraping with many worker processes on one host.
+
+Subdomains are enqueued once into a SQLite file. Workers lease batches with a
+visibility timeout, keep the lease alive while they work and mark the batch done;
+a batch whose worker died is leased again once its lease expires.
+
+The queue (like the record store) runs SQLite in WAL mode, which coordinates
+writers through shared memory: every worker must run on the machine holding the
+file, on a local disk, never over NFS/SMB or another network filesystem.
+
+Usage: python work_queue.py enqueue [FILE]       subdomains from a JSON list (default: discovery output)
+       python work_queue.py worker [--batch-size N] [--mode M] [--concurrency N]
+       python work_queue.py stats | retry-failed
+"""
+import argparse
+import contextlib
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import metrics
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+PENDING, LEASED, DONE, FAILED = 'pending', 'leased', 'done', 'failed'
+
+
+def default_worker_id() -> str:
+    """Unique across the processes sharing a queue file, and across restarts"""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+
+class WorkQueue:
+    """
+    Subdomains to scrape in a SQLite file, each in one of four states: pending,
+    leased (to a worker until lease_expires), done or failed.
+
+    lease() hands out up to batch_size pending items, plus leased ones whose lease
+    expired, inside one write transaction, so two workers never get the same item
+    at the same time. An item whose lease has expired max_attempts times is marked
+    failed instead of handed out again. complete() and fail() only touch items the
+    worker still holds: a worker that lost its lease cannot overwrite the outcome
+    of the one that took over.
+    """
+
+    def __init__(self, path: str = 'jsons/work_queue.sqlite', lease_seconds: float = 300.0, max_attempts: int = 3):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Autocommit mode: transactions are opened explicitly with BEGIN IMMEDIATE
+        self._conn = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS tasks (
+                item TEXT PRIMARY KEY,
+                state TEXT NOT NULL,
+                owner TEXT,
+                lease_expires REAL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                enqueued REAL NOT NULL,
+                finished REAL,
+                error TEXT
+            );
+            CREATE INDEX IF NOT EXISTS tasks_state ON tasks (state, lease_expires);
+        """)
+
+    @contextlib.contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def enqueue(self, items: Iterable[str]) -> int:
+        """Add items not queued before; returns how many were new"""
+        now = time.time()
+        with self._transaction() as conn:
+            before = conn.total_changes
+            conn.executemany("INSERT OR IGNORE INTO tasks (item, state, enqueued) VALUES (?, ?, ?)",
+                             ((item, PENDING, now) for item in items))
+            added = conn.total_changes - before
+        logger.info(f"Enqueued {added} new items in {self.path}")
+        return added
+
+    def lease(self, worker_id: str, batch_size: int = 20) -> List[str]:
+        """Lease up to batch_size items to a worker for lease_seconds"""
+        now = time.time()
+        with self._transaction() as conn:
+            abandoned = conn.execute(
+                "UPDATE tasks SET state = ?, owner = NULL, error = 'lease expired' "
+                "WHERE state = ? AND lease_expires <= ? AND attempts >= ?",
+                (FAILED, LEASED, now, self.max_attempts)
+            ).rowcount
+            items = [row[0] for row in conn.execute(
+                "SELECT item FROM tasks WHERE state = ? OR (state = ? AND lease_expires <= ?) ORDER BY rowid LIMIT ?",
+                (PENDING, LEASED, now, batch_size)
+            )]
+            conn.executemany(
+                "UPDATE tasks SET state = ?, owner = ?, lease_expires = ?, attempts = attempts + 1 WHERE item = ?",
+                ((LEASED, worker_id, now + self.lease_seconds, item) for item in items)
+            )
+            pending = conn.execute("SELECT COUNT(*) FROM tasks WHERE state = ?", (PENDING,)).fetchone()[0]
+
+        metrics.set_gauge('queue_depth', pending, queue='work')
+        if items:
+            metrics.inc('work_queue_items_total', len(items), result='leased')
+        if abandoned:
+            metrics.inc('work_queue_items_total', abandoned, result='failed')
+            logger.warning(f"{abandoned} items failed after {self.max_attempts} expired leases")
+        return items
+
+    def extend(self, worker_id: str, items: List[str]) -> int:
+        """Push back the lease expiry of items the worker still holds"""
+        expires = time.time() + self.lease_seconds
+        with self._transaction() as conn:
+            return sum(conn.execute(
+                "UPDATE tasks SET lease_expires = ? WHERE item = ? AND owner = ? AND state = ?",
+                (expires, item, worker_id, LEASED)
+            ).rowcount for item in items)
+
+    @contextlib.contextmanager
+    def keep_alive(self, worker_id: str, items: List[str]) -> Iterator[None]:
+        """Extend the lease every lease_seconds/3 while the block runs"""
+        stop = threading.Event()
+
+        def renew():
+            while not stop.wait(self.lease_seconds / 3):
+                try:
+                    self.extend(worker_id, items)
+                except sqlite3.Error as e:
+                    logger.warning(f"Could not extend lease of {worker_id}: {str(e)}")
+
+        thread = threading.Thread(target=renew, daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            thread.join()
+
+    def complete(self, worker_id: str, items: List[str]) -> int:
+        """Mark items done; returns how many the worker still held"""
+        now = time.time()
+        with self._transaction() as conn:
+            done = sum(conn.execute(
+                "UPDATE tasks SET state = ?, owner = NULL, finished = ? WHERE item = ? AND owner = ? AND state = ?",
+                (DONE, now, item, worker_id, LEASED)
+            ).rowcount for item in items)
+        metrics.inc('work_queue_items_total', done, result='done')
+        if done < len(items):
+            logger.warning(f"{worker_id} lost the lease of {len(items) - done} items before finishing them")
+        return done
+
+    def fail(self, worker_id: str, items: List[str], error: str) -> int:
+        """Requeue items after an error, or mark them failed once out of attempts"""
+        with self._transaction() as conn:
+            count = sum(conn.execute(
+                "UPDATE tasks SET state = CASE WHEN attempts >= ? THEN ? ELSE ? END, owner = NULL, error = ? "
+                "WHERE item = ? AND owner = ? AND state = ?",
+                (self.max_attempts, FAILED, PENDING, error, item, worker_id, LEASED)
+            ).rowcount for item in items)
+        metrics.inc('work_queue_items_total', count, result='error')
+        return count
+
+    def release(self, worker_id: str) -> int:
+        """Give back everything a worker holds, e.g. on shutdown; the attempt is not counted"""
+        with self._transaction() as conn:
+            released = conn.execute(
+                "UPDATE tasks SET state = ?, owner = NULL, attempts = attempts - 1 WHERE owner = ? AND state = ?",
+                (PENDING, worker_id, LEASED)
+            ).rowcount
+        if released:
+            logger.info(f"{worker_id} released {released} items")
+        return released
+
+    def retry_failed(self) -> int:
+        """Move failed items back to pending with fresh attempts"""
+        with self._transaction() as conn:
+            return conn.execute(
+                "UPDATE tasks SET state = ?, attempts = 0, error = NULL WHERE state = ?", (PENDING, FAILED)
+            ).rowcount
+
+    def next_expiry(self) -> Optional[float]:
+        """Seconds until the earliest held lease expires, None if nothing is leased"""
+        with self._lock:
+            row = self._conn.execute("SELECT MIN(lease_expires) FROM tasks WHERE state = ?", (LEASED,)).fetchone()
+        return None if row[0] is None else max(0.0, row[0] - time.time())
+
+    def stats(self) -> Dict[str, int]:
+        """Item count per state"""
+        with self._lock:
+            counts = dict(self._conn.execute("SELECT state, COUNT(*) FROM tasks GROUP BY state").fetchall())
+        return {state: counts.get(state, 0) for state in (PENDING, LEASED, DONE, FAILED)}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', choices=['enqueue', 'worker', 'stats', 'retry-failed'])
+    parser.add_argument('file', nargs='?', default='jsons/discovered_subdomains.json', help="enqueue: JSON list")
+    parser.add_argument('--queue', default='jsons/work_queue.sqlite')
+    parser.add_argument('--record-db', default='jsons/records.sqlite', help="worker: where records are stored")
+    parser.add_argument('--batch-size', type=int, default=20)
+    parser.add_argument('--lease', type=float, default=300.0, help="lease (visibility timeout) in seconds")
+    parser.add_argument('--mode', default='threads', help="worker: scrape mode")
+    parser.add_argument('--concurrency', type=int, default=100, help="worker: scrape concurrency")
+    args = parser.parse_args()
+
+    if args.command == 'worker':
+        from scraper import scrape_from_queue
+
+        scrape_from_queue(args.queue, args.record_db, batch_size=args.batch_size, lease_seconds=args.lease,
+                          mode=args.mode, concurrency=args.concurrency)
+    else:
+        queue = WorkQueue(args.queue, lease_seconds=args.lease)
+        if args.command == 'enqueue':
+            with open(args.file, 'r') as f:
+                queue.enqueue(json.load(f))
+        elif args.command == 'retry-failed':
+            logger.info(f"{queue.retry_failed()} failed items requeued")
+        print(json.dumps(queue.stats()))
+        queue.close()